@@ -0,0 +1,160 @@
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def _code_dtype(size: int):
+    """Smallest unsigned integer type for codes of a dictionary with size values."""
+    for dtype in (np.uint8, np.uint16):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint32
+
+
+class AttributeStore:
+    """
+    Dictionary-encoded entity attributes of the LEI-CDF file (jurisdiction, status, legal form, ...).
+
+    Every attribute is a sorted dictionary of its distinct values (fixed-width utf-8 bytes,
+    the empty value first) and one small integer code per row of the name table, so an
+    attribute costs one or two bytes per entity. Attributes missing from the file are not
+    stored at all, and filtering by a value compares the codes only.
+    """
+
+    # attribute name -> column of the LEI-CDF file
+    FIELDS = {
+        'jurisdiction': 'Entity.LegalJurisdiction',
+        'country': 'Entity.LegalAddress.Country',
+        'category': 'Entity.EntityCategory',
+        'legal_form': 'Entity.LegalForm.EntityLegalFormCode',
+        'status': 'Entity.EntityStatus',
+        'registration_status': 'Registration.RegistrationStatus',
+    }
+
+    def __init__(self, codes: Dict[str, np.ndarray], values: Dict[str, np.ndarray]):
+        """Initialize the store from its arrays.
+
+        Args:
+            codes (Dict[str, np.ndarray]): per attribute, the code of every row (index into its values).
+            values (Dict[str, np.ndarray]): per attribute, the sorted distinct values, starting with b''.
+        """
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def columns(cls) -> List[str]:
+        return list(cls.FIELDS.values())
+
+    @classmethod
+    def encode(cls, chunk) -> Dict[str, Tuple[np.ndarray, List[str]]]:
+        """Codes and values of the attribute columns of a chunk (DataFrame) of the csv file.
+
+        Codes refer to the values of this chunk only, missing values are -1; `merge` puts the chunks together.
+        """
+        import pandas as pd
+
+        encoded = {}
+        for name, column in cls.FIELDS.items():
+            if column in chunk:
+                codes, uniques = pd.factorize(chunk[column])
+                encoded[name] = (codes.astype(np.int32), list(uniques))
+        return encoded
+
+    @classmethod
+    def merge(cls, chunks: Sequence[Dict[str, Tuple[np.ndarray, List[str]]]],
+              rows: Sequence[int]) -> Union['AttributeStore', None]:
+        """Store of the encoded chunks with the given numbers of rows, in order; None without attributes."""
+        names = [name for name in cls.FIELDS if any(name in chunk for chunk in chunks)]
+        if not names:
+            return None
+        codes, values = {}, {}
+        for name in names:
+            distinct = sorted({value for chunk in chunks if name in chunk for value in chunk[name][1]})
+            dictionary = np.array([b''] + [value.encode('utf-8') for value in distinct], dtype='S')
+            dtype = _code_dtype(len(dictionary))
+            parts = []
+            for chunk, count in zip(chunks, rows):
+                if name not in chunk:
+                    parts.append(np.zeros(count, dtype=dtype))
+                    continue
+                chunk_codes, uniques = chunk[name]
+                # code of every value of the chunk, 0 for missing values (code -1)
+                lookup = np.append(np.searchsorted(dictionary[1:], np.array([u.encode('utf-8') for u in uniques],
+                                                                          dtype=dictionary.dtype)) + 1, 0)
+                parts.append(lookup[chunk_codes].astype(dtype))
+            codes[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+            values[name] = dictionary
+        return cls(codes, values)
+
+    def arrays(self, prefix: str = 'attributes_') -> dict:
+        arrays = {}
+        for name in self.codes:
+            arrays['{}{}_codes'.format(prefix, name)] = self.codes[name]
+            arrays['{}{}_values'.format(prefix, name)] = self.values[name]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str = 'attributes_') -> Union['AttributeStore', None]:
+        names = [name for name in cls.FIELDS if '{}{}_codes'.format(prefix, name) in arrays]
+        if not names:
+            return None
+        return cls({name: arrays['{}{}_codes'.format(prefix, name)] for name in names},
+                   {name: arrays['{}{}_values'.format(prefix, name)] for name in names})
+
+    def __len__(self) -> int:
+        return len(next(iter(self.codes.values())))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.codes)
+
+    def get(self, name: str, rows: np.ndarray) -> List[Union[str, None]]:
+        """Values of attribute name of rows (None for missing values or rows < 0)."""
+        if name not in self.codes:
+            return [None] * len(rows)
+        rows = np.asarray(rows, dtype=np.int64)
+        codes = np.where(rows >= 0, self.codes[name][np.maximum(rows, 0)], 0)
+        decoded = [None] + [value.decode('utf-8') for value in self.values[name][1:].tolist()]
+        return [decoded[code] for code in codes.tolist()]
+
+    def code(self, name: str, value: str) -> Union[int, None]:
+        """Code of value of attribute name, None if no entity has it."""
+        values = self.values.get(name)
+        if values is None or not value:
+            return None
+        encoded = value.encode('utf-8')
+        i = int(np.searchsorted(values[1:], encoded)) + 1
+        return i if i < len(values) and values[i] == encoded else None
+
+    def matches(self, filters: Dict[str, str]) -> np.ndarray:
+        """Whether every row has all attribute values of filters (name -> value)."""
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in filters.items():
+            code = self.code(name, value)
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.codes[name] == code
+        return mask
+
+    @staticmethod
+    def concatenate(parts: Sequence[Tuple[Union['AttributeStore', None], int]]) -> Union['AttributeStore', None]:
+        """Store of the rows of all (store, number of rows) parts in order; rows of a part without an attribute miss it."""
+        names = [name for name in AttributeStore.FIELDS if any(store is not None and name in store.codes
+                                                                 for store, _ in parts)]
+        if not names:
+            return None
+        codes, values = {}, {}
+        for name in names:
+            dictionaries = [store.values[name] for store, _ in parts if store is not None and name in store.codes]
+            dictionary = np.unique(np.concatenate([np.array([b''], dtype='S1')] + dictionaries))
+            dtype = _code_dtype(len(dictionary))
+            columns = []
+            for store, rows in parts:
+                if store is not None and name in store.codes:
+                    lookup = np.searchsorted(dictionary, store.values[name])
+                    columns.append(lookup[store.codes[name]].astype(dtype))
+                else:
+                    columns.append(np.zeros(rows, dtype=dtype))
+            codes[name] = np.concatenate(columns)
+            values[name] = dictionary
+        return AttributeStore(codes, values)
@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+from attributes import AttributeStore
+from graph import RR, Graph
+from names import NameIndex
+
+
+@pytest.fixture
+def lei_csv(tmpdir):
+    """LEI file with attribute columns (and one that is not an attribute)."""
+    f = str(tmpdir.join('lei.csv'))
+    tmpdir.join('lei.csv').write_text('\n'.join([
+        'LEI,Entity.LegalName,Entity.LegalAddress.City,Entity.LegalJurisdiction,Entity.EntityStatus,'
+        'Entity.LegalForm.EntityLegalFormCode',
+        'LEI_C,Company C,Paris,FR,ACTIVE,K65D',
+        'LEI_A,Company A,Berlin,DE,ACTIVE,2HBR',
+        'LEI_B,Company B,Köln,DE,INACTIVE,',
+        'LEI_D,Company D,,US-DE,ACTIVE,XSNP',
+    ]) + '\n', encoding='utf-8')
+    return f
+
+
+def test_from_csv(lei_csv):
+    """Tests that the attribute columns are dictionary encoded into small codes."""
+    names = NameIndex.from_csv(lei_csv)
+    store = names.attributes
+
+    assert store.names == ['jurisdiction', 'legal_form', 'status']
+    assert store.values['jurisdiction'].tolist() == [b'', b'DE', b'FR', b'US-DE']
+    assert store.codes['jurisdiction'].dtype == np.uint8
+    assert names.attribute_values(['LEI_A', 'LEI_B', 'LEI_X'], ['jurisdiction', 'legal_form', 'country']) == {
+        'jurisdiction': ['DE', 'DE', None],
+        'legal_form': ['2HBR', None, None],
+        'country': [None, None, None],
+    }
+
+
+def test_search_filters(lei_csv):
+    names = NameIndex.from_csv(lei_csv)
+
+    assert [lei for lei, _ in names.search('company', filters={'jurisdiction': 'DE'})] == ['LEI_A', 'LEI_B']
+    assert [lei for lei, _ in names.search('company', filters={'jurisdiction': 'DE', 'status': 'ACTIVE'})] == ['LEI_A']
+    assert names.search('company', filters={'jurisdiction': 'XX'}) == []
+    assert NameIndex.from_pairs(['LEI_A'], ['Company A']).search('company', filters={'status': 'ACTIVE'}) == []
+
+
+def test_merge_chunks():
+    """Tests that chunks with their own dictionaries (or without the attribute) are merged into one."""
+    chunks = [
+        {'status': (np.array([0, 1, -1], dtype=np.int32), ['LAPSED', 'ISSUED'])},
+        {},
+        {'status': (np.array([0, 0], dtype=np.int32), ['RETIRED']), 'jurisdiction': (np.array([0, 0]), ['GB'])},
+    ]
+    store = AttributeStore.merge(chunks, [3, 1, 2])
+
+    assert store.get('status', np.arange(6)) == ['LAPSED', 'ISSUED', None, None, 'RETIRED', 'RETIRED']
+    assert store.get('jurisdiction', np.array([0, 5, -1])) == [None, 'GB', None]
+    assert AttributeStore.merge([{}, {}], [1, 2]) is None
+
+
+def test_updated_and_arrays(tmpdir, lei_csv):
+    """Tests attributes after a delta with new values and a snapshot round trip."""
+    f = str(tmpdir.join('delta.csv'))
+    tmpdir.join('delta.csv').write('LEI,Entity.LegalName,Entity.LegalJurisdiction,Entity.EntityStatus\n'
+                                   'LEI_B,Company B,AT,ACTIVE\nLEI_E,Company E,GB,ACTIVE\n')
+    names = NameIndex.from_csv(lei_csv).updated(NameIndex.from_csv(f))
+    assert names.attribute_values(['LEI_A', 'LEI_B', 'LEI_E'], ['jurisdiction', 'legal_form']) == {
+        'jurisdiction': ['DE', 'AT', 'GB'],
+        'legal_form': ['2HBR', None, None],
+    }
+
+    snapshot = str(tmpdir.join('names.snapshot'))
+    names.save(snapshot)
+    loaded = NameIndex.load(snapshot)
+    assert loaded.attribute_values(['LEI_E', 'LEI_C'], ['jurisdiction']) == {'jurisdiction': ['GB', 'FR']}
+
+    # names without attributes get missing values
+    plain = NameIndex.from_pairs(['LEI_F'], ['Company F'])
+    assert plain.updated(loaded).attribute_values(['LEI_F', 'LEI_A'], ['status']) == {'status': [None, 'ACTIVE']}
+    assert loaded.updated(plain).attribute_values(['LEI_F', 'LEI_A'], ['status']) == {'status': [None, 'ACTIVE']}
+
+
+def test_structure_attributes(lei_csv):
+    """Tests that the attributes are added to the nodes of all output formats."""
+    g = Graph([RR('LEI_A', 'LEI_C', RR.DIRECT), RR('LEI_X', 'LEI_C', RR.DIRECT)])
+    g.lookup_table = NameIndex.from_csv(lei_csv)
+    g.set_levels('LEI_C')
+
+    array = g.to_array(attributes=('jurisdiction', 'status'))
+    assert [(n['id'], n['jurisdiction'], n['status']) for n in array['nodes']] == [
+        ('LEI_A', 'DE', 'ACTIVE'), ('LEI_C', 'FR', 'ACTIVE'), ('LEI_X', None, None),
+    ]
+    expected = json.dumps(array, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assert b''.join(g.iter_json(2, attributes=('jurisdiction', 'status'))) == expected
+    assert g.to_columns(attributes=('status',))['nodes']['status'] == ['ACTIVE', 'ACTIVE', None]
@@ -0,0 +1,244 @@
+"""
+Benchmarks of loading the data, building structures and serving them, comparable between commits.
+
+Times `from_csv`, `set_lookup_table`, the group index, the relationship periods,
+snapshots, `build`, `set_levels`, `to_array`, structures as of a date, the ownership of
+the largest groups and the latency of the structure endpoint, and reports the memory (resident set size) of the process after
+every step. Results are written as json; `--compare` prints them next to the results of
+an earlier run:
+
+    python -m algorithms.benchmark --data ../data/synthetic --out before.json
+    git checkout other-branch
+    python -m algorithms.benchmark --data ../data/synthetic --compare before.json
+
+Without `--data` a synthetic golden copy (see `algorithms.synthetic`) is generated first.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import date
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from algorithms import metrics, ownership, synthetic
+from algorithms.graph import BACKENDS, GraphBase
+from algorithms.graph_builder import DirectNodeGraphWithParentNetworkBuilder
+from algorithms.periods import RelationshipPeriods
+
+# the figure compared between runs, by kind of result
+_METRICS = ('seconds', 'p50_ms', 'peak_rss_mb')
+# structures as of this day, see `GraphBase.history`
+AS_OF = date(2015, 1, 1)
+# the effective ownership is computed in the structures of this many largest groups
+OWNERSHIP_GROUPS = 10
+
+
+def rss_mb() -> float:
+    return metrics.rss_bytes() / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    return metrics.peak_rss_bytes() / 2 ** 20
+
+
+class Benchmark:
+    """Collects the timings and memory figures of one run."""
+
+    def __init__(self):
+        self.results = {}
+
+    def once(self, name: str, fn: Callable, *args):
+        """Times a single call of fn; returns its result."""
+        started = time.perf_counter()
+        result = fn(*args)
+        self.results[name] = {'seconds': round(time.perf_counter() - started, 4), 'rss_mb': round(rss_mb(), 1)}
+        return result
+
+    def latencies(self, name: str, fn: Callable, samples: List) -> list:
+        """Times fn for every sample; returns the results."""
+        results, times = [], []
+        for sample in samples:
+            started = time.perf_counter()
+            results.append(fn(sample))
+            times.append(time.perf_counter() - started)
+        times = np.array(times) * 1000
+        self.results[name] = {
+            'count': len(times),
+            'p50_ms': round(float(np.percentile(times, 50)), 3),
+            'p95_ms': round(float(np.percentile(times, 95)), 3),
+            'max_ms': round(float(times.max()), 3),
+            'rss_mb': round(rss_mb(), 1),
+        }
+        return results
+
+
+def sample_nodes(graph: GraphBase, samples: int, seed: int = 0) -> List[str]:
+    """Random nodes with a parent (the interesting ones) plus a member of the largest group."""
+    rng = np.random.RandomState(seed)
+    nodes = sorted(graph.nodes)
+    chosen = [nodes[i] for i in rng.permutation(len(nodes))[:samples * 4].tolist()]
+    chosen = [node for node in chosen if graph.has_direct_parent(node)][:samples]
+    if graph.groups is not None:
+        largest = int(np.argmax(graph.groups.sizes()))
+        chosen.append(graph.node_key(int(graph.groups.group_members(largest)[0])))
+    return chosen
+
+
+def largest_groups(graph: GraphBase, count: int) -> List[str]:
+    """The top entities of the count largest groups, largest first."""
+    largest = np.argsort(-graph.groups.sizes(), kind='stable')[:count]
+    return [graph.groups.root_of(graph.node_key(int(graph.groups.group_members(group)[0])))
+            for group in largest.tolist()]
+
+
+def run_backend(bench: Benchmark, backend: str, rr: str, lei: str, samples: int, snapshot_dir: str,
+                workers: int = None) -> List[str]:
+    """Benchmarks loading and building structures with one backend; returns the sample nodes."""
+    cls = BACKENDS[backend]
+    graph = bench.once(backend + '.from_csv', cls.from_csv, rr, None, workers)
+    bench.once(backend + '.set_lookup_table', cls.set_lookup_table, lei, workers)
+    if hasattr(graph, 'build_group_index'):
+        bench.once(backend + '.build_group_index', graph.build_group_index)
+    bench.once(backend + '.read_periods', graph.read_periods, rr, workers)
+    nodes = sample_nodes(graph, samples)
+
+    builder = DirectNodeGraphWithParentNetworkBuilder()
+    built = bench.latencies(backend + '.build', lambda node: builder.build(graph, node), nodes)
+    levelled = bench.latencies(backend + '.set_levels',
+                               lambda pair: pair[0][0].set_levels(pair[0][1] or pair[1]), list(zip(built, nodes)))
+    bench.latencies(backend + '.to_array', lambda g: g.to_array(), levelled)
+    bench.latencies(backend + '.build.as_of',
+                    lambda node: builder.structure_graph(graph.history(as_of=AS_OF), node), nodes)
+    if graph.groups is not None:
+        # the structures of the current (active) relationships, owned by their top entity
+        tops = largest_groups(graph, OWNERSHIP_GROUPS)
+        structures = [builder.structure_graph(graph, node) for node in tops]
+        bench.latencies(backend + '.ownership',
+                        lambda pair: ownership.annotate(pair[0], pair[1], graph.periods,
+                                                        (None, RelationshipPeriods.ACTIVE, ())),
+                        list(zip(structures, tops)))
+
+    if hasattr(graph, 'save_snapshot'):
+        path = os.path.join(snapshot_dir, backend + '.snapshot')
+        bench.once(backend + '.save_snapshot', graph.save_snapshot, path)
+        bench.once(backend + '.load_snapshot', cls.load_snapshot, path)
+    return nodes
+
+
+def run_endpoints(bench: Benchmark, backend: str, snapshot: str, nodes: List[str]):
+    """Measures the latency of the structure endpoint, without and with the response cache, and as of a date."""
+    os.environ['SNAPSHOT_PATH'] = snapshot
+    os.environ['GRAPH_BACKEND'] = backend
+    from starlette.testclient import TestClient
+    import app
+
+    with TestClient(app.api) as client:
+        # the dataset is loaded in the background after startup
+        while client.get('/readyz').status_code == 503:
+            time.sleep(0.01)
+
+        def get(node, params=None):
+            response = client.get('/company/{}/structure'.format(node), params=params)
+            response.raise_for_status()
+            return len(response.content)
+
+        def get_uncached(node, params=None):
+            app.response_cache.clear()
+            return get(node, params)
+
+        bench.latencies('endpoint.structure.uncached', get_uncached, nodes)
+        bench.latencies('endpoint.structure.cached', get, nodes)
+        bench.latencies('endpoint.structure.as_of', lambda node: get_uncached(node, {'as_of': AS_OF.isoformat()}),
+                        nodes)
+
+
+def run(rr: str, lei: str, backends: List[str], samples: int = 200, endpoints: bool = True,
+        workers: int = None) -> Dict[str, dict]:
+    """Runs all benchmarks on the given golden copy files; returns the results by name."""
+    bench = Benchmark()
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        nodes = {backend: run_backend(bench, backend, rr, lei, samples, snapshot_dir, workers)
+                 for backend in backends}
+        if endpoints and 'csr' in backends:
+            run_endpoints(bench, 'csr', os.path.join(snapshot_dir, 'csr.snapshot'), nodes['csr'])
+    bench.results['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return bench.results
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict]) -> List[str]:
+    """Lines of a table of the figures of both runs and their ratio (< 1 means faster than the baseline)."""
+    lines = ['{:36} {:>12} {:>12} {:>7}'.format('benchmark', 'baseline', 'current', 'ratio')]
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not isinstance(result, dict):
+            result, old = {'peak_rss_mb': result}, {'peak_rss_mb': old}
+        if not isinstance(old, dict):
+            continue
+        for metric in _METRICS:
+            if metric in result and old.get(metric) is not None:
+                ratio = result[metric] / old[metric] if old[metric] else float('nan')
+                lines.append('{:36} {:>12} {:>12} {:>7.2f}'.format('{} ({})'.format(name, metric), old[metric],
+                                                                   result[metric], ratio))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m algorithms.benchmark', description='GLEIF server benchmarks')
+    parser.add_argument('--data', help='directory with gleif_rr.csv and gleif_lei.csv (default: generate)')
+    parser.add_argument('--leis', type=int, default=2500000, help='LEIs of the generated data')
+    parser.add_argument('--relationships', type=int, default=300000, help='relationships of the generated data')
+    parser.add_argument('--backend', choices=sorted(BACKENDS) + ['all'], default='all')
+    parser.add_argument('--samples', type=int, default=200, help='number of structures built')
+    parser.add_argument('--no-endpoints', action='store_true', help='skip the endpoint latency')
+    parser.add_argument('--workers', type=int, help='processes parsing the csv files (default: one)')
+    parser.add_argument('--out', help='write the results to this json file')
+    parser.add_argument('--compare', help='results of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = args.data
+        if data is None:
+            data = tmp
+            synthetic.generate(data, args.leis, args.relationships)
+        backends = sorted(BACKENDS) if args.backend == 'all' else [args.backend]
+        results = run(os.path.join(data, synthetic.RR_FILE), os.path.join(data, synthetic.LEI_FILE), backends,
+                      args.samples, endpoints=not args.no_endpoints, workers=args.workers)
+
+    report = {
+        'meta': {
+            'commit': commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'data': args.data or {'leis': args.leis, 'relationships': args.relationships},
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('baseline {}, current {}'.format(baseline['meta'].get('commit'), report['meta']['commit']))
+        print('\n'.join(compare(results, baseline['results'])))
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
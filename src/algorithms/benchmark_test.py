@@ -0,0 +1,30 @@
+from benchmark import compare, run
+from synthetic import generate
+
+
+def test_run(tmpdir):
+    """Tests that a small benchmark run measures every step of both backends."""
+    paths = generate(str(tmpdir), leis=2000, relationships=300, conglomerates=1, conglomerate_size=50)
+
+    results = run(paths['rr'], paths['lei'], ['csr', 'networkx'], samples=5, endpoints=False)
+
+    for backend in ('csr', 'networkx'):
+        for step in ('from_csv', 'set_lookup_table', 'read_periods', 'save_snapshot', 'load_snapshot'):
+            assert results['{}.{}'.format(backend, step)]['seconds'] >= 0
+        for step in ('build', 'set_levels', 'to_array', 'build.as_of'):
+            assert results['{}.{}'.format(backend, step)]['count'] >= 5
+    assert results['csr.build']['count'] == 6  # plus a member of the largest group
+    assert results['csr.ownership']['count'] >= 1
+    assert results['peak_rss_mb'] > 0
+
+
+def test_compare():
+    lines = compare(
+        {'a': {'seconds': 1.0, 'rss_mb': 10}, 'b': {'p50_ms': 3.0}, 'new': {'seconds': 1}, 'peak_rss_mb': 200},
+        {'a': {'seconds': 2.0, 'rss_mb': 10}, 'b': {'p50_ms': 3.0}, 'peak_rss_mb': 100},
+    )
+
+    assert len(lines) == 4
+    assert lines[1].split()[-1] == '0.50'
+    assert lines[2].split()[-1] == '1.00'
+    assert lines[3].split()[-1] == '2.00'
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Union
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of serialized responses, bounded by the total size of the values.
+
+    Values are bytes (the encoded response body), so a hit neither touches the graph nor
+    encodes json again. Least recently used entries are evicted until the new value fits;
+    values larger than the whole cache are not stored at all.
+    """
+
+    def __init__(self, max_bytes: int):
+        """Initialize an empty cache.
+
+        Args:
+            max_bytes (int): upper bound of the summed size of all cached values; 0 disables the cache.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Union[bytes, None]:
+        """Returns the value of key (marking it as recently used) or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> bool:
+        """Stores value under key, evicting the least recently used entries as needed.
+
+        Returns:
+            bool: whether the value was stored.
+        """
+        if len(value) > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            while self.size + len(value) > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+            self._entries[key] = value
+            self.size += len(value)
+            return True
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], bytes]) -> bytes:
+        """Returns the cached value of key, or computes, stores and returns it."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes all entries whose key satisfies predicate; returns their number."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.size -= len(self._entries.pop(key))
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,73 @@
+import threading
+
+from cache import ResponseCache
+
+
+def test_cache_hit_and_miss():
+    cache = ResponseCache(max_bytes=100)
+
+    assert cache.get('a') is None
+    assert cache.put('a', b'12345')
+    assert cache.get('a') == b'12345'
+    assert 'a' in cache
+    assert cache.stats() == {'entries': 1, 'bytes': 5, 'max_bytes': 100, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    """Tests that entries are evicted in LRU order until the new value fits."""
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    cache.get('a')
+
+    cache.put('c', b'cccc')
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.size == 8
+
+    cache.put('d', b'dddddddd')
+    assert list(cache._entries) == ['d']
+    assert cache.evictions == 3
+
+
+def test_cache_replaces_and_rejects_large_values():
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('a', b'aa')
+    assert cache.size == 2
+
+    assert not cache.put('b', b'b' * 11)
+    assert 'b' not in cache and len(cache) == 1
+
+    disabled = ResponseCache(max_bytes=0)
+    assert disabled.get_or_compute('a', lambda: b'a') == b'a'
+    assert len(disabled) == 0
+
+
+def test_cache_get_or_compute_from_threads():
+    cache = ResponseCache(max_bytes=1000)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return b'value'
+
+    cache.get_or_compute('a', compute)
+    threads = [threading.Thread(target=cache.get_or_compute, args=('a', compute)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert cache.hits == 8 and cache.misses == 1
+
+
+def test_cache_discard_if():
+    cache = ResponseCache(max_bytes=100)
+    for key in ('a1', 'a2', 'b1'):
+        cache.put(key, b'1234')
+
+    assert cache.discard_if(lambda key: key.startswith('a')) == 2
+    assert list(cache._entries) == ['b1']
+    assert cache.size == 4
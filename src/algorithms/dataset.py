@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Type, Union
+
+from algorithms.graph import GraphBase
+from algorithms.names import NameIndex
+
+
+class NotLoaded(Exception):
+    """Raised when there is no dataset yet (it is still loading or loading failed)."""
+
+
+class Dataset:
+    """
+    One generation of the served data: a graph with its own lookup table and a version.
+
+    Requests take the current dataset once and use only it, so they see consistent data
+    even if a newer generation is swapped in meanwhile.
+    """
+
+    def __init__(self, graph: GraphBase, lookup_table: Union[NameIndex, None], version: str, deltas: int = 0):
+        """
+        Args:
+            graph (GraphBase): the graph; it gets lookup_table as its own (instance) lookup table.
+            lookup_table (NameIndex): legal names of the nodes.
+            version (str): identifies the source data, e.g. in cache keys.
+            deltas (int): number of delta files applied on top of the source data.
+        """
+        graph.lookup_table = lookup_table
+        self.graph = graph
+        self.lookup_table = lookup_table
+        self.version = version
+        self.deltas = deltas
+        self.loaded = time.time()
+
+    @classmethod
+    def load(cls, graph_cls: Type[GraphBase], snapshot_path: str, rr_path: str, lei_path: str,
+             progress: Callable[[str], None] = None, workers: int = None) -> 'Dataset':
+        """Loads the snapshot if it exists, otherwise the csv files (with the relationship periods) and builds the group index.
+
+        progress is called with the name of every step when it starts; the csv files are
+        parsed by `workers` processes.
+        """
+        progress = progress or (lambda step: None)
+        if os.path.exists(snapshot_path):
+            progress('loading snapshot')
+            graph = graph_cls.load_snapshot(snapshot_path)
+            version = 'snapshot:{}'.format(os.path.getmtime(snapshot_path))
+        else:
+            progress('reading relationships')
+            graph = graph_cls.from_csv_with_periods(rr_path, workers)
+            progress('reading names')
+            graph_cls.set_lookup_table(f=lei_path, workers=workers)
+            if hasattr(graph, 'build_group_index'):
+                progress('building group index')
+                graph.build_group_index()
+            version = 'csv:{}:{}'.format(os.path.getmtime(rr_path), os.path.getmtime(lei_path))
+        return cls(graph, GraphBase.lookup_table, version)
+
+    def info(self) -> dict:
+        return {
+            'version': self.version,
+            'deltas': self.deltas,
+            'loaded': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.loaded)),
+            'nodes': self.graph.number_of_nodes(),
+            'edges': self.graph.number_of_edges(),
+        }
+
+
+class DatasetHolder:
+    """
+    Holds the current dataset behind a single reference and replaces it atomically.
+
+    A reload builds the next dataset in a background thread while the current one keeps
+    serving. Replaced datasets are freed as soon as the last request using them is done;
+    until then they are reported as draining.
+    """
+
+    def __init__(self, dataset: Dataset = None):
+        self.current = dataset
+        self.reloading = False
+        self.last_error = None
+        self._progress = None
+        self._draining = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Dataset:
+        """Returns the current dataset; raises `NotLoaded` if there is none yet."""
+        dataset = self.current
+        if dataset is None:
+            raise NotLoaded(self.last_error or 'dataset is loading')
+        return dataset
+
+    def report(self, step: str):
+        """Records the step a running (re)load has reached, see `Dataset.load`."""
+        self._progress = (step, time.time())
+
+    def swap(self, dataset: Dataset, on_swap: Callable[[Dataset], None] = None) -> Dataset:
+        """Makes dataset the current one; returns the previous one.
+
+        on_swap is called with dataset before the swap is complete, e.g. to drop the results of
+        the previous dataset: no action of `if_current` for the previous one runs after it.
+        """
+        with self._lock:
+            previous, self.current = self.current, dataset
+            if previous is not None:
+                self._draining.append(weakref.ref(previous))
+            if on_swap is not None:
+                on_swap(dataset)
+            return previous
+
+    def if_current(self, dataset: Dataset, action: Callable, *args) -> bool:
+        """Calls action with args if dataset is the current one, e.g. to cache a result computed from it.
+
+        The dataset is not swapped while action runs. Returns whether it was called.
+        """
+        with self._lock:
+            if dataset is not self.current:
+                return False
+            action(*args)
+            return True
+
+    @property
+    def draining(self) -> int:
+        """Number of replaced datasets still referenced by requests."""
+        self._draining = [ref for ref in self._draining if ref() is not None]
+        return len(self._draining)
+
+    def load(self, load: Callable[[], Dataset]) -> Dataset:
+        """Loads a dataset in the calling thread and makes it the current one, e.g. before workers are forked."""
+        self.reloading = True
+        try:
+            dataset = load()
+            self.swap(dataset)
+            return dataset
+        finally:
+            self.reloading = False
+            self._progress = None
+
+    def reload(self, load: Callable[[], Dataset], on_swap: Callable[[Dataset], None] = None,
+               lock: threading.Lock = None) -> bool:
+        """Loads the next dataset in a background thread and swaps it in when it is complete.
+
+        Args:
+            load (Callable[[], Dataset]): loads the next dataset.
+            on_swap (Callable[[Dataset], None]): called with the new dataset on the swap, see `swap`.
+            lock (threading.Lock): held from the start of the load until after the swap, e.g. the
+                lock of the updates of the current dataset, which the swap would discard.
+
+        Returns:
+            bool: False if a reload is already running.
+        """
+        with self._lock:
+            if self.reloading:
+                return False
+            self.reloading = True
+
+        def run():
+            if lock is not None:
+                lock.acquire()
+            try:
+                self.swap(load(), on_swap)
+                self.last_error = None
+            except Exception as e:
+                # the current dataset keeps serving
+                self.last_error = '{}: {}'.format(type(e).__name__, e)
+            finally:
+                self.reloading = False
+                self._progress = None
+                if lock is not None:
+                    lock.release()
+
+        threading.Thread(target=run, name='dataset-reload', daemon=True).start()
+        return True
+
+    def progress(self) -> Union[dict, None]:
+        """The current step of a running (re)load and for how long it has been running."""
+        progress = self._progress
+        if progress is None:
+            return None
+        return {'step': progress[0], 'seconds': round(time.time() - progress[1], 1)}
+
+    def status(self) -> dict:
+        return {
+            'current': self.current.info() if self.current is not None else None,
+            'reloading': self.reloading,
+            'progress': self.progress(),
+            'draining': self.draining,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,172 @@
+import gc
+import threading
+
+import pytest
+
+from graph import RR, CSRGraph
+from graph_builder import DirectNodeGraphWithParentNetworkBuilder
+from names import NameIndex
+from dataset import Dataset, DatasetHolder, NotLoaded
+
+
+def make_dataset(name: str, version: str) -> Dataset:
+    g = CSRGraph([RR('ROI', 'P1', RR.DIRECT)])
+    g.build_group_index()
+    return Dataset(g, NameIndex.from_pairs(['ROI'], [name]), version)
+
+
+def labels(dataset: Dataset) -> list:
+    structure = DirectNodeGraphWithParentNetworkBuilder().structure(dataset.graph, 'ROI')
+    return sorted(node['label'] for node in structure['nodes'])
+
+
+def test_datasets_keep_their_lookup_tables():
+    """Tests that two generations label their structures with their own names."""
+    old, new = make_dataset('old name', 'v1'), make_dataset('new name', 'v2')
+
+    assert labels(old) == ['id not found', 'old name']
+    assert labels(new) == ['id not found', 'new name']
+    assert old.info()['version'] == 'v1' and old.info()['nodes'] == 2
+
+
+def test_holder_reloads_in_background():
+    """Tests that the current dataset serves until the reloaded one is complete."""
+    holder = DatasetHolder(make_dataset('old name', 'v1'))
+    loading, release, swapped = threading.Event(), threading.Event(), threading.Event()
+
+    def load():
+        loading.set()
+        release.wait(5)
+        return make_dataset('new name', 'v2')
+
+    assert holder.reload(load, on_swap=lambda dataset: swapped.set())
+    loading.wait(5)
+    assert holder.reloading
+    assert not holder.reload(load)
+    assert holder.current.version == 'v1'
+
+    in_flight = holder.current
+    release.set()
+    swapped.wait(5)
+    assert holder.current.version == 'v2'
+    assert labels(in_flight) == ['id not found', 'old name']
+    assert holder.status()['draining'] == 1
+
+    del in_flight
+    gc.collect()
+    assert holder.status()['draining'] == 0
+
+
+def test_holder_reloads_under_lock():
+    """Tests that a reload waits for the lock and holds it until the new dataset is swapped in."""
+    holder = DatasetHolder(make_dataset('old name', 'v1'))
+    lock, loading, swapped = threading.Lock(), threading.Event(), threading.Event()
+
+    def load():
+        loading.set()
+        return make_dataset('new name', 'v2')
+
+    with lock:
+        assert holder.reload(load, on_swap=lambda dataset: swapped.set(), lock=lock)
+        assert not loading.wait(0.2)
+    swapped.wait(5)
+    # released after the swap
+    assert lock.acquire(timeout=5)
+    assert holder.current.version == 'v2'
+    assert not holder.reloading
+
+
+def test_holder_acts_on_current_dataset_only():
+    """Tests that an action on the current dataset and a swap with its on_swap never interleave."""
+    old, new = make_dataset('old name', 'v1'), make_dataset('new name', 'v2')
+    holder = DatasetHolder(old)
+    acting, release, swapped = threading.Event(), threading.Event(), []
+
+    def act():
+        acting.set()
+        release.wait(5)
+
+    action = threading.Thread(target=holder.if_current, args=(old, act))
+    action.start()
+    acting.wait(5)
+    swap = threading.Thread(target=holder.swap, args=(new, swapped.append))
+    swap.start()
+    swap.join(0.2)
+    assert holder.current is old and not swapped
+
+    release.set()
+    swap.join(5)
+    action.join(5)
+    assert holder.current is new and swapped == [new]
+    assert not holder.if_current(old, swapped.append, old)
+    assert holder.if_current(new, swapped.append, new)
+    assert swapped == [new, new]
+
+
+def test_holder_loads_in_calling_thread():
+    """Tests the synchronous load used before gunicorn forks its workers."""
+    holder = DatasetHolder()
+
+    assert holder.load(lambda: make_dataset('name', 'v1')) is holder.get()
+    assert not holder.reloading and holder.get().version == 'v1'
+
+
+def test_holder_keeps_dataset_if_reload_fails():
+    holder = DatasetHolder(make_dataset('old name', 'v1'))
+    done = threading.Event()
+
+    def load():
+        try:
+            raise FileNotFoundError('gleif.snapshot')
+        finally:
+            done.set()
+
+    holder.reload(load)
+    done.wait(5)
+    for _ in range(100):
+        if not holder.reloading:
+            break
+        threading.Event().wait(0.01)
+
+    status = holder.status()
+    assert status['current']['version'] == 'v1'
+    assert not status['reloading']
+    assert status['last_error'] == 'FileNotFoundError: gleif.snapshot'
+
+
+def test_holder_loads_in_background():
+    """Tests that an empty holder raises NotLoaded and reports the loading step until the first load is done."""
+    holder = DatasetHolder()
+    step, release, swapped = threading.Event(), threading.Event(), threading.Event()
+
+    def load():
+        holder.report('reading names')
+        step.set()
+        release.wait(5)
+        return make_dataset('name', 'v1')
+
+    with pytest.raises(NotLoaded):
+        holder.get()
+    holder.reload(load, on_swap=lambda dataset: swapped.set())
+    step.wait(5)
+    assert holder.status()['progress']['step'] == 'reading names'
+    with pytest.raises(NotLoaded):
+        holder.get()
+
+    release.set()
+    swapped.wait(5)
+    assert holder.get().version == 'v1'
+    assert holder.status()['current']['version'] == 'v1'
+
+
+def test_load_reports_progress(tmpdir):
+    steps = []
+    rr, lei = tmpdir.join('rr.csv'), tmpdir.join('lei.csv')
+    rr.write('Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+             'Relationship.RelationshipStatus\nROI,P1,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE\n')
+    lei.write('LEI,Entity.LegalName\nROI,name\n')
+
+    dataset = Dataset.load(CSRGraph, str(tmpdir.join('missing.snapshot')), str(rr), str(lei), progress=steps.append)
+
+    assert steps == ['reading relationships', 'reading names', 'building group index']
+    assert dataset.graph.number_of_edges() == 1
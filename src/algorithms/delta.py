@@ -0,0 +1,102 @@
+"""
+Applies GLEIF delta files to a loaded graph and lookup table.
+
+GLEIF publishes the records that were added or changed since the last golden copy as
+delta files in the same csv layout. A record describes the current state of a
+relationship: the relationship exists afterwards if the record would have been loaded
+from a golden copy (i.e. it is active), otherwise it is removed. LEI records update the
+legal names.
+
+The graph is not modified: a new graph is built next to it, reusing everything that
+did not change, and the derived indexes are updated for the affected groups only.
+"""
+import copy
+from typing import Iterable, List, Set, Tuple, Union
+
+from algorithms.graph import RR, GraphBase
+from algorithms.names import NameIndex
+
+
+class Delta:
+    """Result of applying delta files: the updated graph and lookup table plus what changed."""
+
+    def __init__(self, graph: GraphBase, lookup_table: Union[NameIndex, None], added: int, removed: int,
+                 nodes: Set[str], groups: Set[int]):
+        """
+        Args:
+            graph (GraphBase): the updated graph.
+            lookup_table (NameIndex): the updated lookup table.
+            added (int): number of active relationship records.
+            removed (int): number of inactive relationship records.
+            nodes (Set[str]): nodes whose structure may have changed (the members of their groups
+                before and after the update).
+            groups (Set[int]): ids of the groups that were computed again, if there is a group index.
+        """
+        self.graph = graph
+        self.lookup_table = lookup_table
+        self.added = added
+        self.removed = removed
+        self.nodes = nodes
+        self.groups = groups
+
+
+def read_rr_delta(f: str) -> Tuple[List[RR], List[RR]]:
+    """Reads a RR delta file; returns the relationships to add and to remove."""
+    add, remove = [], []
+    for start, end, rel_type, active in GraphBase.read_rr_delta(f):
+        for rr in zip(start, end, rel_type, active):
+            (add if rr[3] else remove).append(RR(*rr[:3]))
+    return add, remove
+
+
+def affected_nodes(graph: GraphBase, nodes: Iterable[str]) -> Tuple[Set[str], Set[int]]:
+    """Returns all nodes connected to nodes via direct and branch relationships (and their group ids)."""
+    if graph.groups is not None:
+        groups = graph.groups.groups_of(nodes)
+        return set(graph.groups.members_of(groups)), set(groups.tolist())
+    affected = set()
+    for node in nodes:
+        if node not in affected:
+            affected.update(graph.sub(node, exclude=(RR.ULTIMATE,)).nodes)
+    return affected, set()
+
+
+def apply(graph: GraphBase, rr: str = None, lei: str = None) -> Delta:
+    """Applies a RR and/or a LEI delta file to graph and the current lookup table.
+
+    Arguments:
+        graph {GraphBase} -- graph to update (it is not modified)
+
+    Keyword Arguments:
+        rr {str} -- path to a RR-CDF delta csv file (default: {None})
+        lei {str} -- path to a LEI -> legal name delta csv file (default: {None})
+
+    Returns:
+        Delta -- the new graph and lookup table with the affected nodes and groups
+    """
+    add, remove = read_rr_delta(rr) if rr else ([], [])
+    names = NameIndex.from_csv(lei) if lei else None
+
+    changed = {node for r in add + remove for node in (r.start, r.end)}
+    # a new name changes the labels of the structures containing the node
+    if names is not None:
+        changed.update(lei.decode('utf-8') for lei in names.arrays()['lookup_lei'].tolist())
+
+    nodes, groups = affected_nodes(graph, changed)
+    # a new wrapper of the same data if only names change: the new dataset sets its own
+    # lookup table on it, which must not relabel the graph that is being served
+    updated = graph.updated(add, remove) if add or remove else copy.copy(graph)
+    if (add or remove) and graph.groups is not None:
+        updated.groups = graph.groups.updated(updated, changed)
+    # the periods are those of the golden copy, deltas are not part of the history
+    updated.periods = graph.periods
+    nodes |= affected_nodes(updated, changed)[0]
+
+    lookup_table = graph.lookup_table
+    if names is not None:
+        searchable = lookup_table is None or lookup_table.search_index is not None
+        lookup_table = names if lookup_table is None else lookup_table.updated(names)
+        if searchable:
+            # before the new names are served, so search does not have to wait for it
+            lookup_table.build_search_index()
+    return Delta(updated, lookup_table, len(add), len(remove), nodes, groups)
@@ -0,0 +1,143 @@
+import random
+
+import numpy as np
+import pytest
+
+import graph
+from graph import RR, GraphBase
+from graph_builder import DirectNodeGraphWithParentNetworkBuilder
+from names import NameIndex
+from dataset import Dataset
+import delta
+
+HEADER = 'Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,Relationship.RelationshipStatus\n'
+
+
+@pytest.fixture
+def lookup_table():
+    previous = GraphBase.lookup_table
+    GraphBase.lookup_table = NameIndex.from_pairs(['ROI', 'P1'], ['roi', 'p1'])
+    yield GraphBase.lookup_table
+    GraphBase.lookup_table = previous
+
+
+def random_rr(rnd, n, count):
+    return [
+        RR('N%d' % rnd.randrange(n), 'N%d' % rnd.randrange(n), rnd.choice(RR.TYPES))
+        for _ in range(count)
+    ]
+
+
+def edge_set(g):
+    return sorted(g.edges(data='type'))
+
+
+@pytest.mark.parametrize('backend', sorted(graph.BACKENDS))
+def test_updated(backend):
+    """Tests that an updated graph equals the graph built from the resulting relationships."""
+    cls = graph.BACKENDS[backend]
+    rnd = random.Random(3)
+    rr = random_rr(rnd, 60, 150)
+    g = cls(rr)
+    before = edge_set(g)
+
+    add, remove = random_rr(rnd, 80, 40), rnd.sample(rr, 30) + random_rr(rnd, 60, 10)
+    updated = g.updated(add, remove)
+
+    removed = {(r.start, r.end, r.rel_type) for r in remove}
+    expected = cls([r for r in rr if (r.start, r.end, r.rel_type) not in removed] + add)
+    assert edge_set(updated) == edge_set(expected)
+    assert set(updated.nodes) == set(g.nodes) | set(expected.nodes)
+    assert edge_set(g) == before
+
+
+def test_groups_updated():
+    """Tests that updating the group index gives the same index as computing it from scratch."""
+    rnd = random.Random(4)
+    rr = [RR('N%d' % i, 'N%d' % rnd.randrange(i), rnd.choice(RR.TYPES)) for i in range(1, 200)]
+    g = graph.CSRGraph(rr)
+    g.build_group_index()
+
+    for _ in range(5):
+        add, remove = random_rr(rnd, 220, 10), rnd.sample(rr, 10)
+        changed = {node for r in add + remove for node in (r.start, r.end)}
+        updated = g.updated(add, remove)
+        updated.groups = g.groups.updated(updated, changed)
+        fresh = graph.CSRGraph.from_arrays(updated._keys, updated._src, updated._dst, updated._type, updated._key)
+        fresh.build_group_index()
+
+        for node in updated.nodes:
+            assert updated.groups.group_size(node) == fresh.groups.group_size(node)
+            assert updated.groups.ultimate_parent_of(node) == fresh.groups.ultimate_parent_of(node)
+            assert sorted(updated.groups.members_of([updated.groups.group_of(node)])) == \
+                sorted(fresh.groups.members_of([fresh.groups.group_of(node)]))
+            assert updated.groups.root_of(node) == fresh.groups.root_of(node)
+            assert updated.groups.level_of(node) == fresh.groups.level_of(node)
+        # the ids of the recomputed groups are reused, new ids are added only for additional groups
+        sizes, previous = updated.groups.sizes(), g.groups.sizes()
+        assert np.count_nonzero(sizes) == len(fresh.groups.sizes())
+        assert len(sizes) - len(previous) == max(0, np.count_nonzero(sizes) - np.count_nonzero(previous))
+        g, rr = updated, [RR(u, v, t) for u, v, t in updated.edges(data='type')]
+
+
+def test_names_updated():
+    names = NameIndex.from_pairs(['B', 'A', 'C'], ['b', 'a', 'c'])
+    updated = names.updated(NameIndex.from_pairs(['D', 'A'], ['d', 'a2']))
+
+    assert updated.labels(['A', 'B', 'C', 'D', 'E']) == ['a2', 'b', 'c', 'd', 'id not found']
+    assert names.label('A') == 'a'
+
+
+@pytest.mark.parametrize('backend', sorted(graph.BACKENDS))
+def test_apply(tmpdir, lookup_table, backend):
+    """Tests applying delta files and that exactly the structures of affected groups change."""
+    g = graph.BACKENDS[backend]([
+        RR('ROI', 'P1', RR.DIRECT),
+        RR('ROI', 'UP', RR.ULTIMATE),
+        RR('P1', 'UP', RR.DIRECT),
+        RR('X1', 'X2', RR.DIRECT),
+        RR('Y1', 'Y2', RR.DIRECT),
+    ])
+    if hasattr(g, 'build_group_index'):
+        g.build_group_index()
+    rr = tmpdir.join('rr.csv')
+    rr.write(HEADER + 'X1,X2,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE\nX1,X3,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE\n')
+    lei = tmpdir.join('lei.csv')
+    lei.write('LEI,Entity.LegalName\nP1,p1 new\n')
+
+    result = delta.apply(g, rr=str(rr), lei=str(lei))
+    builder = DirectNodeGraphWithParentNetworkBuilder()
+
+    assert (result.added, result.removed) == (1, 1)
+    assert result.nodes == {'ROI', 'P1', 'UP', 'X1', 'X2', 'X3'}
+    assert sorted(result.graph.sub('X1').nodes) == ['X1', 'X3']
+    assert sorted(g.sub('X1').nodes) == ['X1', 'X2']
+    assert result.lookup_table.label('P1') == 'p1 new'
+
+    for node in g.nodes:
+        key = builder.structure_key(g, node)
+        before = builder.structure(g, node)
+        GraphBase.lookup_table = result.lookup_table
+        after = builder.structure(result.graph, node)
+        GraphBase.lookup_table = lookup_table
+        if not builder.structure_affected(key, result.nodes, result.groups):
+            assert before == after
+        else:
+            assert node in result.nodes
+
+
+@pytest.mark.parametrize('backend', sorted(graph.BACKENDS))
+def test_apply_names_only(tmpdir, backend):
+    """Tests that a LEI delta does not relabel the graph of the dataset being served."""
+    g = graph.BACKENDS[backend]([RR('ROI', 'P1', RR.DIRECT)])
+    current = Dataset(g, NameIndex.from_pairs(['P1', 'ROI'], ['p1', 'roi']), 'v1')
+    lei = tmpdir.join('lei.csv')
+    lei.write('LEI,Entity.LegalName\nP1,p1 new\n')
+
+    result = delta.apply(current.graph, lei=str(lei))
+    Dataset(result.graph, result.lookup_table, current.version, 1)
+
+    assert result.graph is not g
+    assert sorted(result.graph.edges(data='type')) == sorted(g.edges(data='type'))
+    assert result.graph.get_node_label('P1') == 'p1 new'
+    assert g.get_node_label('P1') == 'p1'
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable
+
+
+class Overloaded(Exception):
+    """Raised when too many computations are queued already."""
+
+
+class SingleFlightExecutor:
+    """
+    Runs blocking computations in a bounded thread pool, off the event loop.
+
+    Concurrent calls with the same key share one computation ("single flight"): only the
+    first caller submits it, later callers wait for the same result. Instead of queueing
+    without limit, a call fails with `Overloaded` once `max_pending` distinct computations
+    are running or waiting, so a burst is rejected early rather than slowing down everyone.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int = None):
+        """Initialize the executor.
+
+        Args:
+            max_workers (int): number of worker threads.
+            max_pending (int): maximum number of running plus queued computations (default: no limit).
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='structure')
+        self._in_flight = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, fn: Callable, *args):
+        """Returns fn(*args), computed in the pool or by a concurrent call with the same key.
+
+        Must be called from the event loop thread (which keeps the in-flight table consistent
+        without locking).
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if self.max_pending is not None and len(self._in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded('{} computations pending'.format(len(self._in_flight)))
+            loop = asyncio.get_event_loop()
+            future = asyncio.ensure_future(loop.run_in_executor(self._pool, fn, *args))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.submitted += 1
+        # a cancelled (disconnected) caller must not cancel the computation of the others
+        return await asyncio.shield(future)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from executor import Overloaded, SingleFlightExecutor
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_executor_coalesces_concurrent_calls():
+    """Tests that concurrent calls with the same key share one computation."""
+    executor = SingleFlightExecutor(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    async def main():
+        tasks = [asyncio.ensure_future(executor.run(key, compute, value)) for key, value in (('a', 1), ('a', 1), ('b', 2), ('a', 1))]
+        await asyncio.sleep(0.05)
+        assert executor.pending == 2
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert run(main()) == [2, 2, 4, 2]
+    assert sorted(calls) == [1, 2]
+    assert executor.stats()['coalesced'] == 2
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_executor_rejects_when_overloaded():
+    executor = SingleFlightExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run('a', release.wait, 5))
+        await asyncio.sleep(0)
+        # the same key joins the running computation, a new one is rejected
+        second = asyncio.ensure_future(executor.run('a', release.wait, 5))
+        with pytest.raises(Overloaded):
+            await executor.run('b', release.wait, 5)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert run(main()) == [True, True]
+    assert executor.rejected == 1
+    executor.shutdown()
+
+
+def test_executor_propagates_errors():
+    executor = SingleFlightExecutor(max_workers=1)
+
+    def fail():
+        raise KeyError('x')
+
+    with pytest.raises(KeyError):
+        run(executor.run('a', fail))
+    assert executor.pending == 0
+    executor.shutdown()
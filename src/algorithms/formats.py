@@ -0,0 +1,56 @@
+"""
+Response formats of structures.
+
+- `json` (default): the vis.js network format of `Graph.to_array`
+- `columnar`: `Graph.to_columns` as json; node tables instead of a dict per node, edges
+  as node positions and type codes
+- `msgpack`: `Graph.to_columns` as MessagePack (needs the optional `msgpack` package)
+"""
+import json
+from typing import Union
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON = 'json'
+COLUMNAR = 'columnar'
+MSGPACK = 'msgpack'
+
+MEDIA_TYPES = {
+    JSON: 'application/json',
+    COLUMNAR: 'application/vnd.gleif.columnar+json',
+    MSGPACK: 'application/msgpack',
+}
+# also accepted in the Accept header
+ALIASES = {
+    'application/x-msgpack': MSGPACK,
+}
+
+
+def available() -> list:
+    return [name for name in MEDIA_TYPES if name != MSGPACK or msgpack is not None]
+
+
+def negotiate(format: Union[str, None], accept: Union[str, None]) -> Union[str, None]:
+    """Returns the format requested by query parameter, else by Accept header, else json.
+
+    Returns None if the requested format is unknown or not available.
+    """
+    if format:
+        return format if format in available() else None
+    if accept:
+        by_media_type = dict(ALIASES, **{media_type: name for name, media_type in MEDIA_TYPES.items()})
+        for part in accept.split(','):
+            name = by_media_type.get(part.split(';')[0].strip())
+            if name in available():
+                return name
+    return JSON
+
+
+def encode_columns(columns: dict, format: str) -> bytes:
+    """Encodes the result of `Graph.to_columns`."""
+    if format == MSGPACK:
+        return msgpack.packb(columns, use_bin_type=True)
+    return json.dumps(columns, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
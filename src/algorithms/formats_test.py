@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import formats
+
+COLUMNS = {
+    'nodes': {'id': ['LEI_1', 'LEI_2'], 'label': ['a', 'Société'], 'level': [1, 0], 'no_parent': [False, None]},
+    'edges': {'from': [0], 'to': [1], 'type': [0]},
+    'types': ['IS_DIRECTLY_CONSOLIDATED_BY'],
+}
+
+
+@pytest.mark.parametrize('format, accept, expected', [
+    (None, None, 'json'),
+    (None, '*/*', 'json'),
+    (None, 'text/html, application/vnd.gleif.columnar+json;q=0.9', 'columnar'),
+    ('columnar', 'application/json', 'columnar'),
+    ('json', None, 'json'),
+    ('xml', None, None),
+])
+def test_negotiate(format, accept, expected):
+    assert formats.negotiate(format, accept) == expected
+
+
+def test_negotiate_msgpack(monkeypatch):
+    monkeypatch.setattr(formats, 'msgpack', None)
+    assert formats.negotiate('msgpack', None) is None
+    assert formats.negotiate(None, 'application/msgpack') == 'json'
+    assert 'msgpack' not in formats.available()
+
+
+def test_encode_columnar_json():
+    assert json.loads(formats.encode_columns(COLUMNS, formats.COLUMNAR).decode('utf-8')) == COLUMNS
+
+
+def test_encode_msgpack():
+    msgpack = pytest.importorskip('msgpack')
+    assert msgpack.unpackb(formats.encode_columns(COLUMNS, formats.MSGPACK), raw=False) == COLUMNS
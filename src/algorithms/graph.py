@@ -1,19 +1,1146 @@
-"""
-Initialize the RRGraph object with an iterator of RR objects.
+import copy
+import json
+from collections import deque
+from collections.abc import Mapping
+from datetime import date
+from itertools import chain
+from json.encoder import encode_basestring
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Union
 
-Args:
-    rr (Iterator[RR]): An iterator containing RR (Resource Record) objects to be loaded into the graph.
+import numpy as np
+# pandas (slow to import) is imported where it is used, so starting the server and loading
+# a snapshot do without it
 
-Returns:
-    None: This method doesn't return anything; it initializes the object's attributes.
-"""
-"""Initialize a new instance of the class.
+from algorithms import metrics, parallel, snapshot, sources
+from algorithms.names import NameIndex
 
-Args:
-    start (str): The starting point or entity of the relationship.
-    end (str): The ending point or entity of the relationship.
-    rel_type (str): The type of relationship between the start and end entities.
 
-Returns:
-    None: This method doesn't return anything; it initializes the object attributes.
-"""
+class RR:
+    """A single relationship record (RR) of the GLEIF level 2 data."""
+
+    DIRECT = 'IS_DIRECTLY_CONSOLIDATED_BY'
+    ULTIMATE = 'IS_ULTIMATELY_CONSOLIDATED_BY'
+    BRANCH = 'IS_INTERNATIONAL_BRANCH_OF'
+
+    TYPES = (DIRECT, ULTIMATE, BRANCH)
+
+    def __init__(self, start: str, end: str, rel_type: str):
+        """Initialize a new instance of the class.
+
+        Args:
+            start (str): The starting point or entity of the relationship.
+            end (str): The ending point or entity of the relationship.
+            rel_type (str): The type of relationship between the start and end entities.
+
+        Returns:
+            None: This method doesn't return anything; it initializes the object attributes.
+        """
+        self.start = start
+        self.end = end
+        self.rel_type = rel_type
+
+
+_quote = encode_basestring
+
+
+def _json(value) -> str:
+    """json of None, a bool or an int."""
+    if value is None:
+        return 'null'
+    if value is True or value is False:
+        return 'true' if value else 'false'
+    return str(int(value))
+
+
+class GraphBase:
+    """Functionality shared by all graph backends: csv layout, node labels and parent lookup."""
+
+    START_NODE = 'Relationship.StartNode.NodeID'
+    END_NODE = 'Relationship.EndNode.NodeID'
+    RELATIONSHIP_TYPE = 'Relationship.RelationshipType'
+    RELATIONSHIP_STATUS = 'Relationship.RelationshipStatus'
+    INACTIVE = 'INACTIVE'
+
+    LEI = 'LEI'
+    LEGAL_NAME = 'Entity.LegalName'
+    NOT_FOUND = 'id not found'
+
+    # rows of the csv files parsed at once
+    CHUNKSIZE = 100000
+
+    lookup_table = None
+    # precomputed `algorithms.groups.GroupIndex`, if built
+    groups = None
+    # `algorithms.periods.RelationshipPeriods` of all relationships, if read
+    periods = None
+    # effective ownership of the nodes of a structure (see `algorithms.ownership`), if computed
+    ownership = None
+
+    @classmethod
+    def read_rr_csv(cls, f: str, limit: Union[int, None] = None,
+                    workers: Union[int, None] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Streams the relationships of a GLEIF relationship record (RR-CDF) csv file.
+
+        Only start node, end node, type and status are parsed, in chunks of `CHUNKSIZE`
+        rows; reading stops after `limit` rows. Inactive relationships and rows without
+        start or end node are skipped.
+
+        Yields:
+            tuple -- arrays of start nodes, end nodes and relationship types of a chunk
+        """
+        for start, end, rel_type, active in cls.read_rr_delta(f, limit, workers):
+            yield start[active], end[active], rel_type[active]
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> 'GraphBase':
+        """Builds a graph from chunks of start nodes, end nodes and relationship types, see `read_rr_csv`."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_csv_with_periods(cls, f: str, workers: Union[int, None] = None) -> 'GraphBase':
+        """Reads a RR-CDF csv file once for both the graph (like `from_csv`) and its `periods` (like `read_periods`)."""
+        from algorithms.periods import RelationshipPeriods
+
+        chunks = RelationshipPeriods.read_csv(f, workers)
+        g = cls.from_chunks((start[active], end[active], rel_type[active]) for start, end, rel_type, active, *_ in chunks)
+        g.periods = RelationshipPeriods.from_chunks(chunks)
+        return g
+
+    @classmethod
+    def read_rr_delta(cls, f: str, limit: Union[int, None] = None,
+                      workers: Union[int, None] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Streams the relationships of a RR-CDF csv file (e.g. a delta file) including inactive ones.
+
+        The file may also be the zip archive or a gzip file of the csv file (see `algorithms.sources`).
+        With more than one worker (and without limit), a large plain csv file is parsed by
+        that many processes (see `algorithms.parallel`); the relationships come in the same order.
+
+        Yields:
+            tuple -- arrays of start nodes, end nodes, relationship types and whether they are active
+        """
+        if limit is None and parallel.splittable(f, workers):
+            for chunks in parallel.map_ranges(cls._parse_rr, f, workers):
+                yield from chunks
+            return
+        with sources.open_csv(f) as stream:
+            yield from cls._parse_rr(stream, limit)
+
+    @classmethod
+    def _parse_rr(cls, stream: BinaryIO, limit: Union[int, None] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        import pandas as pd
+
+        chunks = pd.read_csv(
+            stream,
+            usecols=[cls.START_NODE, cls.END_NODE, cls.RELATIONSHIP_TYPE, cls.RELATIONSHIP_STATUS],
+            dtype={
+                cls.START_NODE: str,
+                cls.END_NODE: str,
+                cls.RELATIONSHIP_TYPE: 'category',
+                cls.RELATIONSHIP_STATUS: 'category',
+            },
+            nrows=limit,
+            chunksize=cls.CHUNKSIZE,
+        )
+        for chunk in chunks:
+            valid = (chunk[cls.START_NODE].notna() & chunk[cls.END_NODE].notna()).values
+            yield (
+                chunk[cls.START_NODE].values[valid],
+                chunk[cls.END_NODE].values[valid],
+                chunk[cls.RELATIONSHIP_TYPE].astype(object).values[valid],
+                (chunk[cls.RELATIONSHIP_STATUS] != cls.INACTIVE).values[valid],
+            )
+
+    @classmethod
+    def set_lookup_table(cls, f: str, workers: Union[int, None] = None):
+        """Reads the LEI -> legal name csv file used to label the nodes of all graphs, and indexes the names for search.
+
+        Arguments:
+            f {str} -- path to the csv file with the columns `LEI` and `Entity.LegalName` (any others are
+                skipped), e.g. the LEI-CDF golden copy; also its zip archive or a gzip file
+
+        Keyword Arguments:
+            workers {int} -- number of processes parsing a large csv file (default: {None}, one)
+        """
+        GraphBase.lookup_table = NameIndex.from_csv(f, workers)
+        GraphBase.lookup_table.build_search_index()
+
+    def save_snapshot(self, path: str, meta: dict = None) -> dict:
+        """Writes the graph and the lookup table to a binary snapshot file (see `algorithms.snapshot`).
+
+        Arguments:
+            path {str} -- path of the snapshot file
+
+        Keyword Arguments:
+            meta {dict} -- additional metadata stored in the header (default: {None})
+
+        Returns:
+            dict -- header of the snapshot
+        """
+        g = CSRGraph.from_graph(self)
+        arrays = {
+            'keys': g._keys,
+            'src': g._src,
+            'dst': g._dst,
+            'type': g._type,
+            'key': g._key,
+        }
+        arrays.update(g.index_arrays())
+        if g.groups is not None:
+            arrays.update(g.groups.arrays())
+        if self.periods is not None:
+            arrays.update(self.periods.arrays())
+        arrays.update((self.lookup_table or NameIndex.from_pairs([], [])).arrays())
+        meta = dict(meta or {}, nodes=g.number_of_nodes(), edges=g.number_of_edges())
+        return snapshot.write(path, arrays, meta)
+
+    @classmethod
+    def load_snapshot(cls, path: str, verify: bool = False) -> 'GraphBase':
+        """Loads a graph and the lookup table from a binary snapshot file.
+
+        The arrays are memory-mapped; a `CSRGraph` and the lookup table are usable without
+        copying them, other backends are converted.
+
+        Arguments:
+            path {str} -- path of the snapshot file
+
+        Keyword Arguments:
+            verify {bool} -- check the checksum of the file first (default: {False})
+
+        Returns:
+            GraphBase -- graph of the snapshot
+        """
+        arrays, header = snapshot.read(path, verify=verify)
+        g = CSRGraph.from_arrays(
+            arrays['keys'], arrays['src'], arrays['dst'], arrays['type'], arrays['key'],
+            index={name: arrays[name] for name in ('order', 'out_ptr', 'in_ptr', 'in_edges')},
+        )
+        from algorithms.periods import RelationshipPeriods
+
+        g.snapshot_header = header
+        g.build_group_index(arrays)
+        GraphBase.lookup_table = NameIndex.from_arrays(arrays)
+        g = g if cls is CSRGraph else cls.from_graph(g)
+        g.periods = RelationshipPeriods.from_arrays(arrays)
+        return g
+
+    def read_periods(self, f: str, workers: Union[int, None] = None):
+        """Reads all relationships of the RR-CDF file f with their periods and statuses and keeps them as `periods`."""
+        from algorithms.periods import RelationshipPeriods
+
+        self.periods = RelationshipPeriods.from_csv(f, workers)
+        return self.periods
+
+    def history(self, as_of: date = None, status: str = None, registration_status: Iterable[str] = ()) -> 'CSRGraph':
+        """The relationships valid at as_of and/or with the given statuses (see `RelationshipPeriods.view`).
+
+        The view shares the lookup table of the graph; it raises ValueError if there are no periods.
+        """
+        if self.periods is None:
+            raise ValueError('relationship periods are not loaded')
+        view = self.periods.view(as_of, status, registration_status)
+        view.lookup_table = self.lookup_table
+        return view
+
+    def get_node_label(self, node: str) -> str:
+        """Returns the legal name of node or 'id not found' if it is not in the lookup table."""
+        return self.get_node_labels([node])[0]
+
+    def get_node_labels(self, nodes: List[str]) -> List[str]:
+        """Returns the legal names of all nodes with one lookup ('id not found' for unknown nodes)."""
+        if self.lookup_table is None:
+            return [self.NOT_FOUND] * len(nodes)
+        with metrics.timed('labels'):
+            return self.lookup_table.labels(nodes)
+
+    def get_node_attributes(self, nodes: List[str], names: Iterable[str]) -> Dict[str, List[Union[str, None]]]:
+        """Returns the values of the entity attributes names (see `AttributeStore.FIELDS`) of all nodes."""
+        if self.lookup_table is None:
+            return {name: [None] * len(nodes) for name in names}
+        with metrics.timed('attributes'):
+            return self.lookup_table.attribute_values(nodes, names)
+
+    def get_direct_parent(self, node: str) -> Union[str, None]:
+        return self._get_parent(node, RR.DIRECT)
+
+    def get_ultimate_parent(self, node: str) -> Union[str, None]:
+        return self._get_parent(node, RR.ULTIMATE)
+
+    def has_direct_parent(self, node: str) -> bool:
+        return self.get_direct_parent(node) is not None
+
+    def has_ultimate_parent(self, node: str) -> bool:
+        return self.get_ultimate_parent(node) is not None
+
+    def _get_parent(self, node: str, rel_type: str) -> Union[str, None]:
+        raise NotImplementedError
+
+    def group_size(self, node: str) -> int:
+        """Number of nodes connected to node via direct and branch relationships, including node."""
+        if self.groups is not None:
+            return self.groups.group_size(node)
+        return self.sub(node, exclude=(RR.ULTIMATE,)).number_of_nodes()
+
+    def ancestors(self, node: str) -> Tuple[List[Tuple[str, str]], bool]:
+        """Returns the parent chain of node, nearest parent first, and whether the chain runs into a cycle.
+
+        Every step goes to the direct parent, for branches without one to the head office, and
+        is returned with its relationship type. On a cycle the chain ends with the first node
+        reached twice. Uses the parent pointers of the group index if there is one.
+        """
+        if self.groups is not None:
+            return self.groups.ancestors(node)
+        chain, seen = [], {node}
+        while True:
+            parent, rel_type = self.get_direct_parent(node), RR.DIRECT
+            if parent is None:
+                parent, rel_type = self._get_parent(node, RR.BRANCH), RR.BRANCH
+            if parent is None:
+                return chain, False
+            chain.append((parent, rel_type))
+            if parent in seen:
+                return chain, True
+            seen.add(parent)
+            node = parent
+
+    def children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> List[Tuple[str, str]]:
+        """Returns the children of node (start nodes of its incoming edges) with the relationship type, sorted by child.
+
+        By default only direct parent and branch relationships count.
+        """
+        raise NotImplementedError
+
+    def count_children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> int:
+        """Returns the number of `children` of node, without listing them."""
+        raise NotImplementedError
+
+    def _node_columns(self) -> Tuple[List[str], List, List]:
+        """Returns the ids, levels and no_parent flags of all nodes."""
+        raise NotImplementedError
+
+    def _node_values(self, ids: List[str], attributes: Iterable[str]) -> Dict[str, list]:
+        """Returns the entity attributes of all nodes plus their `ownership`, if computed."""
+        values = self.get_node_attributes(ids, attributes)
+        if self.ownership is not None:
+            values['ownership'] = [self.ownership.get(n) for n in ids]
+        return values
+
+    def _edge_columns(self) -> Tuple[List[str], List[str], List[str]]:
+        """Returns the start nodes, end nodes and types of all edges."""
+        raise NotImplementedError
+
+    def to_array(self, attributes: Iterable[str] = ()) -> dict:
+        """Returns nodes and edges as lists of dicts (vis.js network format).
+
+        Keyword Arguments:
+            attributes {Iterable[str]} -- entity attributes added to every node (default: {()})
+        """
+        ids, levels, no_parents = self._node_columns()
+        nodes = [
+            {
+                'id': n,
+                'title': n,
+                'label': label,
+                'level': level,
+                'no_parent': no_parent,
+            }
+            for n, label, level, no_parent in zip(ids, self.get_node_labels(ids), levels, no_parents)
+        ]
+        for name, values in self._node_values(ids, attributes).items():
+            for node, value in zip(nodes, values):
+                node[name] = value
+        edges = [
+            {
+                'from': u,
+                'to': v,
+                'label': edge_type,
+            }
+            for u, v, edge_type in zip(*self._edge_columns())
+        ]
+        return {'nodes': nodes, 'edges': edges}
+
+    def to_columns(self, attributes: Iterable[str] = ()) -> dict:
+        """Returns nodes and edges column by column (the compact alternative to `to_array`).
+
+        Edges refer to nodes by their position in the node columns and to relationship types
+        by their position in `types`; `title` is left out since it equals `id`. The entity
+        attributes and the ownership are additional node columns.
+        """
+        ids, levels, no_parents = self._node_columns()
+        starts, ends, types = self._edge_index_columns(ids)
+        nodes = {'id': ids, 'label': self.get_node_labels(ids), 'level': levels, 'no_parent': no_parents}
+        nodes.update(self._node_values(ids, attributes))
+        return {
+            'nodes': nodes,
+            'edges': {'from': starts, 'to': ends, 'type': types},
+            'types': list(RR.TYPES),
+        }
+
+    def _edge_index_columns(self, ids: List[str]) -> Tuple[List[int], List[int], List[int]]:
+        """Returns start and end node positions in ids and type codes of all edges."""
+        position = {n: i for i, n in enumerate(ids)}
+        starts, ends, types = self._edge_columns()
+        return [position[u] for u in starts], [position[v] for v in ends], [RR.TYPES.index(t) for t in types]
+
+    def iter_json(self, chunk_size: int = 1000, extra: dict = None, attributes: Iterable[str] = ()) -> Iterator[bytes]:
+        """Encodes `to_array(attributes)` (plus the items of extra) as compact json in chunks of chunk_size nodes or edges.
+
+        The bytes are the same as `json.dumps(to_array(), ensure_ascii=False, separators=(',', ':'))`,
+        but they are formatted straight from the columns of the graph without building the
+        dicts, using the C string escaper of the json module.
+
+        Yields:
+            bytes -- consecutive parts of the document
+        """
+        ids, levels, no_parents = self._node_columns()
+        labels = self.get_node_labels(ids)
+        quoted = {n: _quote(n) for n in ids}
+        # the attribute (and ownership) members of every node, empty without them
+        members = [''] * len(ids)
+        for name, values in self._node_values(ids, attributes).items():
+            key = ',' + _quote(name) + ':'
+            members = [m + key + ('null' if v is None else _quote(v) if isinstance(v, str) else json.dumps(v))
+                       for m, v in zip(members, values)]
+
+        yield b'{"nodes":['
+        for start in range(0, len(ids), chunk_size):
+            stop = start + chunk_size
+            nodes = ','.join(
+                '{{"id":{0},"title":{0},"label":{1},"level":{2},"no_parent":{3}{4}}}'.format(
+                    quoted[n], _quote(label), _json(level), _json(no_parent), member)
+                for n, label, level, no_parent, member in zip(ids[start:stop], labels[start:stop], levels[start:stop],
+                                                              no_parents[start:stop], members[start:stop])
+            )
+            yield ((',' if start else '') + nodes).encode('utf-8')
+
+        yield b'],"edges":['
+        starts, ends, types = self._edge_columns()
+        for start in range(0, len(starts), chunk_size):
+            stop = start + chunk_size
+            edges = ','.join(
+                '{{"from":{},"to":{},"label":{}}}'.format(quoted[u], quoted[v], _quote(t))
+                for u, v, t in zip(starts[start:stop], ends[start:stop], types[start:stop])
+            )
+            yield ((',' if start else '') + edges).encode('utf-8')
+        yield (']' + ''.join(
+            ',{}:{}'.format(_quote(key), json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+            for key, value in (extra or {}).items()
+        ) + '}').encode('utf-8')
+
+    def updated(self, add: Iterable[RR] = (), remove: Iterable[RR] = ()) -> 'GraphBase':
+        """Returns a new graph without the relationships in remove and with those in add.
+
+        The graph itself is not modified, so it can keep serving while the update is built.
+        """
+        raise NotImplementedError
+
+
+def _expand(ptr: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Concatenates the ranges ptr[i]:ptr[i + 1] of all ids (vectorized CSR row lookup)."""
+    starts = ptr[ids]
+    lengths = ptr[ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return offsets + np.arange(total, dtype=np.int64)
+
+
+def _encode_keys(nodes: Iterable[str]) -> np.ndarray:
+    """Node keys as fixed-width bytes; LEIs are ascii, other ids (e.g. unknown ones in a request) are utf-8 encoded."""
+    keys = [node.encode('utf-8') for node in nodes]
+    return np.array(keys, dtype='S') if keys else np.empty(0, dtype='S1')
+
+
+def _ptr(ids: np.ndarray, n: int) -> np.ndarray:
+    """Row pointer of a CSR adjacency for sorted row ids."""
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=n), out=ptr[1:])
+    return ptr
+
+
+class _EdgeCollector:
+    """Interns LEIs and collects typed edges chunk by chunk, for building a CSRGraph.
+
+    Ids are assigned in the order in which the nodes are first seen, the same order in
+    which networkx adds them.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self._src, self._dst, self._type = [], [], []
+
+    def add(self, start, end, rel_type):
+        import pandas as pd
+
+        both = np.empty(2 * len(start), dtype=object)
+        both[0::2] = start
+        both[1::2] = end
+        codes, uniques = pd.factorize(both)
+        ids = np.fromiter((self.ids.setdefault(u, len(self.ids)) for u in uniques), dtype=np.int32, count=len(uniques))
+        ids = ids[codes]
+
+        types = pd.Categorical(rel_type, categories=RR.TYPES).codes
+        if (types < 0).any():
+            unknown = set(np.asarray(rel_type, dtype=object)[types < 0])
+            raise ValueError('Unknown relationship types: {}'.format(', '.join(sorted(map(str, unknown)))))
+
+        self._src.append(ids[0::2])
+        self._dst.append(ids[1::2])
+        self._type.append(types.astype(np.int8))
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        src = np.concatenate(self._src).astype(np.int64) if self._src else np.empty(0, dtype=np.int64)
+        dst = np.concatenate(self._dst).astype(np.int64) if self._dst else np.empty(0, dtype=np.int64)
+        types = np.concatenate(self._type).astype(np.int64) if self._type else np.empty(0, dtype=np.int64)
+        return src, dst, types
+
+    def graph(self, cls) -> 'CSRGraph':
+        n = len(self.ids)
+        keys = _encode_keys(self.ids)
+        src, dst, types = self._arrays()
+
+        # duplicate relationships end up unique
+        _, first = np.unique((src * n + dst) * len(RR.TYPES) + types, return_index=True)
+        keep = np.sort(first)
+
+        src, dst, types, key, insertion = cls._edge_order(src[keep], dst[keep], types[keep], np.arange(len(keep)), n)
+        return cls.from_arrays(keys, src, dst, types, key, insertion=insertion)
+
+    def edge_ids(self, graph: 'CSRGraph') -> np.ndarray:
+        """Id of the edge of graph (built by `graph`) of every added relationship, in the order they were added."""
+        n = len(self.ids)
+        src, dst, types = self._arrays()
+        code = (src * n + dst) * len(RR.TYPES) + types
+        edge_code = (graph._src.astype(np.int64) * n + graph._dst) * len(RR.TYPES) + graph._type
+        order = np.argsort(edge_code)
+        return order[np.searchsorted(edge_code, code, sorter=order)].astype(np.int32)
+
+
+class _NodeView:
+    """Read-only, networkx-like view of the nodes of a CSRGraph."""
+
+    def __init__(self, graph: 'CSRGraph'):
+        self._graph = graph
+
+    def __iter__(self):
+        return iter(self._graph._decode(self._graph._keys))
+
+    def __len__(self):
+        return self._graph._n
+
+    def __contains__(self, node):
+        return node in self._graph
+
+    def __getitem__(self, node: str) -> dict:
+        i = self._graph._id(node)
+        if i < 0:
+            raise KeyError(node)
+        return self._graph._node_attrs(i)
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self)
+        return ((node, self._graph._node_attrs(i)) for i, node in enumerate(self))
+
+
+class _EdgeView:
+    """Read-only, networkx-like view of the edges of a CSRGraph; iterates (u, v, key)."""
+
+    def __init__(self, graph: 'CSRGraph'):
+        self._graph = graph
+
+    def __iter__(self):
+        return self(keys=True)
+
+    def __len__(self):
+        return len(self._graph._src)
+
+    def __call__(self, keys: bool = False, data: Union[bool, str] = False):
+        g = self._graph
+        nodes = g._decode(g._keys)
+        columns = [[nodes[i] for i in g._src.tolist()], [nodes[i] for i in g._dst.tolist()]]
+        if keys:
+            columns.append(g._key.tolist())
+        if data:
+            types = [RR.TYPES[t] for t in g._type.tolist()]
+            columns.append([{'type': t} for t in types] if data is True else types if data == 'type' else [None] * len(types))
+        return zip(*columns)
+
+
+class CSRGraph(GraphBase):
+    """
+    Array backed graph with the same API as the networkx `Graph` (see `algorithms.nx_graph`).
+
+    Every LEI is interned to an int32 id (ids follow the order in which the nodes were
+    first seen) and all relationships are kept as NumPy arrays in compressed sparse row
+    layout, forwards (child -> parent) and in reverse (parent -> child). Nodes and edges
+    are ordered and keyed like networkx does, and the predecessors of a node are ordered by
+    the first insertion of their edge like in networkx, so a `Graph` and a `CSRGraph` built
+    from the same records iterate and traverse identically.
+    """
+
+    NO_LEVEL = np.iinfo(np.int32).min
+
+    # function of edge ids telling which of them are valid, set on views made by `masked`
+    _valid = None
+
+    def __init__(self, rr: Iterable[RR] = ()):
+        """Initialize the graph with an iterator of RR objects; duplicate relationships end up unique.
+
+        Args:
+            rr (Iterator[RR]): An iterator containing RR objects to be loaded into the graph.
+
+        Returns:
+            None: This method doesn't return anything; it initializes the object's attributes.
+        """
+        start, end, rel_type = [], [], []
+        for r in rr:
+            start.append(r.start)
+            end.append(r.end)
+            rel_type.append(r.rel_type)
+        edges = _EdgeCollector()
+        edges.add(start, end, rel_type)
+        self.__dict__.update(edges.graph(self.__class__).__dict__)
+
+    @classmethod
+    def from_csv(cls, f: str, limit: Union[int, None] = None, workers: Union[int, None] = None) -> 'CSRGraph':
+        """Reads a GLEIF relationship record (RR-CDF) csv file.
+
+        Arguments:
+            f {str} -- path to the csv file, its zip archive or a gzip file
+
+        Keyword Arguments:
+            limit {int} -- read only the first `limit` records (default: {None})
+            workers {int} -- number of processes parsing a large csv file; the graph is the same (default: {None}, one)
+
+        Returns:
+            CSRGraph -- graph containing all relationships of the file
+        """
+        return cls.from_chunks(cls.read_rr_csv(f, limit, workers))
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> 'CSRGraph':
+        edges = _EdgeCollector()
+        for start, end, rel_type in chunks:
+            edges.add(start, end, rel_type)
+        return edges.graph(cls)
+
+    @classmethod
+    def from_arrays(cls, keys: np.ndarray, src: np.ndarray, dst: np.ndarray, rel_type: np.ndarray,
+                    key: np.ndarray, level: np.ndarray = None, no_parent: np.ndarray = None,
+                    index: dict = None, insertion: np.ndarray = None) -> 'CSRGraph':
+        """Creates a graph from interned node keys and edges that are already in edge order.
+
+        `index` takes the lookup and adjacency arrays of `index_arrays` so they are not recomputed.
+        `insertion` orders the predecessors of every node (the edges of a node with the same value
+        in edge order); by default they are in edge order, like in a networkx graph whose edges
+        were added in that order.
+        """
+        g = cls.__new__(cls)
+        g._keys = keys
+        g._n = len(keys)
+        g._src = src.astype(np.int32, copy=False)
+        g._dst = dst.astype(np.int32, copy=False)
+        g._type = rel_type.astype(np.int8, copy=False)
+        g._key = key.astype(np.int16, copy=False)
+        g._level = level
+        g._no_parent = no_parent
+        if index is None:
+            g._order = np.argsort(keys, kind='stable').astype(np.int32)
+            g._index(insertion)
+        else:
+            g._order = index['order']
+            g._out_ptr, g._in_ptr, g._in_edges = index['out_ptr'], index['in_ptr'], index['in_edges']
+        return g
+
+    @classmethod
+    def from_graph(cls, other: GraphBase) -> 'CSRGraph':
+        """Converts a graph of any backend, keeping node order, edge keys and node attributes."""
+        if isinstance(other, CSRGraph):
+            return other
+        nodes = list(other.nodes)
+        ids = {node: i for i, node in enumerate(nodes)}
+        edges = list(other.edges(keys=True, data='type'))
+        src = np.array([ids[u] for u, _, _, _ in edges], dtype=np.int32)
+        dst = np.array([ids[v] for _, v, _, _ in edges], dtype=np.int32)
+        key = np.array([k for _, _, k, _ in edges], dtype=np.int16)
+        rel_type = np.array([RR.TYPES.index(t) for _, _, _, t in edges], dtype=np.int8)
+        keys = _encode_keys(nodes)
+        predecessors = {(u, v): i for i, (u, v) in enumerate((u, v) for v in nodes for u in other.predecessors(v))}
+        insertion = np.array([predecessors[u, v] for u, v, _, _ in edges], dtype=np.int64)
+        return cls.from_arrays(keys, src, dst, rel_type, key, insertion=insertion)
+
+    def build_group_index(self, arrays: dict = None):
+        """Computes the group index of the graph (or takes it from snapshot arrays) and keeps it as `groups`."""
+        from algorithms.groups import GroupIndex
+
+        self.groups = (arrays is not None and GroupIndex.from_arrays(self, arrays)) or GroupIndex(self)
+        return self.groups
+
+    def index_arrays(self) -> dict:
+        return {
+            'order': self._order,
+            'out_ptr': self._out_ptr,
+            'in_ptr': self._in_ptr,
+            'in_edges': self._in_edges,
+        }
+
+    @staticmethod
+    def _edge_order(src, dst, types, key, n):
+        """Numbers parallel edges like networkx does and sorts edges like networkx iterates them.
+
+        `key` is used as insertion order; parallel edges get the keys 0, 1, ... in that order
+        and edges are sorted by start node, first insertion of (start, end) and key. Returns
+        the sorted edges, their keys and the first insertion of their (start, end), which
+        orders the predecessors (see `from_arrays`).
+        """
+        pair = src.astype(np.int64) * n + dst
+        by_pair = np.lexsort((key, pair))
+        sorted_pair = pair[by_pair]
+        group_start = np.ones(len(pair), dtype=bool)
+        group_start[1:] = sorted_pair[1:] != sorted_pair[:-1]
+        group = np.cumsum(group_start) - 1
+        starts = np.flatnonzero(group_start)
+
+        rank = np.empty(len(pair), dtype=np.int64)
+        rank[by_pair] = np.arange(len(pair)) - starts[group]
+        first = np.empty(len(pair), dtype=np.int64)
+        first[by_pair] = key[by_pair][starts][group]
+
+        order = np.lexsort((rank, first, src))
+        return src[order], dst[order], types[order], rank[order], first[order]
+
+    def _index(self, insertion: np.ndarray = None):
+        self._out_ptr = _ptr(self._src, self._n)
+        if insertion is None:
+            self._in_edges = np.argsort(self._dst, kind='stable').astype(np.int32)
+        else:
+            self._in_edges = np.lexsort((insertion, self._dst)).astype(np.int32)
+        self._in_ptr = _ptr(self._dst, self._n)
+
+    @property
+    def nodes(self) -> _NodeView:
+        return _NodeView(self)
+
+    @property
+    def edges(self) -> _EdgeView:
+        return _EdgeView(self)
+
+    def __contains__(self, node) -> bool:
+        return self._id(node) >= 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def number_of_nodes(self) -> int:
+        return self._n
+
+    def number_of_edges(self) -> int:
+        return len(self._src)
+
+    @staticmethod
+    def _decode(keys: np.ndarray) -> list:
+        return [k.decode('utf-8') for k in keys.tolist()]
+
+    def _id(self, node) -> int:
+        """Returns the interned id of node or -1."""
+        try:
+            b = node.encode('utf-8')
+        except AttributeError:
+            return -1
+        if not self._n or len(b) > self._keys.dtype.itemsize:
+            return -1
+        i = int(np.searchsorted(self._keys, b, sorter=self._order))
+        if i < self._n and self._keys[self._order[i]] == b:
+            return int(self._order[i])
+        return -1
+
+    def node_id(self, node: str) -> Union[int, None]:
+        """Returns the interned id of node or None if it is not in the graph."""
+        i = self._id(node)
+        return i if i >= 0 else None
+
+    def node_ids(self, nodes: List[str]) -> np.ndarray:
+        """Returns the interned ids of all nodes with one lookup, -1 for nodes that are not in the graph."""
+        keys = _encode_keys(nodes)
+        if not self._n or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self._keys, keys, sorter=self._order), self._n - 1)
+        ids = self._order[i].astype(np.int64)
+        return np.where(self._keys[ids] == keys, ids, -1)
+
+    def node_key(self, i: int) -> str:
+        return self._keys[i].decode('utf-8')
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns start node ids, end node ids and relationship type codes (index into `RR.TYPES`)."""
+        return self._src, self._dst, self._type
+
+    def _node_attrs(self, i: int) -> dict:
+        attrs = {}
+        if self._level is not None and self._level[i] != self.NO_LEVEL:
+            attrs['level'] = int(self._level[i])
+        if self._no_parent is not None and self._no_parent[i] >= 0:
+            attrs['no_parent'] = bool(self._no_parent[i])
+        return attrs
+
+    def _type_mask(self, exclude: Iterable[str] = ()) -> np.ndarray:
+        allowed = np.ones(len(RR.TYPES), dtype=bool)
+        for rel_type in exclude:
+            allowed[RR.TYPES.index(rel_type)] = False
+        return allowed
+
+    def _followed(self, edges: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+        """The edges (ids) of allowed types that are valid in this view."""
+        edges = edges[allowed[self._type[edges]]]
+        if self._valid is not None and len(edges):
+            edges = edges[self._valid(edges)]
+        return edges
+
+    def masked(self, valid: Callable[[np.ndarray], np.ndarray]) -> 'CSRGraph':
+        """View of the graph with only the edges that valid (bool array of edge ids) accepts.
+
+        Nothing is filtered up front: parent lookups, `children` and the traversals of `sub`
+        and `neighbourhood` evaluate valid on the edges they visit, and the graphs they
+        extract contain only valid edges. The view has no group index.
+        """
+        g = copy.copy(self)
+        g._valid = valid
+        g.groups = None
+        return g
+
+    def deepcopy(self) -> 'CSRGraph':
+        return self.from_arrays(
+            self._keys.copy(), self._src.copy(), self._dst.copy(), self._type.copy(), self._key.copy(),
+            None if self._level is None else self._level.copy(),
+            None if self._no_parent is None else self._no_parent.copy(),
+            index={name: array.copy() for name, array in self.index_arrays().items()},
+        )
+
+    def _get_parent(self, node: str, rel_type: str) -> Union[str, None]:
+        i = self._id(node)
+        if i < 0:
+            return None
+        allowed = np.arange(len(RR.TYPES)) == RR.TYPES.index(rel_type)
+        found = self._followed(np.arange(self._out_ptr[i], self._out_ptr[i + 1]), allowed)
+        if not len(found):
+            return None
+        return self.node_key(self._dst[found[0]])
+
+    def children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> List[Tuple[str, str]]:
+        i = self._id(node)
+        if i < 0:
+            return []
+        edges = self._followed(self._in_edges[self._in_ptr[i]:self._in_ptr[i + 1]], self._type_mask(exclude))
+        return sorted(zip(self._decode(self._keys[self._src[edges]]), (RR.TYPES[t] for t in self._type[edges].tolist())))
+
+    def count_children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> int:
+        i = self._id(node)
+        if i < 0:
+            return 0
+        return len(self._followed(self._in_edges[self._in_ptr[i]:self._in_ptr[i + 1]], self._type_mask(exclude)))
+
+    def predecessors(self, node: str) -> Iterator[str]:
+        """Start nodes of the incoming edges of node, in the order networkx keeps them."""
+        i = self._id(node)
+        if i < 0:
+            raise KeyError(node)
+        src = self._src[self._followed(self._in_edges[self._in_ptr[i]:self._in_ptr[i + 1]], self._type_mask())]
+        _, first = np.unique(src, return_index=True)
+        return iter(self._decode(self._keys[src[np.sort(first)]]))
+
+    def remove_edge_type(self, rel_type: str) -> 'CSRGraph':
+        """Removes all edges of the given relationship type (in place)."""
+        keep = self._type != RR.TYPES.index(rel_type)
+        # the remaining predecessors keep their order
+        insertion = np.empty(len(keep), dtype=np.int64)
+        insertion[self._in_edges] = np.arange(len(keep))
+        self._src, self._dst, self._type, self._key = self._src[keep], self._dst[keep], self._type[keep], self._key[keep]
+        self._index(insertion[keep])
+        return self
+
+    def updated(self, add: Iterable[RR] = (), remove: Iterable[RR] = ()) -> 'CSRGraph':
+        """Returns a new graph without the relationships in remove and with those in add.
+
+        Existing nodes keep their ids, new nodes are appended; nodes are never removed.
+        Parallel edges are renumbered like networkx would number them in the new order.
+        Like networkx, which copies the graph first, edges of new (start, end) pairs follow
+        the existing ones in the order of add.
+        """
+        add, remove = list(add), list(remove)
+        new_nodes = {}
+        for rr in add:
+            for node in (rr.start, rr.end):
+                if node not in new_nodes and self._id(node) < 0:
+                    new_nodes[node] = self._n + len(new_nodes)
+        keys = self._keys
+        if new_nodes:
+            keys = np.concatenate([keys, _encode_keys(new_nodes)])
+        n = len(keys)
+
+        def codes(rrs):
+            ids = [(self._id(rr.start), self._id(rr.end)) for rr in rrs]
+            ids = [(new_nodes.get(rr.start, u), new_nodes.get(rr.end, v)) for rr, (u, v) in zip(rrs, ids)]
+            return np.array([
+                (u * n + v) * len(RR.TYPES) + RR.TYPES.index(rr.rel_type)
+                for rr, (u, v) in zip(rrs, ids) if u >= 0 and v >= 0 and rr.rel_type in RR.TYPES
+            ], dtype=np.int64)
+
+        existing = (self._src.astype(np.int64) * n + self._dst) * len(RR.TYPES) + self._type
+        existing = existing[~np.isin(existing, codes(remove))]
+        added = codes(add)
+        added = added[np.sort(np.unique(added, return_index=True)[1])]
+        added = added[~np.isin(added, existing)]
+        code = np.concatenate([existing, added])
+
+        types, pair = code % len(RR.TYPES), code // len(RR.TYPES)
+        src, dst, types, key, insertion = self._edge_order(pair // n, pair % n, types, np.arange(len(code)), n)
+
+        def extend(a, fill):
+            return None if a is None else np.concatenate([a, np.full(len(new_nodes), fill, dtype=a.dtype)])
+
+        return self.from_arrays(keys, src, dst, types, key, extend(self._level, self.NO_LEVEL), extend(self._no_parent, -1),
+                                insertion=insertion)
+
+    def _component(self, start: int, allowed: np.ndarray, max_depth: int = None,
+                   max_nodes: int = None) -> Tuple[np.ndarray, bool]:
+        """Ids of the nodes (weakly) connected to start via edges of allowed types, in BFS order.
+
+        Stops after max_depth steps or max_nodes nodes; returns the ids and whether it stopped early.
+        """
+        visited = np.zeros(self._n, dtype=bool)
+        visited[start] = True
+        position = np.zeros(self._n, dtype=np.int64)
+        frontier = np.array([start], dtype=np.int64)
+        found = [frontier]
+        count, depth = 1, 0
+        while len(frontier):
+            out_edges = self._followed(_expand(self._out_ptr, frontier), allowed)
+            in_edges = self._followed(self._in_edges[_expand(self._in_ptr, frontier)], allowed)
+            neighbours = np.concatenate([self._dst[out_edges], self._src[in_edges]])
+            if len(frontier) > 1:
+                # like networkx: node by node of the frontier, its successors and then its predecessors
+                position[frontier] = np.arange(0, 2 * len(frontier), 2)
+                position_of = np.concatenate([position[self._src[out_edges]], position[self._dst[in_edges]] + 1])
+                neighbours = neighbours[np.argsort(position_of, kind='stable')]
+            neighbours = neighbours[~visited[neighbours]]
+            if max_depth is not None and depth >= max_depth:
+                return np.concatenate(found), len(neighbours) > 0
+            neighbours, first = np.unique(neighbours, return_index=True)
+            frontier = neighbours[np.argsort(first)].astype(np.int64)
+            if max_nodes is not None and count + len(frontier) > max_nodes:
+                found.append(frontier[:max_nodes - count])
+                return np.concatenate(found), True
+            visited[frontier] = True
+            found.append(frontier)
+            count += len(frontier)
+            depth += 1
+        return np.concatenate(found), False
+
+    def sub(self, node: str, exclude: Iterable[str] = ()) -> 'CSRGraph':
+        """Extracts the (weakly) connected graph of node.
+
+        Only the neighbourhood of node is visited and copied, the graph itself is not modified.
+
+        Arguments:
+            node {str} -- lei of node
+
+        Keyword Arguments:
+            exclude {Iterable[str]} -- relationship types that are not followed nor copied (default: {()})
+
+        Returns:
+            CSRGraph -- new graph with all nodes connected to node; only node if it is not in the graph
+        """
+        return self.neighbourhood(node, exclude)[0]
+
+    def neighbourhood(self, node: str, exclude: Iterable[str] = (), max_depth: int = None,
+                      max_nodes: int = None) -> Tuple['CSRGraph', bool]:
+        """Extracts the nodes (weakly) connected to node within max_depth steps, at most max_nodes of them.
+
+        Nodes are visited breadth first, so the nearest nodes are kept; edges are copied if
+        both their nodes are.
+
+        Returns:
+            tuple -- new graph and whether nodes were left out because of the limits
+        """
+        i = self._id(node)
+        if i < 0:
+            empty = np.empty(0, dtype=np.int32)
+            return self.from_arrays(_encode_keys([node]), empty, empty, empty, empty), False
+        nodes, truncated = self._component(i, self._type_mask(exclude), max_depth, max_nodes)
+        return self.extract(nodes, exclude), truncated
+
+    def extract(self, nodes: np.ndarray, exclude: Iterable[str] = ()) -> 'CSRGraph':
+        """Copies nodes (given by id, in that order) and the edges between them into a new graph."""
+        edges = self._followed(_expand(self._out_ptr, nodes), self._type_mask(exclude))
+
+        sorter = np.argsort(nodes)
+        src = sorter[np.searchsorted(nodes, self._src[edges], sorter=sorter)]
+        dst = sorter[np.minimum(np.searchsorted(nodes, self._dst[edges], sorter=sorter), len(nodes) - 1)]
+        inside = nodes[dst] == self._dst[edges]
+        edges, src, dst = edges[inside], src[inside], dst[inside]
+        order = np.lexsort((edges, src))
+        edges = edges[order]
+        return self.from_arrays(
+            self._keys[nodes], src[order], dst[order], self._type[edges], self._key[edges],
+            None if self._level is None else self._level[nodes],
+            None if self._no_parent is None else self._no_parent[nodes],
+        )
+
+    def merge(self, other: 'CSRGraph') -> 'CSRGraph':
+        """Returns a new graph containing the nodes and edges of both graphs.
+
+        Like `networkx.compose`, attributes of other take precedence.
+        """
+        import pandas as pd
+
+        keys = np.concatenate([self._keys, other._keys]) if other._n else self._keys
+        codes, uniques = pd.factorize(keys)
+        n = len(uniques)
+        keys = np.asarray(uniques, dtype=keys.dtype)
+        other_ids = codes[self._n:]
+
+        src = np.concatenate([self._src, other_ids[other._src]]).astype(np.int64)
+        dst = np.concatenate([self._dst, other_ids[other._dst]]).astype(np.int64)
+        key = np.concatenate([self._key, other._key]).astype(np.int64)
+        types = np.concatenate([self._type, other._type])
+
+        # edges of other replace the data of equal (start, end, key) edges
+        code = (src * n + dst) * (int(key.max(initial=0)) + 1) + key
+        _, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+        last = np.zeros(len(first), dtype=np.int64)
+        np.maximum.at(last, inverse.ravel(), np.arange(len(code)))
+        unique = np.argsort(first)
+        src, dst, key, types = src[first[unique]], dst[first[unique]], key[first[unique]], types[last[unique]]
+
+        pair = src * n + dst
+        _, pair_first, pair_inverse = np.unique(pair, return_index=True, return_inverse=True)
+        # like networkx.compose, which adds the edges of self and then those of other
+        insertion = pair_first[pair_inverse.ravel()]
+        order = np.lexsort((key, insertion, src))
+
+        level = no_parent = None
+        if self._level is not None or other._level is not None:
+            level = np.full(n, self.NO_LEVEL, dtype=np.int32)
+            no_parent = np.full(n, -1, dtype=np.int8)
+            for g, ids in ((self, np.arange(self._n)), (other, other_ids)):
+                if g._level is not None:
+                    is_set = g._level != self.NO_LEVEL
+                    level[ids[is_set]] = g._level[is_set]
+                    has_flag = g._no_parent >= 0
+                    no_parent[ids[has_flag]] = g._no_parent[has_flag]
+
+        return self.from_arrays(keys, src[order], dst[order], types[order], key[order], level, no_parent,
+                                insertion=insertion[order])
+
+    def set_levels(self, root: str) -> 'CSRGraph':
+        """Sets the hierarchy level of every node (in place).
+
+        The connected graph of root is leveled from its top (level 0) downwards, children
+        are one level below their parents. Graphs that are not connected to root are hung
+        below the top level and their topmost nodes are flagged with `no_parent`.
+        """
+        out_ptr, in_ptr = self._out_ptr.tolist(), self._in_ptr.tolist()
+        dst = self._dst.tolist()
+        src_in = self._src[self._in_edges].tolist()
+        root_id = self._id(root)
+
+        level = np.full(self._n, self.NO_LEVEL, dtype=np.int32)
+        no_parent = np.full(self._n, -1, dtype=np.int8)
+        visited = set()
+        for start in chain([root_id] if root_id >= 0 else [], range(self._n)):
+            if start in visited:
+                continue
+            levels = {start: 0}
+            queue = deque([start])
+            while queue:
+                n = queue.popleft()
+                for parent in dst[out_ptr[n]:out_ptr[n + 1]]:
+                    if parent not in levels:
+                        levels[parent] = levels[n] - 1
+                        queue.append(parent)
+                for child in src_in[in_ptr[n]:in_ptr[n + 1]]:
+                    if child not in levels:
+                        levels[child] = levels[n] + 1
+                        queue.append(child)
+
+            connected_to_root = root_id in levels
+            offset = min(levels.values()) - (0 if connected_to_root or root_id < 0 else 1)
+            for n, node_level in levels.items():
+                level[n] = node_level - offset
+                no_parent[n] = not connected_to_root and out_ptr[n] == out_ptr[n + 1]
+            visited.update(levels)
+
+        self._level, self._no_parent = level, no_parent
+        return self
+
+    def _node_columns(self) -> Tuple[List[str], List, List]:
+        ids = self._decode(self._keys)
+        levels = [None] * self._n if self._level is None else [
+            None if level == self.NO_LEVEL else level for level in self._level.tolist()
+        ]
+        no_parents = [None] * self._n if self._no_parent is None else [
+            None if flag < 0 else bool(flag) for flag in self._no_parent.tolist()
+        ]
+        return ids, levels, no_parents
+
+    def _edge_index_columns(self, ids: List[str]) -> Tuple[List[int], List[int], List[int]]:
+        return self._src.tolist(), self._dst.tolist(), self._type.tolist()
+
+    def _edge_columns(self) -> Tuple[List[str], List[str], List[str]]:
+        ids = self._decode(self._keys)
+        return (
+            [ids[u] for u in self._src.tolist()],
+            [ids[v] for v in self._dst.tolist()],
+            [RR.TYPES[t] for t in self._type.tolist()],
+        )
+
+
+class _Backends(Mapping):
+    """Graph classes by backend name, imported when they are first looked up."""
+
+    def __init__(self, loaders: Dict[str, Callable[[], type]]):
+        self._loaders = loaders
+
+    def __getitem__(self, name: str) -> type:
+        return self._loaders[name]()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders)
+
+
+def _networkx_graph() -> type:
+    # networkx is slow to import and large, servers using the csr backend do without it
+    from algorithms.nx_graph import Graph
+    return Graph
+
+
+BACKENDS = _Backends({
+    'networkx': _networkx_graph,
+    'csr': lambda: CSRGraph,
+})
+
+
+class _LazyGraph(type):
+    # stands in for the networkx Graph class, which is imported when it is first used
+    def __call__(cls, *args, **kwargs):
+        return BACKENDS['networkx'](*args, **kwargs)
+
+    def __getattr__(cls, name: str):
+        return getattr(BACKENDS['networkx'], name)
+
+    def __instancecheck__(cls, instance) -> bool:
+        return isinstance(instance, BACKENDS['networkx'])
+
+    def __subclasscheck__(cls, subclass: type) -> bool:
+        return issubclass(subclass, BACKENDS['networkx'])
+
+
+class Graph(metaclass=_LazyGraph):
+    """
+    The networkx backend, `algorithms.nx_graph.Graph`: `Graph(...)`, its class methods and
+    isinstance checks import networkx on first use.
+    """
@@ -2,6 +2,7 @@ import os
 import pytest
 from graph_builder import DirectNodeGraphWithParentNetworkBuilder
 from graph import Graph
+from sources import find
 
 
 @pytest.fixture(scope="class")
@@ -17,8 +18,8 @@ def setup(request):
             - list: The hierarchical structure of the parent network as an array.
             - str: The Legal Entity Identifier (LEI) used for building the network.
     """
-    rr_csv = os.path.join(request.config.rootdir, "data", "gleif_rr.csv")
-    lookup_csv = os.path.join(request.config.rootdir, "data", "gleif_lei.csv")
+    rr_csv = find(os.path.join(request.config.rootdir, "data"), "gleif_rr.csv")
+    lookup_csv = find(os.path.join(request.config.rootdir, "data"), "gleif_lei.csv")
     lei = "969500WU8KVE8U3TL824"
     builder = DirectNodeGraphWithParentNetworkBuilder()
 
@@ -36,21 +37,6 @@ def setup(request):
 
 
 def test_structure_exists(setup):
-```
-"""Test if the A2 node is at level 0.
-
-This test checks if a specific LEI (Legal Entity Identifier) node in the structure
-does not have an ultimate parent, and therefore is at level 0.
-
-Args:
-    setup (tuple): A tuple containing the structure and LEI for testing.
-
-Returns:
-    None: This test function doesn't return anything explicitly.
-          It uses assertions to validate the expected behavior.
-"""
-```
-
     """
     Verifies the existence and structure of a test setup.
     
@@ -68,6 +54,18 @@ Returns:
 
 
 def test_a2_node_is_level_0(setup):
+    """Test if the A2 node is at level 0.
+
+    This test checks if a specific LEI (Legal Entity Identifier) node in the structure
+    does not have an ultimate parent, and therefore is at level 0.
+
+    Args:
+        setup (tuple): A tuple containing the structure and LEI for testing.
+
+    Returns:
+        None: This test function doesn't return anything explicitly.
+              It uses assertions to validate the expected behavior.
+    """
     # this LEI does not have an ultimate parent
 
     structure, lei = setup
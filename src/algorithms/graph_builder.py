@@ -1,5 +1,6 @@
-from typing import Tuple, Union
+from typing import Container, Dict, Hashable, Iterable, List, Tuple, Union
 
+from algorithms import metrics
 from algorithms.graph import RR, Graph
 
 
@@ -27,13 +28,19 @@ class DirectNodeGraphWithParentNetworkBuilder:
 
 
         "Direct" graph is the graph that connects nodes only via direct parent relationships (in all directions)
-        """
-        g = g.deepcopy()
 
+        g is only read, never copied nor modified; just the neighbourhoods of node and its
+        ultimate parent are extracted. With a group index (`g.groups`) they are looked up
+        instead of traversed.
+        """
         parent_graph, parent_node = self.ultimate_parent_direct_graph(g, node)
-        node_graph = self.node_direct_graph(g, node)
 
-        return parent_graph.merge(node_graph), parent_node
+        if parent_node is not None and self.in_direct_graph(g, node, parent_node):
+            return parent_graph, parent_node
+
+        node_graph = self.node_direct_graph(g, node)
+        with metrics.timed('merge'):
+            return parent_graph.merge(node_graph), parent_node
 
     def node_direct_graph(self, g: Graph, node: str) -> Graph:
         """
@@ -46,8 +53,10 @@ class DirectNodeGraphWithParentNetworkBuilder:
         Returns:
             Graph: A new graph that is a direct subgraph of the input graph for the specified node, with ULTIMATE edge type removed.
         """
-        g = g.deepcopy()
-        return g.remove_edge_type(RR.ULTIMATE).sub(node)
+        with metrics.timed('direct_graph'):
+            if g.groups is not None:
+                return g.groups.direct_graph(node)
+            return g.sub(node, exclude=(RR.ULTIMATE,))
 
     def ultimate_parent_direct_graph(self, g: Graph, node: str) -> Tuple[Graph, Union[str, None]]:
         """for given node and its full graph, get the sub graph of the ultimate parent
@@ -59,18 +68,130 @@ class DirectNodeGraphWithParentNetworkBuilder:
         Returns:
             [tuple] -- sub graph of ultimate parent and its lei
         """
-        g = g.deepcopy()
         parent = g.get_ultimate_parent(node)
 
         # if there is no ultimate parent, we return an empty graph
         if parent is None:
-            return Graph([]), parent
+            return g.__class__([]), parent
+
+        # subgraph for parent, ignoring ultimate edges
+        return self.node_direct_graph(g, parent), parent
+
+    def structure_graph(self, g: Graph, node: str) -> Graph:
+        """Builds the graph of node with levels relative to the ultimate parent (or node).
+
+        Arguments:
+            g {Graph} -- graph of node
+            node {str} -- lei of node
+
+        Returns:
+            Graph -- the structure, labeled with the lookup table of g
+        """
+        parent_graph, parent_node = self.build(g, node)
+        # label with the names of g, which may have a lookup table of its own
+        parent_graph.lookup_table = g.lookup_table
+        with metrics.timed('set_levels'):
+            return parent_graph.set_levels(node if parent_node is None else parent_node)
+
+    def neighbourhood_graph(self, g: Graph, node: str, max_depth: int = None,
+                            max_nodes: int = None) -> Tuple[Graph, bool]:
+        """Builds the part of the structure of node that is nearest to it.
+
+        Starting at node, nodes connected via direct and branch relationships are collected
+        breadth first up to max_depth steps and max_nodes nodes; only they are visited. The
+        levels are relative to the ultimate parent if it is among them, otherwise to node.
+
+        Arguments:
+            g {Graph} -- graph of node
+            node {str} -- lei of node
+
+        Keyword Arguments:
+            max_depth {int} -- maximum number of relationships between node and any other node (default: {None})
+            max_nodes {int} -- maximum number of nodes (default: {None})
+
+        Returns:
+            tuple -- the graph, labeled with the lookup table of g, and whether nodes were left out
+        """
+        with metrics.timed('neighbourhood'):
+            graph, truncated = g.neighbourhood(node, exclude=(RR.ULTIMATE,), max_depth=max_depth, max_nodes=max_nodes)
+        graph.lookup_table = g.lookup_table
+        parent = g.get_ultimate_parent(node)
+        with metrics.timed('set_levels'):
+            return graph.set_levels(parent if parent is not None and parent in graph else node), truncated
+
+    def structure(self, g: Graph, node: str) -> dict:
+        """Returns the structure of node as array (see `structure_graph` and `Graph.to_array`)."""
+        return self.structure_graph(g, node).to_array()
+
+    def neighbourhood_key(self, node: str, max_depth: int = None, max_nodes: int = None) -> Hashable:
+        """Returns the key of a `neighbourhood_graph`, in the form of `structure_key`."""
+        return ('neighbourhood', node, (max_depth, max_nodes))
+
+    def in_direct_graph(self, g: Graph, node: str, parent: str) -> bool:
+        """Returns whether node is part of the direct graph of parent.
+
+        With a group index, whether they are in the same group. Without it, whether the chains
+        of direct parents (or head offices) of both end at the same top; a node connected to
+        parent only through another parent of some node in between is not recognized.
+        """
+        if g.groups is not None:
+            return g.groups.group_of(node) == g.groups.group_of(parent)
+        return self._direct_top(g, node) == self._direct_top(g, parent)
+
+    def _direct_top(self, g: Graph, node: str) -> str:
+        chain, cycle = g.ancestors(node)
+        # the nodes of a cycle are not ordered, every node stands for itself
+        return chain[-1][0] if chain and not cycle else node
+
+    def structure_key(self, g: Graph, node: str) -> Hashable:
+        """Returns a key that is equal for all nodes with the same structure.
+
+        Nodes without ultimate parent get a structure of their own (levels are relative to
+        them). Otherwise the structure is the graph of the ultimate parent plus the graph of
+        node: just the former for all nodes in the direct graph of their ultimate parent (see
+        `in_direct_graph`). Of the other nodes, with a group index the whole group of node
+        shares the structure, without it only node itself is known to.
+
+        Arguments:
+            g {Graph} -- graph of node
+            node {str} -- lei of node
+
+        Returns:
+            Hashable -- key of the structure of node
+        """
+        parent = g.get_ultimate_parent(node)
+        if parent is None:
+            return ('node', node)
+        if self.in_direct_graph(g, node, parent):
+            return ('parent', parent)
+        if g.groups is None:
+            return ('parent', parent, node)
+        return ('parent', parent, g.groups.group_of(node))
+
+    def structure_affected(self, key: Hashable, nodes: Container[str], groups: Container[int] = ()) -> bool:
+        """Returns whether the structure of a `structure_key` may have changed.
+
+        Arguments:
+            key {Hashable} -- structure key
+            nodes {Container[str]} -- nodes whose direct graphs changed
+            groups {Container[int]} -- ids of the groups of the group index that changed
 
-        # first remove ultimate edge
-        g_without_ultimate_edge = g.remove_edge_type(RR.ULTIMATE)
+        Returns:
+            bool -- whether the structure of key depends on any of nodes or groups
+        """
+        return any(part in groups if isinstance(part, int) else part in nodes for part in key[1:])
+
+    def group_by_structure(self, g: Graph, nodes: Iterable[str]) -> Dict[Hashable, List[str]]:
+        """Groups nodes by structure key, so every distinct structure needs to be built once.
 
-        # get graph for parent
-        parent_sub = g_without_ultimate_edge.sub(parent)
+        Arguments:
+            g {Graph} -- graph of the nodes
+            nodes {Iterable[str]} -- leis of the nodes
 
-        # then subgraph for parent
-        return parent_sub, parent
+        Returns:
+            Dict[Hashable, List[str]] -- nodes by structure key, in order of first occurrence
+        """
+        groups = {}
+        for node in nodes:
+            groups.setdefault(self.structure_key(g, node), []).append(node)
+        return groups
@@ -2,6 +2,7 @@ import os
 import pytest
 from graph_builder import DirectNodeGraphWithParentNetworkBuilder
 from graph import Graph
+from sources import find
 
 
 @pytest.fixture(scope="class")
@@ -16,8 +17,8 @@ def setup(request):
             - list: The array representation of the parent network graph structure.
             - str: The LEI (Legal Entity Identifier) used as the starting point for the graph.
     """
-    rr_csv = os.path.join(request.config.rootdir, "data", "gleif_rr.csv")
-    lookup_csv = os.path.join(request.config.rootdir, "data", "gleif_lei.csv")
+    rr_csv = find(os.path.join(request.config.rootdir, "data"), "gleif_rr.csv")
+    lookup_csv = find(os.path.join(request.config.rootdir, "data"), "gleif_lei.csv")
     lei = "UWJKFUJFZ02DKWI3RY53"
     builder = DirectNodeGraphWithParentNetworkBuilder()
 
@@ -38,16 +39,6 @@ def test_nodes_edges_more_than_0(setup):
         setup (tuple): A tuple containing the structure and other setup data.
     
     Returns:
-        ```
-        """Tests if the LEI (Legal Entity Identifier) is present in the nodes of the structure.
-        
-        Args:
-            setup (tuple): A tuple containing the structure dictionary and LEI string.
-        
-        Returns:
-            None: This function doesn't return anything, it uses assertions for testing.
-        """
-        ```
         None: This function doesn't return anything, it uses assertions.
     """
     structure, _ = setup
@@ -57,6 +48,14 @@ def test_nodes_edges_more_than_0(setup):
 
 
 def test_lei_in_nodes(setup):
+    """Tests if the LEI (Legal Entity Identifier) is present in the nodes of the structure.
+        
+    Args:
+        setup (tuple): A tuple containing the structure dictionary and LEI string.
+        
+    Returns:
+        None: This function doesn't return anything, it uses assertions for testing.
+    """
     structure, lei = setup
     cocacolacompany_node = [n for n in structure["nodes"] if n["id"] == lei][0]
 
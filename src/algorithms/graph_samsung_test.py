@@ -2,6 +2,7 @@ import os
 import pytest
 from graph_builder import DirectNodeGraphWithParentNetworkBuilder
 from graph import Graph
+from sources import find
 
 
 @pytest.fixture
@@ -11,6 +12,14 @@ def builder():
     Args:
         None
     
+    Returns:
+        DirectNodeGraphWithParentNetworkBuilder: A new instance of the DirectNodeGraphWithParentNetworkBuilder class.
+    """
+    return DirectNodeGraphWithParentNetworkBuilder()
+
+
+@pytest.fixture
+def rr_csv(request):
     """
     Generates the file path for the 'gleif_rr.csv' file.
     
@@ -18,8 +27,26 @@ def builder():
         request (object): The request object containing configuration information.
     
     Returns:
-        str: The full path to the 'gleif_rr.csv' file.
+        str: The full path to the 'gleif_rr.csv' file, or to its compressed version as downloaded.
+    """
+    return find(os.path.join(request.config.rootdir, "data"), "gleif_rr.csv")
+
+
+@pytest.fixture
+def lookup_csv(request):
+    """
+    Constructs the full path to the 'gleif_lei.csv' file in the 'data' directory.
+
+    Args:
+        request: An object containing the test configuration.
+
+    Returns:
+        str: The absolute path to the 'gleif_lei.csv' file, or to its compressed version as downloaded.
     """
+    return find(os.path.join(request.config.rootdir, "data"), "gleif_lei.csv")
+
+
+def test_samsung_ultimate_parent(builder, lookup_csv, rr_csv):
     """Tests the Samsung ultimate parent relationship in a graph structure.
     
     Args:
@@ -30,31 +57,6 @@ def builder():
     Returns:
         None: This function doesn't return anything, it uses assertions to verify the graph structure.
     """
-    Returns:
-        DirectNodeGraphWithParentNetworkBuilder: A new instance of the DirectNodeGraphWithParentNetworkBuilder class.
-    """    return DirectNodeGraphWithParentNetworkBuilder()
-
-
-"""
-Constructs the full path to the 'gleif_lei.csv' file in the 'data' directory.
-
-Args:
-    request: An object containing the test configuration.
-
-Returns:
-    str: The absolute path to the 'gleif_lei.csv' file.
-"""
-@pytest.fixture
-def rr_csv(request):
-    return os.path.join(request.config.rootdir, "data", "gleif_rr.csv")
-
-
-@pytest.fixture
-def lookup_csv(request):
-    return os.path.join(request.config.rootdir, "data", "gleif_lei.csv")
-
-
-def test_samsung_ultimate_parent(builder, lookup_csv, rr_csv):
     samsung_lei = "549300KYVNLA5XR0HT53"
     ultimate_parent_lei = "9884007ER46L6N7EI764"
 
@@ -1,63 +1,50 @@
+import json
 import pytest
 from os import path
+import graph
 from graph import RR, Graph
-import pandas as pd 
+
+@pytest.fixture(autouse=True, params=sorted(graph.BACKENDS))
+def backend(request, monkeypatch):
+    """Runs every test of this module against all graph backends (`Graph` refers to the backend)."""
+    monkeypatch.setitem(globals(), 'Graph', graph.BACKENDS[request.param])
+    return request.param
 
 @pytest.fixture
 def rr_test_csv(request):
     """Returns the path to the 'rr-test.csv' file in the test data directory.
-    
+
     Args:
         request (pytest.FixtureRequest): The pytest request object containing configuration information.
-"""Retrieves the path to the 'lei-test.csv' file in the test data directory.
 
-Args:
-    request (object): The pytest request object containing configuration information.
-
-Returns:
-    str: The full path to the 'lei-test.csv' file.
-"""
-    
     Returns:
         str: The absolute path to the 'rr-test.csv' file.
-    """    return path.join(request.config.rootdir, 'src/test_data', 'rr-test.csv')
+    """
+    return path.join(request.config.rootdir, 'src/test_data', 'rr-test.csv')
 
 @pytest.fixture
 def lookup_test_csv(request):
+    """Retrieves the path to the 'lei-test.csv' file in the test data directory.
+
+    Args:
+        request (object): The pytest request object containing configuration information.
+
+    Returns:
+        str: The full path to the 'lei-test.csv' file.
+    """
     return path.join(request.config.rootdir, 'src/test_data', 'lei-test.csv')
 
 def test_RR():
     """Tests the RR class functionality and its different relationship types.
-    
+
     Args:
         None
-    
+
     Returns:
         None: This function doesn't return anything, it uses assertions to verify the behavior of the RR class.
     """
     rr = RR('LEI_1', 'LEI_2', RR.DIRECT)
-"""Test the creation of a Graph object from a CSV file.
-
-Args:
-    rr_test_csv (str): Path to the test CSV file containing relationship data.
-
-Returns:
-    None: This function doesn't return anything, it uses assertions to verify the graph structure.
-"""
     assert rr.start == 'LEI_1'
-    """Test the get_direct_parent and get_ultimate_parent methods of the Graph class.
-    
-    This function tests various scenarios for retrieving direct and ultimate parents
-    of nodes in a Graph object, including empty graphs and graphs with different
-    relationship configurations.
-    
-    Args:
-        None
-    
-    Returns:
-        None: This test function doesn't return anything, but uses assertions
-        to verify the correct behavior of the Graph methods.
-    """
     assert rr.end == 'LEI_2'
     assert rr.rel_type == 'IS_DIRECTLY_CONSOLIDATED_BY'
 
@@ -71,6 +58,14 @@ Returns:
     assert branch.rel_type == 'IS_INTERNATIONAL_BRANCH_OF'
 
 def test_Graph_from_file(rr_test_csv):
+    """Test the creation of a Graph object from a CSV file.
+
+    Args:
+        rr_test_csv (str): Path to the test CSV file containing relationship data.
+
+    Returns:
+        None: This function doesn't return anything, it uses assertions to verify the graph structure.
+    """
     g = Graph.from_csv(rr_test_csv)
 
     assert list(g.nodes) == ['LEI_1', 'DIRECT_PARENT_LEI', 'ULTIMATE_PARENT_LEI']
@@ -79,7 +74,56 @@ def test_Graph_from_file(rr_test_csv):
             ('LEI_1', 'ULTIMATE_PARENT_LEI', 0),
     ]
 
+def test_Graph_from_file_in_chunks(tmpdir, monkeypatch):
+    """Tests that streaming the csv file in chunks honours the limit and skips inactive relationships.
+
+    Args:
+        tmpdir: pytest temporary directory.
+        monkeypatch: pytest fixture to shrink the chunk size.
+
+    Returns:
+        None: This function uses assertions to verify the graph structure.
+    """
+    rows = [
+        'Relationship.StartNode.NodeID,Relationship.StartNode.NodeIDType,Relationship.EndNode.NodeID,'
+        'Relationship.RelationshipType,Relationship.RelationshipStatus,Relationship.Period.1.startDate',
+        'A,LEI,B,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2018-01-01',
+        'A,LEI,C,IS_ULTIMATELY_CONSOLIDATED_BY,ACTIVE,',
+        'B,LEI,X,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE,',
+        'D,LEI,B,IS_INTERNATIONAL_BRANCH_OF,ACTIVE,',
+        'A,LEI,B,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,',
+        'E,LEI,A,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,',
+    ]
+    f = tmpdir.join('rr.csv')
+    f.write('\n'.join(rows))
+    monkeypatch.setattr(Graph, 'CHUNKSIZE', 2)
+
+    g = Graph.from_csv(str(f))
+    assert list(g.nodes) == ['A', 'B', 'C', 'D', 'E']
+    assert list(g.edges(data='type')) == [
+        ('A', 'B', RR.DIRECT),
+        ('A', 'C', RR.ULTIMATE),
+        ('D', 'B', RR.BRANCH),
+        ('E', 'A', RR.DIRECT),
+    ]
+
+    g = Graph.from_csv(str(f), limit=3)
+    assert list(g.nodes) == ['A', 'B', 'C']
+
 def test_node_get_direct_and_ultimate_parent():
+    """Test the get_direct_parent and get_ultimate_parent methods of the Graph class.
+
+    This function tests various scenarios for retrieving direct and ultimate parents
+    of nodes in a Graph object, including empty graphs and graphs with different
+    relationship configurations.
+
+    Args:
+        None
+
+    Returns:
+        None: This test function doesn't return anything, but uses assertions
+        to verify the correct behavior of the Graph methods.
+    """
     g = Graph([])
 
     assert g.get_direct_parent('ROI') is None
@@ -106,14 +150,6 @@ def test_node_get_direct_and_ultimate_parent():
     assert g.get_direct_parent('ROI') == 'P1'
     assert g.get_ultimate_parent('ROI') == 'UP1'
 
-    """Tests if a node has direct and ultimate parents in a graph.
-    
-    Args:
-        None
-    
-    Returns:
-        None: This function doesn't return anything explicitly. It uses assertions to check the behavior of the Graph class.
-    """
     # Catches inconsistency (more than one direct/ultimate parent)
     # TODO: Do while initializing graph?
 
@@ -129,20 +165,20 @@ def test_node_get_direct_and_ultimate_parent():
     #  assert False, 'Expected Exception due to multiple direct parents'
 
 def test_node_has_direct_and_ultimate_parent():
+    """Tests if a node has direct and ultimate parents in a graph.
+
+    Args:
+        None
+
+    Returns:
+        None: This function doesn't return anything explicitly. It uses assertions to check the behavior of the Graph class.
+    """
     g = Graph([])
 
     assert not g.has_direct_parent('ROI')
     assert not g.has_ultimate_parent('ROI')
 
     g = Graph([
-        """Tests the removal of edges with a specific type from a Graph object.
-        
-        Args:
-            None
-        
-        Returns:
-            None: This function doesn't return anything, but uses assertions to verify the correct behavior.
-        """
         RR('ROI', 'P1', RR.DIRECT),
         RR('ROI', 'UP1', RR.ULTIMATE),
     ])
@@ -151,6 +187,14 @@ def test_node_has_direct_and_ultimate_parent():
     assert g.has_ultimate_parent('ROI')
 
 def test_remove_edge_type():
+    """Tests the removal of edges with a specific type from a Graph object.
+
+    Args:
+        None
+
+    Returns:
+        None: This function doesn't return anything, but uses assertions to verify the correct behavior.
+    """
     g = Graph([
         RR('ROI', 'P1', RR.DIRECT),
         RR('ROI', 'UP1', RR.ULTIMATE),
@@ -169,51 +213,43 @@ def test_remove_edge_type():
 def test_lookup_read_in(lookup_test_csv):
     """
     Test the lookup table reading functionality of the Graph class.
-    
-    Args:
-        lookup_test_csv (str): Path to the CSV file containing lookup table data.
-    
-    """Tests the lookup functionality of the Graph class.
-    
+
     Args:
-        rr_test_csv (str): Path to the CSV file containing test data for graph creation.
         lookup_test_csv (str): Path to the CSV file containing lookup table data.
-    
-    """Tests the behavior of a Graph object when a node is not found in the graph.
-    
-    Args:
-        rr_test_csv (str): Path to the CSV file containing the graph data.
-        lookup_test_csv (str): Path to the CSV file containing the lookup table data.
-    
-    Returns:
-        None: This function doesn't return anything, it uses assertions to verify the expected behavior.
-    """
-    Returns:
-        None: This function doesn't return anything, it uses assertions to verify the lookup functionality.
-    """
+
     Returns:
         None: This function doesn't return anything, it uses assertions for testing.
     """
     g = Graph([])
     Graph.set_lookup_table(lookup_test_csv)
 
-    """Test node not found in graph and lookup table
-    
-    Args:
-        rr_test_csv (str): Path to the CSV file containing relationship data for graph creation
-        lookup_test_csv (str): Path to the CSV file containing lookup table data
-    
-    Returns:
-        None: This function uses assertions to verify the behavior when a node is not found
-    """    assert isinstance(g.lookup_table, pd.DataFrame)
+    assert isinstance(g.lookup_table, graph.NameIndex)
 
 def test_lookup(rr_test_csv, lookup_test_csv):
+    """Tests the lookup functionality of the Graph class.
+
+    Args:
+        rr_test_csv (str): Path to the CSV file containing test data for graph creation.
+        lookup_test_csv (str): Path to the CSV file containing lookup table data.
+
+    Returns:
+        None: This function doesn't return anything, it uses assertions to verify the lookup functionality.
+    """
     g = Graph.from_csv(rr_test_csv)
     Graph.set_lookup_table(lookup_test_csv)
-    assert g.lookup_table.shape[0] == 3
+    assert len(g.lookup_table) == 3
     assert g.get_node_label("LEI_1") == "company1"
 
 def test_node_not_found_in_G(rr_test_csv, lookup_test_csv):
+    """Tests the behavior of a Graph object when a node is not found in the graph.
+
+    Args:
+        rr_test_csv (str): Path to the CSV file containing the graph data.
+        lookup_test_csv (str): Path to the CSV file containing the lookup table data.
+
+    Returns:
+        None: This function doesn't return anything, it uses assertions to verify the expected behavior.
+    """
     g = Graph.from_csv(rr_test_csv)
     Graph.set_lookup_table(lookup_test_csv)
 
@@ -221,7 +257,7 @@ def test_node_not_found_in_G(rr_test_csv, lookup_test_csv):
     nodes = a['nodes']
     edges = a['edges']
 
-    assert g.lookup_table.shape[0] == 3    
+    assert len(g.lookup_table) == 3
     assert edges == []
     assert nodes == [{
         'label': 'company2',
@@ -231,18 +267,16 @@ def test_node_not_found_in_G(rr_test_csv, lookup_test_csv):
         'no_parent': None,
     }]
 
-```
-"""Tests if a specific node is found in the graph and verifies graph structure.
-
-Args:
-    rr_test_csv (str): Path to the CSV file containing relationship data for graph construction.
-    lookup_test_csv (str): Path to the CSV file containing lookup table data.
+def test_node_not_found_in_G_and_lookup(rr_test_csv, lookup_test_csv):
+    """Test node not found in graph and lookup table
 
-Returns:
-    None: This function uses assertions to validate the graph structure and node presence.
-"""
+    Args:
+        rr_test_csv (str): Path to the CSV file containing relationship data for graph creation
+        lookup_test_csv (str): Path to the CSV file containing lookup table data
 
-```def test_node_not_found_in_G_and_lookup(rr_test_csv, lookup_test_csv):
+    Returns:
+        None: This function uses assertions to verify the behavior when a node is not found
+    """
     g = Graph.from_csv(rr_test_csv)
     g.set_lookup_table(lookup_test_csv)
 
@@ -260,17 +294,18 @@ Returns:
     }]
 
 def test_node_found_in_G(rr_test_csv, lookup_test_csv):
-    g = Graph.from_csv(rr_test_csv)
-    g.set_lookup_table(lookup_test_csv)
-    a = g.sub('LEI_1').to_array()
-    """Test the Graph to array conversion functionality.
-    
+    """Tests if a specific node is found in the graph and verifies graph structure.
+
     Args:
-        lookup_test_csv (str): Path to the CSV file containing lookup data for Graph.
-    
+        rr_test_csv (str): Path to the CSV file containing relationship data for graph construction.
+        lookup_test_csv (str): Path to the CSV file containing lookup table data.
+
     Returns:
-        None: This function uses assertions to validate the behavior.
+        None: This function uses assertions to validate the graph structure and node presence.
     """
+    g = Graph.from_csv(rr_test_csv)
+    g.set_lookup_table(lookup_test_csv)
+    a = g.sub('LEI_1').to_array()
     nodes = a['nodes']
     edges = a['edges']
 
@@ -280,22 +315,19 @@ def test_node_found_in_G(rr_test_csv, lookup_test_csv):
     assert 'company1' in labels
 
 def test_Graph_to_array(lookup_test_csv):
+    """Test the Graph to array conversion functionality.
+
+    Args:
+        lookup_test_csv (str): Path to the CSV file containing lookup data for Graph.
+
+    Returns:
+        None: This function uses assertions to validate the behavior.
+    """
     g = Graph([
         RR('LEI_1', 'LEI_2', RR.DIRECT),
         #  RR('LEI_1', 'LEI_3', RR.ULTIMATE),
 
         # TODO: More cases
-"""
-Test the subgraph functionality of the Graph class.
-
-This function creates a complex graph structure and tests various scenarios of subgraph extraction using the `sub` method of the Graph class. It verifies the correct nodes and edges are included in the resulting subgraphs.
-
-Args:
-    None
-
-Returns:
-    None: This function uses assertions to validate the subgraph results.
-"""
         #  RR('LEI_2', 'LEI_X', RR.DIRECT),
         #  RR('LEI_X', 'LEI_1', RR.ULTIMATE),
 
@@ -341,6 +373,17 @@ Returns:
     ]
 
 def test_Graph_subgraphs():
+    """
+    Test the subgraph functionality of the Graph class.
+
+    This function creates a complex graph structure and tests various scenarios of subgraph extraction using the `sub` method of the Graph class. It verifies the correct nodes and edges are included in the resulting subgraphs.
+
+    Args:
+        None
+
+    Returns:
+        None: This function uses assertions to validate the subgraph results.
+    """
     g = Graph([
 
         # Parent chain
@@ -458,11 +501,179 @@ def test_Graph_subgraphs():
 @pytest.mark.skip("Direction not implemented")
 def test_Graph_direction():
     """Tests the direction functionality of the Graph class.
-    
+
     Args:
         None
-    
+
     Returns:
         None: This test function uses assertions and does not return a value.
     """
     assert False, "TODO: Implement MultiDiGraph"
+
+def test_sub_exclude_equals_removed_edge_type():
+    """Tests that excluding a relationship type in `sub` matches removing it from a copy first.
+
+    Args:
+        None
+
+    Returns:
+        None: This function uses assertions and leaves the original graph untouched.
+    """
+    g = Graph([
+        RR('ROI', 'P1', RR.DIRECT),
+        RR('ROI', 'UP', RR.ULTIMATE),
+        RR('P1', 'UP', RR.ULTIMATE),
+        RR('C1', 'ROI', RR.DIRECT),
+        RR('B1', 'C1', RR.BRANCH),
+        RR('UP:C1', 'UP', RR.DIRECT),
+    ])
+    edges = sorted(g.edges(keys=True, data='type'))
+
+    expected = g.deepcopy().remove_edge_type(RR.ULTIMATE).sub('ROI')
+    sub = g.sub('ROI', exclude=(RR.ULTIMATE,))
+
+    assert sorted(sub.nodes) == sorted(expected.nodes) == ['B1', 'C1', 'P1', 'ROI']
+    assert sorted(sub.edges(keys=True, data='type')) == sorted(expected.edges(keys=True, data='type'))
+    assert sorted(g.edges(keys=True, data='type')) == edges
+
+def test_set_levels():
+    """Tests the hierarchy levels set from the top of a structure.
+
+    Args:
+        None
+
+    Returns:
+        None: This function uses assertions to verify the levels.
+    """
+    g = Graph([
+        RR('P1', 'UP', RR.DIRECT),
+        RR('ROI', 'P1', RR.DIRECT),
+        RR('C1', 'ROI', RR.DIRECT),
+        RR('X', 'Y', RR.DIRECT),
+    ])
+
+    a = g.set_levels('UP').to_array()
+    levels = {n['id']: (n['level'], n['no_parent']) for n in a['nodes']}
+
+    assert levels == {
+        'UP': (0, False),
+        'P1': (1, False),
+        'ROI': (2, False),
+        'C1': (3, False),
+        'X': (2, False),
+        'Y': (1, True),
+    }
+
+
+def test_Graph_iter_json(lookup_test_csv):
+    """Tests that the streamed json is byte for byte the json of `to_array`, for any chunk size."""
+    g = Graph([
+        RR('LEI_1', 'LEI_2', RR.DIRECT),
+        RR('LEI_1', 'LEI_3', RR.ULTIMATE),
+        RR('LEI_3', 'LEI_1', RR.BRANCH),
+        RR('LEI_4', 'LEI_2', RR.DIRECT),
+    ])
+    g.lookup_table = graph.NameIndex.from_pairs(['LEI_1', 'LEI_2'], ['Company "1" / \\ \n', 'Société 2  '])
+    g.set_levels('LEI_2')
+
+    expected = json.dumps(g.to_array(), ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+    for chunk_size in (1, 3, 1000):
+        assert b''.join(g.iter_json(chunk_size)) == expected
+    assert b''.join(Graph([]).iter_json()) == b'{"nodes":[],"edges":[]}'
+
+
+def test_Graph_to_columns():
+    """Tests that the columns hold the same nodes and edges as `to_array`."""
+    g = Graph([
+        RR('LEI_1', 'LEI_2', RR.DIRECT),
+        RR('LEI_1', 'LEI_3', RR.ULTIMATE),
+        RR('LEI_3', 'LEI_1', RR.BRANCH),
+    ])
+    g.set_levels('LEI_2')
+    columns = g.to_columns()
+    array = g.to_array()
+
+    nodes = columns['nodes']
+    assert [dict(id=n, title=n, label=label, level=level, no_parent=no_parent)
+            for n, label, level, no_parent in zip(nodes['id'], nodes['label'], nodes['level'], nodes['no_parent'])] == array['nodes']
+    edges = columns['edges']
+    assert [dict(zip(('from', 'to', 'label'), (nodes['id'][u], nodes['id'][v], columns['types'][t])))
+            for u, v, t in zip(edges['from'], edges['to'], edges['type'])] == array['edges']
+
+
+@pytest.fixture
+def chain_graph():
+    #  TOP <- P1 <- ROI <- C1 <- C1:C1
+    #                  ^-- B1 (branch)  ^-- ultimate parent of ROI: TOP
+    return Graph([
+        RR('P1', 'TOP', RR.DIRECT),
+        RR('ROI', 'P1', RR.DIRECT),
+        RR('C1', 'ROI', RR.DIRECT),
+        RR('C1:C1', 'C1', RR.DIRECT),
+        RR('B1', 'ROI', RR.BRANCH),
+        RR('ROI', 'TOP', RR.ULTIMATE),
+    ])
+
+
+def test_neighbourhood(chain_graph):
+    """Tests that the neighbourhood is limited by depth and number of nodes, nearest nodes first."""
+    def neighbourhood(**limits):
+        sub, truncated = chain_graph.neighbourhood('ROI', exclude=(RR.ULTIMATE,), **limits)
+        return sorted(sub.nodes), sorted(sub.edges(data='type')), truncated
+
+    assert neighbourhood() == (
+        ['B1', 'C1', 'C1:C1', 'P1', 'ROI', 'TOP'],
+        sorted(chain_graph.sub('ROI', exclude=(RR.ULTIMATE,)).edges(data='type')),
+        False,
+    )
+    assert neighbourhood(max_depth=0) == (['ROI'], [], True)
+    assert neighbourhood(max_depth=1) == (
+        ['B1', 'C1', 'P1', 'ROI'],
+        [('B1', 'ROI', RR.BRANCH), ('C1', 'ROI', RR.DIRECT), ('ROI', 'P1', RR.DIRECT)],
+        True,
+    )
+    assert not neighbourhood(max_depth=2)[2]
+
+    nodes, _, truncated = neighbourhood(max_nodes=5)
+    assert len(nodes) == 5 and 'ROI' in nodes and truncated
+    assert neighbourhood(max_nodes=6)[2] is False
+    assert neighbourhood(max_nodes=1) == (['ROI'], [], True)
+
+    assert chain_graph.neighbourhood('UNKNOWN', max_depth=1)[1] is False
+
+
+def test_unknown_non_ascii_node(chain_graph):
+    """Tests that an unknown id that is not ascii gets a graph of its own like any unknown id."""
+    from graph_builder import DirectNodeGraphWithParentNetworkBuilder
+
+    assert list(chain_graph.sub('ÄÖ').nodes) == ['ÄÖ']
+    sub, truncated = chain_graph.neighbourhood('ÄÖ', max_depth=1)
+    assert list(sub.nodes) == ['ÄÖ'] and truncated is False
+    assert chain_graph.get_ultimate_parent('ÄÖ') is None
+    assert chain_graph.children('ÄÖ') == []
+
+    structure = DirectNodeGraphWithParentNetworkBuilder().structure_graph(chain_graph, 'ÄÖ')
+    assert [(n['id'], n['level']) for n in structure.to_array()['nodes']] == [('ÄÖ', 0)]
+    assert b''.join(structure.iter_json()).decode('utf-8') == json.dumps(structure.to_array(), ensure_ascii=False,
+                                                                          separators=(',', ':'))
+
+
+def test_children(chain_graph):
+    assert chain_graph.children('ROI') == [('B1', RR.BRANCH), ('C1', RR.DIRECT)]
+    assert chain_graph.children('TOP') == [('P1', RR.DIRECT)]
+    assert chain_graph.children('TOP', exclude=()) == [('P1', RR.DIRECT), ('ROI', RR.ULTIMATE)]
+    assert chain_graph.children('C1:C1') == []
+    assert chain_graph.children('UNKNOWN') == []
+
+    assert [chain_graph.count_children(node) for node in ('ROI', 'TOP', 'C1:C1', 'UNKNOWN')] == [2, 1, 0, 0]
+    assert chain_graph.count_children('TOP', exclude=()) == 2
+
+
+def test_ancestors(chain_graph):
+    assert chain_graph.ancestors('C1:C1') == ([('C1', RR.DIRECT), ('ROI', RR.DIRECT), ('P1', RR.DIRECT), ('TOP', RR.DIRECT)], False)
+    assert chain_graph.ancestors('B1') == ([('ROI', RR.BRANCH), ('P1', RR.DIRECT), ('TOP', RR.DIRECT)], False)
+    assert chain_graph.ancestors('TOP') == ([], False)
+    assert chain_graph.ancestors('UNKNOWN') == ([], False)
+
+    cycle = Graph([RR('A', 'B', RR.DIRECT), RR('B', 'A', RR.DIRECT)])
+    assert cycle.ancestors('A') == ([('B', RR.DIRECT), ('A', RR.DIRECT)], True)
@@ -0,0 +1,276 @@
+import weakref
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+
+from algorithms.graph import RR, CSRGraph
+
+
+def _csr(rows: np.ndarray, n: int):
+    """Groups the positions of rows by row id: returns row pointer and positions."""
+    order = np.argsort(rows, kind='stable').astype(np.int32)
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=ptr[1:])
+    return ptr, order
+
+
+def _first_parent(src: np.ndarray, dst: np.ndarray, n: int) -> np.ndarray:
+    """Parent id of every node (end of its first edge) or -1."""
+    parent = np.full(n, -1, dtype=np.int32)
+    starts, first = np.unique(src, return_index=True)
+    parent[starts] = dst[first]
+    return parent
+
+
+class GroupIndex:
+    """
+    Precomputed corporate groups of a CSRGraph.
+
+    For every node (by id) the index holds
+
+        - group: id of its connected graph via direct and branch relationships
+          (the graph `DirectNodeGraphWithParentNetworkBuilder` extracts for it)
+        - parent: its direct parent, for branches without one the head office
+        - parent_type: the relationship to parent (index into `RR.TYPES`)
+        - root: the top of its parent chain (on a cycle, the node where the cycle was entered)
+        - level: the number of parents up to root
+        - ultimate: its reported ultimate parent
+
+    plus the members of every group, so looking up a group is an index lookup instead
+    of a traversal. Everything is computed iteratively in time linear in nodes and edges.
+    """
+
+    NONE = -1
+
+    def __init__(self, graph: CSRGraph, arrays: dict = None):
+        """Computes the index of graph (or takes the arrays of `arrays()` computed before).
+
+        Args:
+            graph (CSRGraph): The graph to index.
+            arrays (dict): Precomputed arrays, e.g. from a snapshot.
+        """
+        # the graph keeps the index as `groups`; a proxy avoids a reference cycle, so a
+        # replaced graph is freed as soon as it is no longer used
+        self.graph = weakref.proxy(graph)
+        if arrays is None:
+            arrays = self._compute(graph)
+        self.group = arrays['group']
+        self.parent = arrays['parent']
+        self.parent_type = arrays['parent_type']
+        self.root = arrays['root']
+        self.level = arrays['level']
+        self.ultimate = arrays['ultimate']
+        self.members_ptr = arrays['members_ptr']
+        self.members = arrays['members']
+
+    ARRAYS = ('group', 'parent', 'parent_type', 'root', 'level', 'ultimate', 'members_ptr', 'members')
+
+    def arrays(self, prefix: str = 'groups_') -> dict:
+        return {prefix + name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, graph: CSRGraph, arrays: dict, prefix: str = 'groups_') -> Union['GroupIndex', None]:
+        # snapshots written before an array was added are indexed again
+        if any(prefix + name not in arrays for name in cls.ARRAYS):
+            return None
+        return cls(graph, {name: arrays[prefix + name] for name in cls.ARRAYS})
+
+    @classmethod
+    def _compute(cls, graph: CSRGraph) -> dict:
+        n = graph.number_of_nodes()
+        src, dst, rel_type = graph.edge_arrays()
+        direct, ultimate, branch = (rel_type == RR.TYPES.index(t) for t in (RR.DIRECT, RR.ULTIMATE, RR.BRANCH))
+
+        group = cls._components(n, src[~ultimate], dst[~ultimate])
+        members_ptr, members = _csr(group, int(group.max(initial=-1)) + 1)
+
+        parent = _first_parent(src[direct], dst[direct], n)
+        head_office = _first_parent(src[branch], dst[branch], n)
+        parent_type = np.where(parent >= 0, RR.TYPES.index(RR.DIRECT),
+                               np.where(head_office >= 0, RR.TYPES.index(RR.BRANCH), cls.NONE)).astype(np.int8)
+        parent = np.where(parent >= 0, parent, head_office).astype(np.int32)
+
+        root, level = cls._roots(parent)
+        return {
+            'group': group,
+            'parent': parent,
+            'parent_type': parent_type,
+            'root': root,
+            'level': level,
+            'ultimate': _first_parent(src[ultimate], dst[ultimate], n),
+            'members_ptr': members_ptr,
+            'members': members,
+        }
+
+    @staticmethod
+    def _components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+        """Connected components (ignoring direction) by iterative depth first search."""
+        ptr, order = _csr(np.concatenate([src, dst]), n)
+        neighbours = np.concatenate([dst, src])[order].tolist()
+        ptr = ptr.tolist()
+
+        group = [-1] * n
+        count = 0
+        for start in range(n):
+            if group[start] >= 0:
+                continue
+            group[start] = count
+            stack = [start]
+            while stack:
+                u = stack.pop()
+                for v in neighbours[ptr[u]:ptr[u + 1]]:
+                    if group[v] < 0:
+                        group[v] = count
+                        stack.append(v)
+            count += 1
+        return np.array(group, dtype=np.int32)
+
+    @staticmethod
+    def _roots(parent: np.ndarray):
+        """Root and level of every node, descending from the nodes without parent level by level.
+
+        Nodes left over afterwards hang below a cycle; the first node found twice when
+        walking up their parent chain becomes the root of the cycle.
+        """
+        n = len(parent)
+        has_parent = parent >= 0
+        children_ptr, children = _csr(parent[has_parent], n)
+        children = np.flatnonzero(has_parent)[children]
+
+        root = np.full(n, -1, dtype=np.int32)
+        level = np.full(n, -1, dtype=np.int32)
+
+        def descend(frontier):
+            depth = 0
+            root[frontier] = frontier
+            while len(frontier):
+                level[frontier] = depth
+                starts = children_ptr[frontier]
+                lengths = children_ptr[frontier + 1] - starts
+                positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+                nodes = children[positions]
+                nodes = nodes[level[nodes] < 0]
+                root[nodes] = root[parent[nodes]]
+                frontier = nodes
+                depth += 1
+
+        descend(np.flatnonzero(~has_parent))
+        for start in np.flatnonzero(level < 0).tolist():
+            if level[start] >= 0:
+                continue
+            seen = set()
+            node = start
+            while node not in seen:
+                seen.add(node)
+                node = int(parent[node])
+            level[node] = 0
+            root[node] = node
+            descend(np.array([node]))
+        return root, level
+
+    def updated(self, graph: CSRGraph, nodes: Iterable[str]) -> 'GroupIndex':
+        """Returns the index of graph, an updated version of the indexed graph (see `CSRGraph.updated`)
+        in which only relationships of nodes changed.
+
+        Only the groups of nodes are computed again; they take over the ids of the groups of
+        nodes before the update (new ids are appended only for additional groups), all other
+        groups keep theirs. Ids left over when the groups of nodes merge stay empty. New nodes
+        of graph are appended to the arrays.
+        """
+        n_old, n = len(self.group), graph.number_of_nodes()
+        previous = self.groups_of(nodes)
+        affected = np.zeros(n, dtype=bool)
+        affected[n_old:] = True
+        affected[:n_old] = np.isin(self.group, previous)
+        members = np.flatnonzero(affected).astype(np.int32)
+
+        local = self._compute(graph.extract(members, exclude=(RR.ULTIMATE,)))
+
+        def update(a, values, fill=-1):
+            a = np.concatenate([a, np.full(n - n_old, fill, dtype=a.dtype)])
+            a[members] = values
+            return a
+
+        count, next_group = int(local['group'].max(initial=-1)) + 1, len(self.members_ptr) - 1
+        ids = np.concatenate([previous[:count], np.arange(next_group, next_group + count - len(previous[:count]))])
+        group = update(self.group, ids[local['group']].astype(self.group.dtype))
+        parent = update(self.parent, np.where(local['parent'] >= 0, members[local['parent']], -1))
+        src, dst, rel_type = graph.edge_arrays()
+        ultimate = rel_type == RR.TYPES.index(RR.ULTIMATE)
+        members_ptr, group_members = _csr(group, int(group.max(initial=-1)) + 1)
+        return GroupIndex(graph, {
+            'group': group,
+            'parent': parent,
+            'parent_type': update(self.parent_type, local['parent_type']),
+            'root': update(self.root, members[local['root']]),
+            'level': update(self.level, local['level']),
+            'ultimate': _first_parent(src[ultimate], dst[ultimate], n),
+            'members_ptr': members_ptr,
+            'members': group_members,
+        })
+
+    def groups_of(self, nodes: Iterable[str]) -> np.ndarray:
+        """Distinct group ids of the given nodes (unknown nodes are ignored)."""
+        ids = [self._id(node) for node in nodes]
+        ids = np.array([i for i in ids if i is not None and i < len(self.group)], dtype=np.int64)
+        return np.unique(self.group[ids])
+
+    def members_of(self, groups: np.ndarray) -> List[str]:
+        """Nodes of the given groups."""
+        ids = np.concatenate([self.group_members(int(g)) for g in groups]) if len(groups) else []
+        return [self.graph.node_key(int(i)) for i in ids]
+
+    def _id(self, node: str) -> Union[int, None]:
+        return self.graph.node_id(node)
+
+    def group_of(self, node: str) -> Union[int, None]:
+        i = self._id(node)
+        return None if i is None else int(self.group[i])
+
+    def group_members(self, group: int) -> np.ndarray:
+        """Ids of the members of group, ascending."""
+        return self.members[self.members_ptr[group]:self.members_ptr[group + 1]]
+
+    def sizes(self) -> np.ndarray:
+        """Number of members of every group id (0 for the ids left empty by `updated`)."""
+        return np.diff(self.members_ptr)
+
+    def group_size(self, node: str) -> int:
+        group = self.group_of(node)
+        return 1 if group is None else int(self.members_ptr[group + 1] - self.members_ptr[group])
+
+    def root_of(self, node: str) -> Union[str, None]:
+        i = self._id(node)
+        return None if i is None else self.graph.node_key(int(self.root[i]))
+
+    def level_of(self, node: str) -> Union[int, None]:
+        i = self._id(node)
+        return None if i is None else int(self.level[i])
+
+    def ultimate_parent_of(self, node: str) -> Union[str, None]:
+        i = self._id(node)
+        if i is None or self.ultimate[i] < 0:
+            return None
+        return self.graph.node_key(int(self.ultimate[i]))
+
+    def ancestors(self, node: str) -> Tuple[List[Tuple[str, str]], bool]:
+        """Parent chain of node by following the parent pointers, see `GraphBase.ancestors`."""
+        i = self._id(node)
+        if i is None:
+            return [], False
+        chain, seen = [], {i}
+        while self.parent[i] >= 0:
+            rel_type = RR.TYPES[self.parent_type[i]]
+            i = int(self.parent[i])
+            chain.append((i, rel_type))
+            if i in seen:
+                return [(self.graph.node_key(j), t) for j, t in chain], True
+            seen.add(i)
+        return [(self.graph.node_key(j), t) for j, t in chain], False
+
+    def direct_graph(self, node: str) -> CSRGraph:
+        """The graph of node via direct and branch relationships, from the group members."""
+        group = self.group_of(node)
+        if group is None:
+            return self.graph.sub(node)
+        return self.graph.extract(self.group_members(group), exclude=(RR.ULTIMATE,))
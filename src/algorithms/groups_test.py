@@ -0,0 +1,99 @@
+import pytest
+from graph import RR, CSRGraph
+from groups import GroupIndex
+
+
+@pytest.fixture
+def network():
+    #        UP           branch of C1
+    #       /  \           /
+    #     P1    P2 <-- C1 <-- B1
+    #     |
+    #    ROI  *** ultimate parent of ROI, P1, C1: UP
+    #
+    #    X <-> Y <-- Z     (cycle)
+    return CSRGraph([
+        RR('P1', 'UP', RR.DIRECT),
+        RR('P2', 'UP', RR.DIRECT),
+        RR('ROI', 'P1', RR.DIRECT),
+        RR('C1', 'P2', RR.DIRECT),
+        RR('B1', 'C1', RR.BRANCH),
+        RR('ROI', 'UP', RR.ULTIMATE),
+        RR('P1', 'UP', RR.ULTIMATE),
+        RR('C1', 'UP', RR.ULTIMATE),
+        RR('ROI', 'OTHER', RR.ULTIMATE),
+        RR('X', 'Y', RR.DIRECT),
+        RR('Y', 'X', RR.DIRECT),
+        RR('Z', 'Y', RR.DIRECT),
+    ])
+
+
+def test_groups(network):
+    """Tests group membership, roots and levels of a small network.
+
+    Args:
+        network (CSRGraph): The network to index.
+    """
+    index = GroupIndex(network)
+
+    assert index.group_of('ROI') == index.group_of('UP') == index.group_of('B1')
+    assert index.group_of('OTHER') != index.group_of('UP')
+    assert index.group_of('X') == index.group_of('Z')
+    assert index.group_of('UNKNOWN') is None
+    assert index.group_size('ROI') == 6
+    assert index.group_size('UNKNOWN') == 1
+
+    assert {n: index.root_of(n) for n in ('ROI', 'P1', 'UP', 'B1', 'OTHER')} == {
+        'ROI': 'UP', 'P1': 'UP', 'UP': 'UP', 'B1': 'UP', 'OTHER': 'OTHER',
+    }
+    assert {n: index.level_of(n) for n in ('UP', 'P1', 'ROI', 'C1', 'B1')} == {
+        'UP': 0, 'P1': 1, 'ROI': 2, 'C1': 2, 'B1': 3,
+    }
+
+    assert index.ultimate_parent_of('ROI') == 'UP'
+    assert index.ultimate_parent_of('P2') is None
+
+
+def test_groups_with_cycle(network):
+    """Tests that nodes on and below a cycle get a root on the cycle."""
+    index = GroupIndex(network)
+
+    assert index.root_of('X') == index.root_of('Y') == index.root_of('Z')
+    assert index.root_of('X') in ('X', 'Y')
+    assert index.level_of(index.root_of('X')) == 0
+    assert sorted([index.level_of('X'), index.level_of('Y')]) == [0, 1]
+    assert index.level_of('Z') == index.level_of('Y') + 1
+
+
+def test_direct_graph(network):
+    """Tests that the direct graph of a group equals the traversed one."""
+    index = GroupIndex(network)
+
+    for node in ('ROI', 'B1', 'X', 'OTHER', 'UNKNOWN'):
+        expected = network.sub(node, exclude=(RR.ULTIMATE,))
+        direct_graph = index.direct_graph(node)
+        assert sorted(direct_graph.nodes) == sorted(expected.nodes)
+        assert sorted(direct_graph.edges(data='type')) == sorted(expected.edges(data='type'))
+
+
+def test_arrays_round_trip(network):
+    index = GroupIndex(network)
+    restored = GroupIndex.from_arrays(network, index.arrays())
+
+    assert restored.group_of('B1') == index.group_of('B1')
+    assert GroupIndex.from_arrays(network, {}) is None
+
+
+def test_ancestors(network):
+    """Tests that the parent chain from the index equals the traversed one."""
+    index = GroupIndex(network)
+
+    assert index.ancestors('ROI') == ([('P1', RR.DIRECT), ('UP', RR.DIRECT)], False)
+    assert index.ancestors('B1') == ([('C1', RR.BRANCH), ('P2', RR.DIRECT), ('UP', RR.DIRECT)], False)
+    assert index.ancestors('Z') == ([('Y', RR.DIRECT), ('X', RR.DIRECT), ('Y', RR.DIRECT)], True)
+    assert index.ancestors('UP') == ([], False)
+    assert index.ancestors('UNKNOWN') == ([], False)
+
+    network.groups = None
+    for node in ('ROI', 'B1', 'Z', 'X', 'UP', 'UNKNOWN'):
+        assert index.ancestors(node) == network.ancestors(node)
@@ -0,0 +1,210 @@
+"""
+Low overhead counters and histograms, exposed in the Prometheus text format.
+
+Histograms have fixed buckets, so observing a value is a bisection and two additions.
+The stage timers of the structure hot path (`timed`) are off by default; switched off,
+a timer is a shared no-op object and costs one function call.
+"""
+import bisect
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# nodes
+SIZE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: Tuple[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+
+def _number(value) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _header(name: str, documentation: str, kind: str) -> List[str]:
+    return ['# HELP {} {}'.format(name, documentation), '# TYPE {} {}'.format(name, kind)]
+
+
+def _buckets(name: str, names: Sequence[str], values: Sequence, bounds: Sequence[float], counts: Sequence[int],
+             total: float) -> List[str]:
+    """Sample lines of one histogram from the (non-cumulative) counts per bucket, the last one +Inf."""
+    lines, cumulative = [], 0
+    for bound, count in zip(list(bounds) + [math.inf], counts):
+        cumulative += count
+        lines.append('{}_bucket{} {}'.format(name, _labels(names, values, ('le', _number(float(bound)))), cumulative))
+    labels = _labels(names, values)
+    lines.append('{}_sum{} {}'.format(name, labels, _number(total)))
+    lines.append('{}_count{} {}'.format(name, labels, cumulative))
+    return lines
+
+
+class Counter:
+    """Monotonic counter, optionally one per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values: Tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, values: Tuple = ()) -> float:
+        return self._values.get(values, 0)
+
+    def expose(self) -> List[str]:
+        lines = _header(self.name, self.documentation, 'counter')
+        for values, value in sorted(self._values.items()):
+            lines.append('{}{} {}'.format(self.name, _labels(self.labels, values), _number(value)))
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, optionally one per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, values: Tuple = ()):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, values: Tuple = ()) -> int:
+        series = self._series.get(values)
+        return 0 if series is None else sum(series[0])
+
+    def expose(self) -> List[str]:
+        lines = _header(self.name, self.documentation, 'histogram')
+        with self._lock:
+            series = sorted((values, (list(counts), total)) for values, (counts, total) in self._series.items())
+        for values, (counts, total) in series:
+            lines.extend(_buckets(self.name, self.labels, values, self.buckets, counts, total))
+        return lines
+
+
+def gauge(name: str, documentation: str, value: float, kind: str = 'gauge') -> List[str]:
+    """Lines of a single value computed when the metrics are collected."""
+    return _header(name, documentation, kind) + ['{} {}'.format(name, _number(value))]
+
+
+def distribution(name: str, documentation: str, buckets: Sequence[float], values: np.ndarray) -> List[str]:
+    """Lines of a histogram of all values, computed when the metrics are collected."""
+    counts = np.bincount(np.searchsorted(buckets, values, side='left'), minlength=len(buckets) + 1)
+    return _header(name, documentation, 'histogram') + _buckets(name, (), (), buckets, counts.tolist(), values.sum().item())
+
+
+def expose(*families: List[str]) -> bytes:
+    return ('\n'.join(line for lines in families for line in lines) + '\n').encode('utf-8')
+
+
+def rss_bytes() -> int:
+    """Resident set size of the process (the peak where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# stage timers, switched on with `enable_timers`
+STAGES = Histogram('gleif_stage_seconds', 'Time spent in the stages of building and encoding structures.',
+                   LATENCY_BUCKETS, ('stage',))
+timers = False
+
+
+def enable_timers(enabled: bool = True):
+    global timers
+    timers = enabled
+
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = (stage,)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGES.observe(time.perf_counter() - self.started, self.stage)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(stage: str):
+    """Context manager recording its duration as stage in `STAGES`, if the timers are enabled."""
+    return _Timer(stage) if timers else _NO_TIMER
+
+
+def timed_chunks(stage: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Passes chunks through, recording the time spent producing them (not consuming them) as stage."""
+    if not timers:
+        return chunks
+    return _timed_chunks(stage, chunks)
+
+
+def _timed_chunks(stage: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    spent = 0
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        finally:
+            spent += time.perf_counter() - started
+        yield chunk
+    STAGES.observe(spent, (stage,))
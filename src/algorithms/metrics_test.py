@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+import metrics
+from metrics import Counter, Histogram, distribution, expose, gauge
+
+
+@pytest.fixture
+def timers():
+    metrics.enable_timers(True)
+    yield metrics.STAGES
+    metrics.enable_timers(False)
+
+
+def test_counter():
+    requests = Counter('requests_total', 'Requests.', ('endpoint', 'status'))
+    requests.inc(('a', 200))
+    requests.inc(('a', 200), 2)
+    requests.inc(('b"', 404))
+
+    assert requests.value(('a', 200)) == 3
+    assert requests.expose() == [
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{endpoint="a",status="200"} 3',
+        'requests_total{endpoint="b\\"",status="404"} 1',
+    ]
+
+
+def test_histogram():
+    """Tests that buckets are cumulative, with upper bounds included and a +Inf bucket."""
+    latency = Histogram('latency_seconds', 'Latency.', (0.1, 1), ('stage',))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, ('build',))
+
+    assert latency.count(('build',)) == 4
+    assert latency.expose()[2:] == [
+        'latency_seconds_bucket{stage="build",le="0.1"} 2',
+        'latency_seconds_bucket{stage="build",le="1.0"} 3',
+        'latency_seconds_bucket{stage="build",le="+Inf"} 4',
+        'latency_seconds_sum{stage="build"} 3.65',
+        'latency_seconds_count{stage="build"} 4',
+    ]
+
+
+def test_distribution_and_gauge():
+    lines = distribution('group_size', 'Sizes.', (1, 10), np.array([1, 2, 5, 100]))
+
+    assert lines[2:] == [
+        'group_size_bucket{le="1.0"} 1',
+        'group_size_bucket{le="10.0"} 3',
+        'group_size_bucket{le="+Inf"} 4',
+        'group_size_sum 108',
+        'group_size_count 4',
+    ]
+    assert expose(gauge('rss_bytes', 'Memory.', 42)) == b'# HELP rss_bytes Memory.\n# TYPE rss_bytes gauge\nrss_bytes 42\n'
+
+
+def test_timers_off():
+    before = metrics.STAGES.count(('off',))
+    with metrics.timed('off'):
+        pass
+    chunks = iter([b'a'])
+
+    assert metrics.timed_chunks('off', chunks) is chunks
+    assert metrics.STAGES.count(('off',)) == before
+
+
+def test_timers(timers):
+    before = timers.count(('stage',)), timers.count(('encode',))
+    with metrics.timed('stage'):
+        pass
+
+    assert list(metrics.timed_chunks('encode', iter([b'a', b'b']))) == [b'a', b'b']
+    assert (timers.count(('stage',)), timers.count(('encode',))) == (before[0] + 1, before[1] + 1)
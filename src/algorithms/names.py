@@ -0,0 +1,217 @@
+import threading
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from algorithms import parallel, snapshot, sources
+from algorithms.attributes import AttributeStore
+from algorithms.search import SearchIndex
+
+
+class NameIndex:
+    """
+    Compact LEI -> legal name lookup.
+
+    LEIs are kept as a sorted fixed-width byte array and looked up by binary search,
+    the legal names as one contiguous utf-8 buffer (in file order) with offsets; for
+    every LEI, `position` holds the number of its name in the buffer.
+
+    The `SearchIndex` of the names is built with `build_search_index` (or on the first
+    search) and stored with the other arrays, as is the `AttributeStore` of the other
+    columns of the LEI-CDF file (one row per name in the buffer).
+    """
+
+    LEI = 'LEI'
+    LEGAL_NAME = 'Entity.LegalName'
+    NOT_FOUND = 'id not found'
+
+    # rows of the csv file parsed at once
+    CHUNKSIZE = 200000
+
+    def __init__(self, leis: np.ndarray, position: np.ndarray, offsets: np.ndarray, names: np.ndarray,
+                 search_index: SearchIndex = None, attributes: AttributeStore = None):
+        """Initialize the index from its arrays.
+
+        Args:
+            leis (np.ndarray): sorted, unique LEIs (fixed-width bytes).
+            position (np.ndarray): for every LEI, the number of its name in the buffer.
+            offsets (np.ndarray): start of every name in the buffer, plus the end of the buffer.
+            names (np.ndarray): utf-8 encoded legal names (uint8).
+            search_index (SearchIndex): token index of the names, by LEI number.
+            attributes (AttributeStore): entity attributes, by name number (like the offsets).
+        """
+        self._leis = leis
+        self._position = position
+        self._offsets = offsets
+        self._names = names
+        self.search_index = search_index
+        self.attributes = attributes
+        self._search_lock = threading.Lock()
+
+    @classmethod
+    def from_pairs(cls, leis: Iterable[str], names: Iterable[str]) -> 'NameIndex':
+        return cls._merge([cls._encode(list(leis), list(names)) + ({},)])
+
+    @classmethod
+    def from_csv(cls, f: str, workers: int = None) -> 'NameIndex':
+        """Reads the LEI -> legal name csv file (columns `LEI` and `Entity.LegalName`) in chunks.
+
+        Of the other columns only the attributes of `AttributeStore.FIELDS` are parsed (if the
+        file has them), so this reads the full LEI-CDF golden copy as well, also straight from
+        its zip archive or a gzip file (see `algorithms.sources`).
+        With more than one worker, a large plain csv file is parsed by that many processes
+        (see `algorithms.parallel`), with the same result.
+        """
+        if parallel.splittable(f, workers):
+            chunks = [chunk for part in parallel.map_ranges(cls._parse, f, workers) for chunk in part]
+        else:
+            with sources.open_csv(f) as stream:
+                chunks = list(cls._parse(stream))
+        return cls._merge(chunks)
+
+    @classmethod
+    def _parse(cls, stream: BinaryIO) -> Iterator[Tuple[np.ndarray, bytes, np.ndarray, dict]]:
+        import pandas as pd  # not needed to load a snapshot
+
+        columns = {cls.LEI, cls.LEGAL_NAME, *AttributeStore.columns()}
+        for chunk in pd.read_csv(stream, usecols=lambda column: column in columns, dtype=str, chunksize=cls.CHUNKSIZE):
+            chunk = chunk[chunk[cls.LEI].notna()]
+            yield cls._encode(chunk[cls.LEI].values, chunk[cls.LEGAL_NAME].fillna('').tolist()) + (
+                AttributeStore.encode(chunk),)
+
+    @staticmethod
+    def _encode(leis: List[str], names: List[str]) -> Tuple[np.ndarray, bytes, np.ndarray]:
+        """LEIs as fixed-width bytes, the utf-8 encoded names as one buffer and their lengths."""
+        encoded = [name.encode('utf-8') for name in names]
+        return (
+            np.array([lei.encode('utf-8') for lei in leis], dtype='S') if len(leis) else np.empty(0, dtype='S1'),
+            b''.join(encoded),
+            np.array([len(name) for name in encoded], dtype=np.int64),
+        )
+
+    @classmethod
+    def _merge(cls, chunks: List[Tuple[np.ndarray, bytes, np.ndarray, dict]]) -> 'NameIndex':
+        """Index of the encoded chunks, in file order."""
+        leis = np.concatenate([chunk[0] for chunk in chunks]) if chunks else np.empty(0, dtype='S1')
+        offsets = np.zeros(len(leis) + 1, dtype=np.int64)
+        if len(leis):
+            np.cumsum(np.concatenate([chunk[2] for chunk in chunks]), out=offsets[1:])
+
+        # sort by LEI; the first name of a duplicated LEI wins
+        order = np.argsort(leis, kind='stable')
+        leis = leis[order]
+        first = np.ones(len(leis), dtype=bool)
+        first[1:] = leis[1:] != leis[:-1]
+        names = np.frombuffer(b''.join(chunk[1] for chunk in chunks), dtype=np.uint8)
+        attributes = AttributeStore.merge([chunk[3] for chunk in chunks], [len(chunk[0]) for chunk in chunks])
+        return cls(leis[first], order[first].astype(np.int32), offsets, names, attributes=attributes)
+
+    def updated(self, other: 'NameIndex') -> 'NameIndex':
+        """Returns a new index with the entries of both indexes; the names of other take precedence.
+
+        The name buffers are concatenated, so names that other replaces stay in the buffer unused.
+        Entries of other without attributes (e.g. from a file with just LEIs and names) have none.
+        """
+        leis = np.concatenate([other._leis, self._leis])
+        position = np.concatenate([other._position.astype(np.int64) + len(self._offsets) - 1, self._position])
+        offsets = np.concatenate([self._offsets[:-1], other._offsets + self._offsets[-1]])
+        names = np.concatenate([self._names, other._names])
+
+        # other comes first, so after a stable sort its entry of a duplicated LEI wins
+        order = np.argsort(leis, kind='stable')
+        leis = leis[order]
+        first = np.ones(len(leis), dtype=bool)
+        first[1:] = leis[1:] != leis[:-1]
+        attributes = AttributeStore.concatenate([(self.attributes, len(self._offsets) - 1),
+                                                 (other.attributes, len(other._offsets) - 1)])
+        return NameIndex(leis[first], position[order][first].astype(np.int32), offsets, names, attributes=attributes)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str = 'lookup_') -> 'NameIndex':
+        return cls(*(arrays[prefix + name] for name in ('lei', 'position', 'offsets', 'names')),
+                   search_index=SearchIndex.from_arrays(arrays), attributes=AttributeStore.from_arrays(arrays))
+
+    def arrays(self, prefix: str = 'lookup_') -> dict:
+        arrays = {
+            prefix + 'lei': self._leis,
+            prefix + 'position': self._position,
+            prefix + 'offsets': self._offsets,
+            prefix + 'names': self._names,
+        }
+        if self.search_index is not None:
+            arrays.update(self.search_index.arrays())
+        if self.attributes is not None:
+            arrays.update(self.attributes.arrays())
+        return arrays
+
+    def save(self, path: str) -> dict:
+        return snapshot.write(path, self.arrays(), {'entries': len(self)})
+
+    @classmethod
+    def load(cls, path: str, verify: bool = False) -> 'NameIndex':
+        """Memory-maps an index written by `save` (or the name table of a graph snapshot)."""
+        arrays, _ = snapshot.read(path, verify=verify)
+        return cls.from_arrays(arrays)
+
+    def __len__(self) -> int:
+        return len(self._leis)
+
+    def __contains__(self, lei: str) -> bool:
+        return self._find([lei])[0] >= 0
+
+    def _find(self, leis: List[str]) -> np.ndarray:
+        """Returns the index of every LEI in the sorted array, -1 if it is unknown."""
+        found = np.full(len(leis), -1, dtype=np.int64)
+        if not len(leis) or not len(self._leis):
+            return found
+        query = np.array([lei.encode('utf-8') if isinstance(lei, str) else b'' for lei in leis], dtype='S')
+        i = np.minimum(np.searchsorted(self._leis, query), len(self._leis) - 1)
+        hit = self._leis[i] == query
+        found[hit] = i[hit]
+        return found
+
+    def _iter_names(self) -> Iterator[str]:
+        """Names of all LEIs, in LEI order."""
+        names, offsets = self._names, self._offsets
+        for p in self._position.tolist():
+            yield names[offsets[p]:offsets[p + 1]].tobytes().decode('utf-8')
+
+    def build_search_index(self) -> SearchIndex:
+        """Builds the search index of the names, unless there is one; returns it."""
+        with self._search_lock:
+            if self.search_index is None:
+                self.search_index = SearchIndex.from_names(self._iter_names())
+            return self.search_index
+
+    def search(self, query: str, limit: int = 10, filters: Dict[str, str] = None) -> List[Tuple[str, str]]:
+        """Returns the LEIs and names best matching query, best first (see `SearchIndex`).
+
+        With filters (attribute name -> value), only entities with these attribute values are returned.
+        """
+        allowed = None
+        if filters:
+            if self.attributes is None:
+                return []
+            allowed = self.attributes.matches(filters)[self._position]
+        hits = self.build_search_index().search(query, limit, allowed)
+        return [(self._leis[i].decode('utf-8'), self._name(i)) for i, _ in hits]
+
+    def attribute_values(self, leis: List[str], names: Iterable[str]) -> Dict[str, List[Union[str, None]]]:
+        """Returns the values of the attributes names of all leis at once (None if unknown or missing)."""
+        if self.attributes is None:
+            return {name: [None] * len(leis) for name in names}
+        found = self._find(leis)
+        rows = np.where(found >= 0, self._position[np.maximum(found, 0)] if len(self) else 0, -1)
+        return {name: self.attributes.get(name, rows) for name in names}
+
+    def _name(self, i: int) -> str:
+        p = int(self._position[i])
+        return self._names[self._offsets[p]:self._offsets[p + 1]].tobytes().decode('utf-8')
+
+    def label(self, lei: str) -> str:
+        """Returns the legal name of lei or 'id not found'."""
+        return self.labels([lei])[0]
+
+    def labels(self, leis: List[str]) -> List[str]:
+        """Returns the legal names of all leis at once ('id not found' for unknown ones)."""
+        return [self._name(i) if i >= 0 else self.NOT_FOUND for i in self._find(leis).tolist()]
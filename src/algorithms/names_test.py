@@ -0,0 +1,62 @@
+import pytest
+from os import path
+from names import NameIndex
+
+
+@pytest.fixture
+def lookup_test_csv(request):
+    return path.join(request.config.rootdir, 'src/test_data', 'lei-test.csv')
+
+
+def test_from_csv(lookup_test_csv):
+    """Tests reading the LEI -> legal name csv file.
+
+    Args:
+        lookup_test_csv (str): Path to the CSV file containing lookup table data.
+    """
+    names = NameIndex.from_csv(lookup_test_csv)
+
+    assert len(names) == 3
+    assert 'LEI_2' in names
+    assert 'LEI_4' not in names
+    assert names.label('LEI_1') == 'company1'
+    assert names.label('LEI_4') == 'id not found'
+
+
+def test_labels():
+    """Tests the batch lookup with unsorted, duplicate, unknown and unicode entries."""
+    names = NameIndex.from_pairs(
+        ['LEI_B', 'LEI_A', 'LEI_C', 'LEI_A', 'LEI_D'],
+        ['Bäckerei B', 'A first', 'C', 'A second', ''],
+    )
+
+    assert len(names) == 4
+    assert names.labels(['LEI_A', 'LEI_B', 'LEI_X', 'LEI_C', 'LEI_D', 'LEI_A_LONGER', 'LEI']) == [
+        'A first', 'Bäckerei B', 'id not found', 'C', '', 'id not found', 'id not found',
+    ]
+    assert names.labels([]) == []
+    assert NameIndex.from_pairs([], []).labels(['LEI_A']) == ['id not found']
+
+
+def test_save_and_load(tmpdir, lookup_test_csv):
+    """Tests that a saved index is memory-mapped with the same content."""
+    f = str(tmpdir.join('names.snapshot'))
+    NameIndex.from_csv(lookup_test_csv).save(f)
+
+    names = NameIndex.load(f, verify=True)
+
+    assert names.labels(['LEI_3', 'LEI_1', 'LEI_0']) == ['company3', 'company1', 'id not found']
+    assert not names.arrays()['lookup_names'].flags.writeable
+
+
+def test_search(tmpdir):
+    """Tests the name search, also after a snapshot round trip."""
+    names = NameIndex.from_pairs(['LEI_B', 'LEI_A', 'LEI_C'], ['Nordic Trading AB', 'Nordic Bank', 'Atlantic Bank'])
+    assert names.search('bank') == [('LEI_A', 'Nordic Bank'), ('LEI_C', 'Atlantic Bank')]
+    assert names.search('nordic tr') == [('LEI_B', 'Nordic Trading AB')]
+
+    f = str(tmpdir.join('names.snapshot'))
+    names.save(f)
+    loaded = NameIndex.load(f)
+    assert loaded.search_index is not None
+    assert loaded.search('atlantc') == [('LEI_C', 'Atlantic Bank')]
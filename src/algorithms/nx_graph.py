@@ -0,0 +1,239 @@
+"""
+The networkx backend: `Graph`, the relationship graph as a networkx `MultiDiGraph`.
+
+It is imported only when it is used (see `algorithms.graph.BACKENDS`), so servers with
+the csr backend never import networkx.
+"""
+import copy
+from collections import deque
+from itertools import chain
+from typing import Iterable, Iterator, List, Tuple, Union
+
+import networkx as nx
+import numpy as np
+
+from algorithms.graph import RR, GraphBase
+
+
+class Graph(GraphBase, nx.MultiDiGraph):
+    """
+    Network of legal entities (nodes, identified by their LEI) connected by
+    relationship records (edges, pointing from child to parent).
+    """
+
+    def __init__(self, rr: Iterable[RR] = (), **attr):
+        """
+        Initialize the RRGraph object with an iterator of RR objects.
+
+        Args:
+            rr (Iterator[RR]): An iterator containing RR (Resource Record) objects to be loaded into the graph.
+
+        Returns:
+            None: This method doesn't return anything; it initializes the object's attributes.
+        """
+        super().__init__(**attr)
+        for r in rr:
+            self.add_rr(r)
+
+    def add_rr(self, rr: RR):
+        """Adds a relationship record as edge; duplicate relationships end up unique."""
+        existing = self.get_edge_data(rr.start, rr.end) or {}
+        if any(data.get('type') == rr.rel_type for data in existing.values()):
+            return
+        self.add_edge(rr.start, rr.end, type=rr.rel_type)
+
+    @classmethod
+    def from_csv(cls, f: str, limit: Union[int, None] = None, workers: Union[int, None] = None) -> 'Graph':
+        """Reads a GLEIF relationship record (RR-CDF) csv file.
+
+        Arguments:
+            f {str} -- path to the csv file, its zip archive or a gzip file
+
+        Keyword Arguments:
+            limit {int} -- read only the first `limit` records (default: {None})
+            workers {int} -- number of processes parsing a large csv file; the graph is the same (default: {None}, one)
+
+        Returns:
+            Graph -- graph containing all relationships of the file
+        """
+        return cls.from_chunks(cls.read_rr_csv(f, limit, workers))
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> 'Graph':
+        g = cls()
+        for start, end, rel_type in chunks:
+            for rr in zip(start, end, rel_type):
+                g.add_rr(RR(*rr))
+        return g
+
+    @classmethod
+    def from_graph(cls, other: GraphBase) -> 'Graph':
+        """Converts a graph of any backend, keeping node order, edge keys and node attributes."""
+        if isinstance(other, Graph):
+            return other
+        g = cls()
+        g.add_nodes_from(other.nodes(data=True))
+        g.add_edges_from((u, v, k, {'type': t}) for u, v, k, t in other.edges(keys=True, data='type'))
+        return g
+
+    def deepcopy(self) -> 'Graph':
+        return copy.deepcopy(self)
+
+    def _get_parent(self, node: str, rel_type: str) -> Union[str, None]:
+        if node not in self:
+            return None
+        for _, parent, edge_type in self.out_edges(node, data='type'):
+            if edge_type == rel_type:
+                return parent
+        return None
+
+    def children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> List[Tuple[str, str]]:
+        if node not in self:
+            return []
+        return sorted((child, edge_type) for child, _, edge_type in self.in_edges(node, data='type') if edge_type not in exclude)
+
+    def count_children(self, node: str, exclude: Iterable[str] = (RR.ULTIMATE,)) -> int:
+        if node not in self:
+            return 0
+        return sum(1 for _, _, edge_type in self.in_edges(node, data='type') if edge_type not in exclude)
+
+    def remove_edge_type(self, rel_type: str) -> 'Graph':
+        """Removes all edges of the given relationship type (in place)."""
+        self.remove_edges_from([
+            (u, v, k) for u, v, k, edge_type in self.edges(keys=True, data='type') if edge_type == rel_type
+        ])
+        return self
+
+    def updated(self, add: Iterable[RR] = (), remove: Iterable[RR] = ()) -> 'Graph':
+        """Returns a new graph without the relationships in remove and with those in add.
+
+        The whole graph is copied: networkx graphs share no adjacency between copies, so every
+        delta costs time and memory proportional to the graph, like `CSRGraph.updated`.
+        """
+        g = self.copy()
+        for rr in remove:
+            edges = g.get_edge_data(rr.start, rr.end) or {}
+            g.remove_edges_from([(rr.start, rr.end, k) for k, data in list(edges.items()) if data.get('type') == rr.rel_type])
+        for rr in add:
+            g.add_rr(rr)
+        return g
+
+    def without(self, exclude: Iterable[str] = ()):
+        """Returns a read-only view of the graph that hides edges of the excluded relationship types.
+
+        Nothing is copied; the view reflects the underlying graph.
+        """
+        exclude = frozenset(exclude)
+        if not exclude:
+            return self
+
+        def keep(u, v, k):
+            return self._succ[u][v][k].get('type') not in exclude
+
+        return nx.subgraph_view(self, filter_edge=keep)
+
+    def sub(self, node: str, exclude: Iterable[str] = ()) -> 'Graph':
+        """Extracts the (weakly) connected graph of node.
+
+        Only the neighbourhood of node is visited and copied, the graph itself is not modified.
+
+        Arguments:
+            node {str} -- lei of node
+
+        Keyword Arguments:
+            exclude {Iterable[str]} -- relationship types that are not followed nor copied (default: {()})
+
+        Returns:
+            Graph -- new graph with all nodes connected to node; only node if it is not in the graph
+        """
+        return self.neighbourhood(node, exclude)[0]
+
+    def neighbourhood(self, node: str, exclude: Iterable[str] = (), max_depth: int = None,
+                      max_nodes: int = None) -> Tuple['Graph', bool]:
+        """Extracts the nodes (weakly) connected to node within max_depth steps, at most max_nodes of them.
+
+        Nodes are visited breadth first, so the nearest nodes are kept; edges are copied if
+        both their nodes are.
+
+        Returns:
+            tuple -- new graph and whether nodes were left out because of the limits
+        """
+        sub = self.__class__()
+        if node not in self:
+            sub.add_node(node)
+            return sub, False
+
+        view = self.without(exclude)
+        seen = {node}
+        order = [node]
+        frontier = [node]
+        depth = 0
+        truncated = False
+        while frontier and not truncated:
+            neighbours = (m for n in frontier for m in chain(view.successors(n), view.predecessors(n)) if m not in seen)
+            if max_depth is not None and depth >= max_depth:
+                truncated = next(neighbours, None) is not None
+                break
+            found = []
+            for m in neighbours:
+                if max_nodes is not None and len(order) >= max_nodes:
+                    truncated = True
+                    break
+                seen.add(m)
+                order.append(m)
+                found.append(m)
+            frontier = found
+            depth += 1
+
+        for n in order:
+            sub.add_node(n, **self._node[n])
+        for n in order:
+            for u, v, k, data in view.out_edges(n, keys=True, data=True):
+                if v in seen:
+                    sub.add_edge(u, v, key=k, **data)
+        return sub, truncated
+
+    def merge(self, other: 'Graph') -> 'Graph':
+        """Returns a new graph containing the nodes and edges of both graphs."""
+        return nx.compose(self, other)
+
+    def set_levels(self, root: str) -> 'Graph':
+        """Sets the hierarchy level of every node (in place).
+
+        The connected graph of root is leveled from its top (level 0) downwards, children
+        are one level below their parents. Graphs that are not connected to root are hung
+        below the top level and their topmost nodes are flagged with `no_parent`.
+        """
+        visited = set()
+        starts = chain([root] if root in self else [], self.nodes)
+        for start in starts:
+            if start in visited:
+                continue
+            levels = {start: 0}
+            queue = deque([start])
+            while queue:
+                n = queue.popleft()
+                for parent in self.successors(n):
+                    if parent not in levels:
+                        levels[parent] = levels[n] - 1
+                        queue.append(parent)
+                for child in self.predecessors(n):
+                    if child not in levels:
+                        levels[child] = levels[n] + 1
+                        queue.append(child)
+
+            connected_to_root = root in levels
+            offset = min(levels.values()) - (0 if connected_to_root or root not in self else 1)
+            for n, level in levels.items():
+                self._node[n]['level'] = level - offset
+                self._node[n]['no_parent'] = not connected_to_root and self.out_degree(n) == 0
+            visited.update(levels)
+        return self
+
+    def _node_columns(self) -> Tuple[List[str], List, List]:
+        nodes = list(self.nodes(data=True))
+        return [n for n, _ in nodes], [data.get('level') for _, data in nodes], [data.get('no_parent') for _, data in nodes]
+
+    def _edge_columns(self) -> Tuple[List[str], List[str], List[str]]:
+        edges = list(self.edges(data='type'))
+        return [u for u, _, _ in edges], [v for _, v, _ in edges], [t for _, _, t in edges]
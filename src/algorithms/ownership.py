@@ -0,0 +1,92 @@
+"""
+Effective ownership of the members of a structure by its root.
+
+The ownership of a direct parent in its child is the percentage the relationship record
+reports (see `RelationshipPeriods.shares`); a branch belongs to its head office entirely.
+The effective ownership of a node is the product of the shares along every path of
+relationships from the node up to the root, summed over all paths. It is computed in one
+topological pass from the root downwards, a whole layer of nodes at a time: a node is
+done once all of its parents are, so every path is added exactly once without following
+the paths one by one.
+
+Nodes that are not below the root are owned by 0, nodes on a cycle and nodes with a path
+of unknown shares have no (None) ownership.
+"""
+from typing import Iterable, List, Union
+
+import numpy as np
+
+from algorithms.graph import RR, CSRGraph, GraphBase, _expand, _ptr
+from algorithms.periods import RelationshipPeriods
+
+
+def effective_ownership(n: int, child: np.ndarray, parent: np.ndarray, share: np.ndarray, root: int) -> np.ndarray:
+    """Effective ownership by root of n nodes, given the relationships child -> parent with their shares.
+
+    Arguments:
+        n {int} -- number of nodes
+        child {np.ndarray} -- start node ids of the relationships
+        parent {np.ndarray} -- end node ids of the relationships
+        share {np.ndarray} -- fraction of child owned by parent, NaN if unknown
+        root {int} -- id of the owning node
+
+    Returns:
+        np.ndarray -- fraction of every node owned by root, NaN if unknown
+    """
+    # the parents of root do not add to its ownership of itself
+    keep = child != root
+    child, parent, share = child[keep], parent[keep], share[keep]
+    by_parent = np.argsort(parent, kind='stable')
+    ptr = _ptr(parent[by_parent], n)
+
+    owned = np.zeros(n)
+    owned[root] = 1
+    waiting = np.bincount(child, minlength=n)
+    done = np.zeros(n, dtype=bool)
+    layer = np.flatnonzero(waiting == 0)
+    while len(layer):
+        done[layer] = True
+        edges = by_parent[_expand(ptr, layer)]
+        owner = owned[parent[edges]]
+        # nothing owned is nothing owned, also if the share is unknown
+        np.add.at(owned, child[edges], np.where(owner == 0, 0, owner * share[edges]))
+        np.subtract.at(waiting, child[edges], 1)
+        layer = np.unique(child[edges][waiting[child[edges]] == 0])
+    owned[~done] = np.nan
+    return owned
+
+
+def annotate(graph: GraphBase, root: str, periods: RelationshipPeriods, filters: Iterable = ()) -> GraphBase:
+    """Sets `ownership` of graph (a structure): the effective ownership of every node by root.
+
+    Arguments:
+        graph {GraphBase} -- structure
+        root {str} -- lei of the owning node
+        periods {RelationshipPeriods} -- the shares of the relationships
+
+    Keyword Arguments:
+        filters {Iterable} -- as of date, status and registration statuses of the records whose shares
+            are used (see `RelationshipPeriods.shares`) (default: {()}, any record)
+
+    Returns:
+        GraphBase -- graph
+    """
+    g = CSRGraph.from_graph(graph)
+    nodes = g._decode(g._keys)
+    src, dst, types = g.edge_arrays()
+    owning = types != RR.TYPES.index(RR.ULTIMATE)
+    src, dst, types = src[owning], dst[owning], types[owning]
+
+    share = np.ones(len(src))
+    direct = np.flatnonzero(types == RR.TYPES.index(RR.DIRECT))
+    share[direct] = periods.shares([nodes[i] for i in src[direct].tolist()], [nodes[i] for i in dst[direct].tolist()],
+                                   RR.DIRECT, *filters)
+    root_id = g._id(root)
+    owned = effective_ownership(g.number_of_nodes(), src, dst, share, root_id) if root_id >= 0 else \
+        np.zeros(g.number_of_nodes())
+    graph.ownership = dict(zip(nodes, _rounded(owned)))
+    return graph
+
+
+def _rounded(owned: np.ndarray) -> List[Union[float, None]]:
+    return [None if value != value else value for value in np.round(owned, 6).tolist()]
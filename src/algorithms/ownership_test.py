@@ -0,0 +1,85 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+from graph import CSRGraph, Graph
+from graph_builder import DirectNodeGraphWithParentNetworkBuilder
+from ownership import annotate, effective_ownership
+from periods import RelationshipPeriods
+
+COLUMNS = ('Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+           'Relationship.RelationshipStatus,Registration.LastUpdateDate,'
+           'Relationship.Period.1.startDate,Relationship.Period.1.endDate,Relationship.Period.1.periodType,'
+           'Relationship.Quantifiers.1.QuantifierAmount,Relationship.Quantifiers.1.QuantifierUnits,'
+           'Relationship.Quantifiers.2.QuantifierAmount,Relationship.Quantifiers.2.QuantifierUnits')
+
+
+@pytest.fixture
+def rr_csv(tmpdir):
+    """R owns A and B, which own C together; R held 80% of A until 2019. D is a branch of C, E has no share."""
+    tmpdir.join('rr.csv').write('\n'.join([
+        COLUMNS,
+        'A,R,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE,2019-01-01T00:00:00Z,2010-01-01T00:00:00Z,2018-12-31T00:00:00Z,'
+        'RELATIONSHIP_PERIOD,80,PERCENTAGE,,',
+        'A,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,2019-01-01T00:00:00Z,,RELATIONSHIP_PERIOD,'
+        '1000000,EUR,60.00,PERCENTAGE',
+        'B,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,,,,40,PERCENTAGE,,',
+        'C,A,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,,,,50,PERCENTAGE,,',
+        'C,B,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,,,,50,PERCENTAGE,,',
+        'C,R,IS_ULTIMATELY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,,,,,,,',
+        'D,C,IS_INTERNATIONAL_BRANCH_OF,ACTIVE,2019-01-01T00:00:00Z,,,,,,,',
+        'E,C,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,,,,,,,',
+    ]) + '\n')
+    return str(tmpdir.join('rr.csv'))
+
+
+def test_effective_ownership():
+    """Tests shares multiplied along paths and summed over them, for a diamond, a cycle and an unrelated node."""
+    # 0 owns 1 (60%) and 2 (40%), which own 3 (50% each); 4 and 5 own each other; 6 is not related
+    child = np.array([1, 2, 3, 3, 4, 5, 3])
+    parent = np.array([0, 0, 1, 2, 5, 4, 4])
+    share = np.array([0.6, 0.4, 0.5, 0.5, 1.0, 1.0, 0.1])
+    owned = effective_ownership(7, child, parent, share, 0)
+
+    assert owned[:3].tolist() == pytest.approx([1, 0.6, 0.4])
+    # 3 is also owned by the cycle
+    assert np.isnan(owned[3:6]).all()
+    assert owned[6] == 0
+
+    owned = effective_ownership(7, child[:4], parent[:4], np.array([0.6, np.nan, 0.5, 0.5]), 0)
+    assert owned[1] == pytest.approx(0.6) and np.isnan(owned[2]) and np.isnan(owned[3])
+    # nodes above the root are not owned by it
+    assert effective_ownership(7, child[:4], parent[:4], share[:4], 1).tolist()[:4] == [0, 1, 0, 0.5]
+
+
+def test_shares(rr_csv):
+    periods = RelationshipPeriods.from_csv(rr_csv)
+
+    shares = periods.shares(['A', 'B', 'C', 'E', 'X'], ['R', 'R', 'A', 'C', 'R'], status='ACTIVE')
+    assert shares[:3].tolist() == pytest.approx([0.6, 0.4, 0.5])
+    assert np.isnan(shares[3:]).all()
+    assert periods.shares(['A'], ['R'], as_of=date(2015, 1, 1)).tolist() == pytest.approx([0.8])
+    # the last record reporting a share
+    assert periods.shares(['A'], ['R']).tolist() == pytest.approx([0.6])
+
+
+@pytest.mark.parametrize('graph_cls', [Graph, CSRGraph])
+def test_structure_ownership(rr_csv, graph_cls):
+    g = graph_cls.from_csv(rr_csv)
+    g.read_periods(rr_csv)
+    graph = DirectNodeGraphWithParentNetworkBuilder().structure_graph(g, 'C')
+    annotate(graph, 'R', g.periods, (None, 'ACTIVE', ()))
+
+    array = graph.to_array()
+    assert {n['id']: n['ownership'] for n in array['nodes']} == {
+        'R': 1.0, 'A': 0.6, 'B': 0.4, 'C': 0.5, 'D': 0.5, 'E': None,
+    }
+    expected = json.dumps(array, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assert b''.join(graph.iter_json(2)) == expected
+    assert graph.to_columns()['nodes']['ownership'] == [n['ownership'] for n in array['nodes']]
+
+    as_of = DirectNodeGraphWithParentNetworkBuilder().structure_graph(g.history(as_of=date(2015, 1, 1)), 'A')
+    annotate(as_of, 'R', g.periods, (date(2015, 1, 1), None, ()))
+    # the relationships without period are valid then, too
+    assert as_of.ownership == {'R': 1.0, 'A': 0.8, 'B': 0.4, 'C': 0.6, 'D': 0.6, 'E': None}
@@ -0,0 +1,118 @@
+"""
+Parallel parsing of large csv files in a process pool.
+
+The file is split into byte ranges of about `RANGE_BYTES` that start at the beginning
+of a record: a line end only ends a record if it is not inside a quoted field, which
+one sequential pass counting the quotes tells (escaped quotes come in pairs). Every
+range is parsed by a worker process with the header line put in front of it; the
+results are returned in file order, so merging them gives exactly what parsing the
+whole file in one process gives.
+
+Only plain csv files are split; compressed ones can only be read from the start.
+"""
+import io
+import multiprocessing
+import os
+from collections import deque
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Tuple
+
+from algorithms import sources
+
+# bytes parsed by a worker at once; bounds the memory of the workers
+RANGE_BYTES = 32 * 2 ** 20
+# bytes read at once while looking for the record boundaries
+_BLOCK = 16 * 2 ** 20
+
+
+def record_starts(stream: BinaryIO, targets: Iterable[int]) -> List[int]:
+    """Start of the first record at or after every target offset (ascending), in one pass over stream.
+
+    Targets inside the last record give no start, so there may be fewer starts than targets.
+    """
+    targets = list(targets)
+    starts, inside, pos, k = [], False, 0, 0
+    while k < len(targets):
+        block = stream.read(_BLOCK)
+        if not block:
+            break
+        i = 0
+        while k < len(targets):
+            t = targets[k] - pos
+            if t >= len(block):
+                break
+            t = max(t, i)
+            inside ^= block.count(b'"', i, t) & 1
+            end = block.find(b'\n', t)
+            if end < 0:
+                i = t
+                break
+            inside ^= block.count(b'"', t, end) & 1
+            i = end + 1
+            if inside:
+                # a line break in a quoted field, look further
+                targets[k] = pos + i
+            else:
+                starts.append(pos + i)
+                k += 1
+        inside ^= block.count(b'"', i) & 1
+        pos += len(block)
+    return starts
+
+
+def ranges(f: str, range_bytes: int = None) -> Tuple[int, List[Tuple[int, int]]]:
+    """Splits a csv file into byte ranges of whole records.
+
+    Returns:
+        tuple -- length of the header line and the (start, end) offsets of the ranges after it
+    """
+    range_bytes = range_bytes or RANGE_BYTES
+    size = os.path.getsize(f)
+    with open(f, 'rb') as stream:
+        starts = record_starts(stream, range(0, size, range_bytes))
+    if not starts:
+        return size, []
+    header, starts = starts[0], sorted(set(starts))
+    bounds = starts + [size] if starts[-1] < size else starts
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def splittable(f: str, workers: int) -> bool:
+    """Whether f is worth parsing with `map_ranges`: more than one worker and range, and not compressed."""
+    return bool(workers) and workers > 1 and os.path.getsize(f) > RANGE_BYTES and sources.compression(f) is None
+
+
+def _parse_range(parse: Callable[[BinaryIO], Iterator], f: str, header: int, start: int, end: int) -> list:
+    with open(f, 'rb') as stream:
+        head = stream.read(header)
+        stream.seek(start)
+        body = stream.read(end - start)
+    return list(parse(io.BytesIO(head + body)))
+
+
+def map_ranges(parse: Callable[[BinaryIO], Iterator], f: str, workers: int) -> Iterator[list]:
+    """Parses the ranges of f in worker processes; yields the chunks of every range in file order.
+
+    At most two ranges per worker are parsed or waiting to be taken at a time, so the
+    parsed chunks are not piling up faster than they are consumed.
+
+    Arguments:
+        parse {Callable} -- picklable function of a binary csv stream (with header) yielding chunks
+        f {str} -- path of a plain csv file
+        workers {int} -- number of worker processes
+    """
+    header, parts = ranges(f)
+    workers = min(workers, max(len(parts), 1))
+    # new interpreters rather than forks of a process that may be running other threads
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(workers)
+    try:
+        pending = deque()
+        for start, end in parts:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(_parse_range, (parse, f, header, start, end)))
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
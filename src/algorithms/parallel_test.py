@@ -0,0 +1,67 @@
+import io
+from os import path
+
+import numpy as np
+import pytest
+import graph
+from graph import CSRGraph, Graph
+from names import NameIndex
+from parallel import ranges, record_starts
+
+
+@pytest.fixture
+def rr_test_csv(request):
+    return path.join(request.config.rootdir, 'src/test_data', 'rr-test.csv')
+
+
+@pytest.fixture
+def quoted_csv(tmpdir):
+    """LEI file with quoted names containing separators, escaped quotes and line breaks."""
+    rows = ['LEI,Entity.LegalName,Entity.LegalJurisdiction']
+    for i in range(200):
+        name = ['Plain {}'.format(i), '"Comma, {} Ltd"'.format(i), '"Line\nbreak {}"'.format(i),
+                '"Quote ""{}"" Inc"'.format(i), '"""\n{}\n"""'.format(i)][i % 5]
+        rows.append('LEI_{:04d},{},DE'.format(i, name))
+    f = str(tmpdir.join('lei.csv'))
+    with open(f, 'w', newline='') as out:
+        out.write('\r\n'.join(rows) + '\r\n')
+    return f
+
+
+def test_record_starts():
+    data = b'a,b\n1,"x\ny"\n2,"""\n"\n3,z\n'
+    starts = record_starts(io.BytesIO(data), range(len(data)))
+
+    assert sorted(set(starts)) == [4, 12, 20, 24]
+
+
+def test_ranges(quoted_csv):
+    """Tests that the ranges cover the file after the header, each starting at a record."""
+    header, parts = ranges(quoted_csv, range_bytes=100)
+    with open(quoted_csv, 'rb') as f:
+        data = f.read()
+
+    assert data[:header] == b'LEI,Entity.LegalName,Entity.LegalJurisdiction\r\n'
+    assert len(parts) > 10
+    assert parts[0][0] == header and parts[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(parts, parts[1:]))
+    assert all(data[start:start + 4] == b'LEI_' for start, _ in parts)
+
+
+def test_parallel_equals_sequential(monkeypatch, quoted_csv, rr_test_csv):
+    """Tests that parsing in worker processes gives exactly the result of a single process."""
+    monkeypatch.setattr(graph.parallel, 'RANGE_BYTES', 100)
+
+    names, expected = NameIndex.from_csv(quoted_csv, workers=3), NameIndex.from_csv(quoted_csv)
+    assert names.arrays().keys() == expected.arrays().keys()
+    for name, array in expected.arrays().items():
+        assert np.array_equal(names.arrays()[name], array)
+    assert names.label('LEI_0004') == '"\n4\n"'
+
+    csr, expected = CSRGraph.from_csv(rr_test_csv, workers=3), CSRGraph.from_csv(rr_test_csv)
+    assert list(csr.nodes) == list(expected.nodes)
+    for a, b in zip(csr.edge_arrays(), expected.edge_arrays()):
+        assert np.array_equal(a, b)
+
+    g = Graph.from_csv(rr_test_csv, workers=3)
+    assert list(g.edges(keys=True, data='type')) == list(Graph.from_csv(rr_test_csv).edges(keys=True, data='type'))
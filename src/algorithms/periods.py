@@ -0,0 +1,265 @@
+from datetime import date
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from algorithms import parallel, sources
+from algorithms.graph import RR, CSRGraph, GraphBase, _EdgeCollector, _expand, _ptr
+
+
+class RelationshipPeriods:
+    """
+    All relationships of a RR-CDF file, active and inactive ones, with the period of each record.
+
+    The relationships form a `CSRGraph` of their own (the history graph); every edge has
+    one or more records (the same relationship may have ended and started again), kept
+    grouped by edge like a CSR adjacency:
+
+        - start, end: first and last day of the relationship period (days since 1970-01-01);
+          without a start date it has always been valid, an active one without end date
+          still is, an inactive one without end date ended on its last update
+        - active: the relationship status
+        - registration: the registration status (index into `REGISTRATION_STATUSES`, -1 if unknown)
+        - share: the reported ownership (first quantifier in `PERCENTAGE` units) as a fraction, NaN if none
+
+    `view` makes the history graph as of a date or with a status filter: a `CSRGraph.masked`
+    view that checks the records of the edges a traversal visits, so nothing is copied
+    up front. The history graph has every relationship once, whatever its status, so it
+    also holds the ended relationships that the current graph leaves out.
+    """
+
+    ACTIVE = 'ACTIVE'
+    STATUSES = (ACTIVE, GraphBase.INACTIVE)
+    REGISTRATION_STATUSES = ('PUBLISHED', 'PENDING_TRANSFER', 'PENDING_ARCHIVAL', 'LAPSED', 'RETIRED',
+                             'ANNULLED', 'DUPLICATE', 'TRANSFERRED')
+
+    REGISTRATION_STATUS = 'Registration.RegistrationStatus'
+    LAST_UPDATE = 'Registration.LastUpdateDate'
+    RELATIONSHIP_PERIOD = 'RELATIONSHIP_PERIOD'
+    PERIODS = 5
+    QUANTIFIERS = 'Relationship.Quantifiers'
+    PERCENTAGE = 'PERCENTAGE'
+
+    NO_START = np.iinfo(np.int32).min
+    NO_END = np.iinfo(np.int32).max
+
+    ARRAYS = ('ptr', 'start', 'end', 'active', 'registration', 'share')
+
+    def __init__(self, graph: CSRGraph, ptr: np.ndarray, start: np.ndarray, end: np.ndarray,
+                 active: np.ndarray, registration: np.ndarray, share: np.ndarray):
+        """Initialize the periods from the history graph and the records of its edges.
+
+        Args:
+            graph (CSRGraph): all relationships, every one once.
+            ptr (np.ndarray): the records of edge i are ptr[i]:ptr[i + 1].
+            start (np.ndarray): first day of every record.
+            end (np.ndarray): last day of every record.
+            active (np.ndarray): whether every record is active.
+            registration (np.ndarray): registration status code of every record.
+            share (np.ndarray): ownership fraction of every record.
+        """
+        self.graph = graph
+        self.ptr = ptr
+        self.start = start
+        self.end = end
+        self.active = active
+        self.registration = registration
+        self.share = share
+
+    @classmethod
+    def period_columns(cls) -> list:
+        return ['Relationship.Period.{}.{}'.format(i, field)
+                for i in range(1, cls.PERIODS + 1) for field in ('startDate', 'endDate', 'periodType')]
+
+    @classmethod
+    def quantifier_columns(cls) -> list:
+        return ['{}.{}.{}'.format(cls.QUANTIFIERS, i, field)
+                for i in range(1, cls.PERIODS + 1) for field in ('QuantifierAmount', 'QuantifierUnits')]
+
+    @classmethod
+    def from_csv(cls, f: str, workers: Union[int, None] = None) -> 'RelationshipPeriods':
+        """Reads all relationships of a RR-CDF csv file (or its zip archive or a gzip file) with their periods.
+
+        Arguments:
+            f {str} -- path to the file
+
+        Keyword Arguments:
+            workers {int} -- number of processes parsing a large csv file (default: {None}, one)
+        """
+        return cls.from_chunks(cls.read_csv(f, workers))
+
+    @classmethod
+    def read_csv(cls, f: str, workers: Union[int, None] = None) -> List[Tuple[np.ndarray, ...]]:
+        """Parses a RR-CDF csv file into chunks of start nodes, end nodes, types, whether they are active
+        and the records (see `from_chunks`)."""
+        if parallel.splittable(f, workers):
+            return [chunk for part in parallel.map_ranges(cls._parse, f, workers) for chunk in part]
+        with sources.open_csv(f) as stream:
+            return list(cls._parse(stream))
+
+    @classmethod
+    def _parse(cls, stream: BinaryIO) -> Iterator[Tuple[np.ndarray, ...]]:
+        """Yields start nodes, end nodes, types, statuses, start and end days, registration codes and shares of the chunks."""
+        import pandas as pd
+
+        columns = [GraphBase.START_NODE, GraphBase.END_NODE, GraphBase.RELATIONSHIP_TYPE,
+                   GraphBase.RELATIONSHIP_STATUS, cls.REGISTRATION_STATUS, cls.LAST_UPDATE] + cls.period_columns() + \
+            cls.quantifier_columns()
+        chunks = pd.read_csv(stream, usecols=lambda column: column in columns, dtype=str,
+                             chunksize=GraphBase.CHUNKSIZE)
+        for chunk in chunks:
+            chunk = chunk[(chunk[GraphBase.START_NODE].notna() & chunk[GraphBase.END_NODE].notna()).values]
+            active = (chunk[GraphBase.RELATIONSHIP_STATUS] != GraphBase.INACTIVE).values
+            start = np.full(len(chunk), cls.NO_START, dtype=np.int32)
+            end = np.full(len(chunk), cls.NO_END, dtype=np.int32)
+            found = np.zeros(len(chunk), dtype=bool)
+            for i in range(1, cls.PERIODS + 1):
+                period_type = 'Relationship.Period.{}.periodType'.format(i)
+                if period_type not in chunk:
+                    continue
+                take = (chunk[period_type] == cls.RELATIONSHIP_PERIOD).values & ~found
+                start = np.where(take, _days(chunk['Relationship.Period.{}.startDate'.format(i)], cls.NO_START), start)
+                end = np.where(take, _days(chunk['Relationship.Period.{}.endDate'.format(i)], cls.NO_END), end)
+                found |= take
+            # an ended relationship without end date was valid until its last update
+            last_update = _days(chunk[cls.LAST_UPDATE], cls.NO_START) if cls.LAST_UPDATE in chunk else cls.NO_START
+            end = np.where(~active & (end == cls.NO_END), last_update, end)
+            registration = np.full(len(chunk), -1, dtype=np.int8)
+            if cls.REGISTRATION_STATUS in chunk:
+                registration = pd.Categorical(chunk[cls.REGISTRATION_STATUS], categories=cls.REGISTRATION_STATUSES).codes
+            share = np.full(len(chunk), np.nan, dtype=np.float32)
+            for amount, units in zip(*(cls.quantifier_columns()[k::2] for k in (0, 1))):
+                if amount not in chunk or units not in chunk:
+                    continue
+                take = (chunk[units] == cls.PERCENTAGE).values & np.isnan(share)
+                percent = pd.to_numeric(chunk[amount], errors='coerce').values
+                share = np.where(take, np.clip(percent / 100, 0, 1), share).astype(np.float32)
+            yield (
+                chunk[GraphBase.START_NODE].values,
+                chunk[GraphBase.END_NODE].values,
+                chunk[GraphBase.RELATIONSHIP_TYPE].values,
+                active,
+                start,
+                end,
+                np.asarray(registration, dtype=np.int8),
+                share,
+            )
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Tuple[np.ndarray, ...]]) -> 'RelationshipPeriods':
+        edges = _EdgeCollector()
+        records = []
+        for start_node, end_node, rel_type, *record in chunks:
+            edges.add(start_node, end_node, rel_type)
+            records.append(record)
+        graph = edges.graph(CSRGraph)
+        edge = edges.edge_ids(graph)
+        order = np.argsort(edge, kind='stable')
+        active, start, end, registration, share = (np.concatenate(column)[order] for column in zip(*records)) if records else (
+            np.empty(0, dtype=dtype) for dtype in (bool, np.int32, np.int32, np.int8, np.float32))
+        return cls(graph, _ptr(edge[order], graph.number_of_edges()), start, end, active, registration, share)
+
+    def arrays(self, prefix: str = 'periods_') -> dict:
+        g = self.graph
+        arrays = {'keys': g._keys, 'src': g._src, 'dst': g._dst, 'type': g._type, 'key': g._key}
+        arrays.update(g.index_arrays())
+        arrays.update((name, getattr(self, name)) for name in self.ARRAYS)
+        return {prefix + name: array for name, array in arrays.items()}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str = 'periods_') -> Union['RelationshipPeriods', None]:
+        # snapshots written without periods
+        if prefix + 'ptr' not in arrays:
+            return None
+        graph = CSRGraph.from_arrays(
+            *(arrays[prefix + name] for name in ('keys', 'src', 'dst', 'type', 'key')),
+            index={name: arrays[prefix + name] for name in ('order', 'out_ptr', 'in_ptr', 'in_edges')},
+        )
+        # snapshots written before the shares were read
+        share = arrays.get(prefix + 'share', np.full(len(arrays[prefix + 'start']), np.nan, dtype=np.float32))
+        return cls(graph, *(arrays[prefix + name] for name in cls.ARRAYS[:-1]), share)
+
+    def _matches(self, records: np.ndarray, as_of: date = None, status: str = None,
+                 registration_status: Iterable[str] = ()) -> np.ndarray:
+        match = np.ones(len(records), dtype=bool)
+        if as_of is not None:
+            day = self.day(as_of)
+            match &= (self.start[records] <= day) & (day <= self.end[records])
+        if status is not None:
+            match &= self.active[records] == (status == self.ACTIVE)
+        if registration_status:
+            codes = [self.REGISTRATION_STATUSES.index(s) for s in registration_status]
+            match &= np.isin(self.registration[records], codes)
+        return match
+
+    def valid(self, edges: np.ndarray, as_of: date = None, status: str = None,
+              registration_status: Iterable[str] = ()) -> np.ndarray:
+        """Whether any record of every edge (id of the history graph) matches the filters.
+
+        Arguments:
+            edges {np.ndarray} -- edge ids
+
+        Keyword Arguments:
+            as_of {date} -- day within the relationship period (default: {None}, any)
+            status {str} -- relationship status, ACTIVE or INACTIVE (default: {None}, any)
+            registration_status {Iterable[str]} -- accepted registration statuses (default: {()}, any)
+
+        Returns:
+            np.ndarray -- bool per edge
+        """
+        counts = self.ptr[edges + 1] - self.ptr[edges]
+        records = _expand(self.ptr, edges)
+        match = self._matches(records, as_of, status, registration_status)
+        owner = np.repeat(np.arange(len(edges)), counts)
+        valid = np.zeros(len(edges), dtype=bool)
+        valid[owner[match]] = True
+        return valid
+
+    def shares(self, starts: List[str], ends: List[str], rel_type: str = RR.DIRECT, as_of: date = None,
+               status: str = None, registration_status: Iterable[str] = ()) -> np.ndarray:
+        """Ownership fractions of the relationships of rel_type from starts to ends (NaN if not reported).
+
+        The share of a relationship is that of its last record matching the filters (see
+        `valid`) that reports one.
+        """
+        starts, ends = self.graph.node_ids(starts), self.graph.node_ids(ends)
+        found = np.flatnonzero((starts >= 0) & (ends >= 0))
+        out_ptr = self.graph._out_ptr
+        edges = _expand(out_ptr, starts[found])
+        owner = np.repeat(found, out_ptr[starts[found] + 1] - out_ptr[starts[found]])
+        hit = (self.graph._dst[edges] == ends[owner]) & (self.graph._type[edges] == RR.TYPES.index(rel_type))
+        edges, owner = edges[hit], owner[hit]
+
+        records = _expand(self.ptr, edges)
+        owner = np.repeat(owner, self.ptr[edges + 1] - self.ptr[edges])
+        reported = self._matches(records, as_of, status, registration_status) & ~np.isnan(self.share[records])
+        shares = np.full(len(starts), np.nan)
+        # records are in file order, the last assignment of an index wins
+        shares[owner[reported]] = self.share[records[reported]]
+        return shares
+
+    def view(self, as_of: date = None, status: str = None, registration_status: Iterable[str] = ()) -> CSRGraph:
+        """The history graph with only the relationships matching the filters (see `valid`).
+
+        Raises:
+            ValueError: for an unknown status or registration status
+        """
+        registration_status = tuple(registration_status)
+        unknown = [s for s in ((status,) if status is not None else ()) if s not in self.STATUSES]
+        unknown += [s for s in registration_status if s not in self.REGISTRATION_STATUSES]
+        if unknown:
+            raise ValueError('unknown status: {}'.format(', '.join(unknown)))
+        return self.graph.masked(lambda edges: self.valid(edges, as_of, status, registration_status))
+
+    @staticmethod
+    def day(value: date) -> int:
+        """Days since 1970-01-01 of value."""
+        return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def _days(column, missing: int) -> np.ndarray:
+    """Days since 1970-01-01 of the ISO 8601 timestamps of column (day in their own offset), missing if there is none."""
+    import pandas as pd
+
+    days = pd.to_datetime(column.str[:10], format='%Y-%m-%d', errors='coerce').values.astype('datetime64[D]')
+    return np.where(np.isnat(days), missing, days.astype(np.int64)).astype(np.int32)
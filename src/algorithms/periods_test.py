@@ -0,0 +1,115 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from graph import RR, CSRGraph, Graph
+from graph_builder import DirectNodeGraphWithParentNetworkBuilder
+from periods import RelationshipPeriods
+
+COLUMNS = ('Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+           'Relationship.RelationshipStatus,Registration.LastUpdateDate,Registration.RegistrationStatus,'
+           'Relationship.Period.1.startDate,Relationship.Period.1.endDate,Relationship.Period.1.periodType,'
+           'Relationship.Period.2.startDate,Relationship.Period.2.endDate,Relationship.Period.2.periodType')
+
+
+@pytest.fixture
+def rr_csv(tmpdir):
+    """A moved from Q to P in mid 2018, B left Q in 2015 and came back in 2020, C's registration lapsed."""
+    tmpdir.join('rr.csv').write('\n'.join([
+        COLUMNS,
+        'A,P,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,'
+        '2017-01-01T00:00:00Z,2017-12-31T00:00:00Z,ACCOUNTING_PERIOD,2018-06-15T00:00:00.000Z,,RELATIONSHIP_PERIOD',
+        'A,Q,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE,2018-07-01T00:00:00Z,PUBLISHED,'
+        '2010-01-01T00:00:00Z,2018-06-14T00:00:00+02:00,RELATIONSHIP_PERIOD,,,',
+        'A,Q,IS_ULTIMATELY_CONSOLIDATED_BY,INACTIVE,2018-07-01T00:00:00Z,PUBLISHED,'
+        '2010-01-01T00:00:00Z,2018-06-14T00:00:00Z,RELATIONSHIP_PERIOD,,,',
+        'B,Q,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE,2015-03-01T10:00:00Z,RETIRED,,,,,,',
+        'C,P,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,LAPSED,,,,,,',
+        'B,Q,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2020-01-02T00:00:00Z,PUBLISHED,2020-01-01T00:00:00Z,,RELATIONSHIP_PERIOD,,,',
+    ]) + '\n')
+    return str(tmpdir.join('rr.csv'))
+
+
+def test_from_csv(rr_csv):
+    """Tests that every relationship is an edge once, with all of its records."""
+    periods = RelationshipPeriods.from_csv(rr_csv)
+
+    assert sorted(periods.graph.edges(data='type')) == [
+        ('A', 'P', RR.DIRECT), ('A', 'Q', RR.DIRECT), ('A', 'Q', RR.ULTIMATE), ('B', 'Q', RR.DIRECT), ('C', 'P', RR.DIRECT),
+    ]
+    edge = list(periods.graph.edges(data='type')).index(('B', 'Q', RR.DIRECT))
+    records = slice(periods.ptr[edge], periods.ptr[edge + 1])
+    assert periods.active[records].tolist() == [False, True]
+    # the inactive record ends on its last update, the active one has no end
+    assert periods.start[records].tolist() == [RelationshipPeriods.NO_START, RelationshipPeriods.day(date(2020, 1, 1))]
+    assert periods.end[records].tolist() == [RelationshipPeriods.day(date(2015, 3, 1)), RelationshipPeriods.NO_END]
+
+
+@pytest.mark.parametrize('graph_cls', [Graph, CSRGraph])
+def test_from_csv_with_periods(rr_csv, graph_cls):
+    """Tests that reading the file once gives the same graph and periods as reading it twice."""
+    g = graph_cls.from_csv_with_periods(rr_csv)
+    expected = graph_cls.from_csv(rr_csv)
+    expected.read_periods(rr_csv)
+
+    assert list(g.nodes) == list(expected.nodes)
+    assert list(g.edges(keys=True, data='type')) == list(expected.edges(keys=True, data='type'))
+    assert [list(g.predecessors(node)) for node in g.nodes] == [list(expected.predecessors(node)) for node in g.nodes]
+    assert ('A', 'Q', 0) not in g.edges
+    assert list(g.periods.graph.edges(keys=True, data='type')) == list(expected.periods.graph.edges(keys=True, data='type'))
+    for name in RelationshipPeriods.ARRAYS:
+        np.testing.assert_array_equal(getattr(g.periods, name), getattr(expected.periods, name))
+
+
+def test_as_of(rr_csv):
+    periods = RelationshipPeriods.from_csv(rr_csv)
+
+    def parents(as_of):
+        view = periods.view(as_of=as_of)
+        return {node: view.get_direct_parent(node) for node in ('A', 'B', 'C')}
+
+    assert parents(date(2014, 1, 1)) == {'A': 'Q', 'B': 'Q', 'C': 'P'}
+    assert parents(date(2016, 1, 1)) == {'A': 'Q', 'B': None, 'C': 'P'}
+    assert parents(date(2018, 6, 14)) == {'A': 'Q', 'B': None, 'C': 'P'}
+    assert parents(date(2018, 6, 15)) == {'A': 'P', 'B': None, 'C': 'P'}
+    assert parents(date(2021, 1, 1)) == {'A': 'P', 'B': 'Q', 'C': 'P'}
+    assert periods.view(as_of=date(2017, 1, 1)).get_ultimate_parent('A') == 'Q'
+    assert periods.view(as_of=date(2019, 1, 1)).get_ultimate_parent('A') is None
+
+
+def test_status_filters(rr_csv):
+    periods = RelationshipPeriods.from_csv(rr_csv)
+
+    active = periods.view(status='ACTIVE')
+    assert active.children('Q') == [('B', RR.DIRECT)]
+    assert active.children('P') == [('A', RR.DIRECT), ('C', RR.DIRECT)]
+    published = periods.view(status='ACTIVE', registration_status=['PUBLISHED'])
+    assert published.children('P') == [('A', RR.DIRECT)]
+    assert periods.view(registration_status=['RETIRED']).children('Q') == [('B', RR.DIRECT)]
+
+    with pytest.raises(ValueError):
+        periods.view(status='ENDED')
+
+
+@pytest.mark.parametrize('graph_cls', [Graph, CSRGraph])
+def test_structure_as_of(rr_csv, graph_cls, tmpdir):
+    """Tests structures of a date from the graph and from a snapshot of it."""
+    g = graph_cls.from_csv(rr_csv)
+    g.read_periods(rr_csv)
+    builder = DirectNodeGraphWithParentNetworkBuilder()
+
+    def structure(graph, as_of):
+        return sorted(builder.structure_graph(graph.history(as_of=as_of), 'A').edges(data='type'))
+
+    assert structure(g, date(2014, 1, 1)) == [('A', 'Q', RR.DIRECT), ('B', 'Q', RR.DIRECT)]
+    assert structure(g, date(2019, 1, 1)) == [('A', 'P', RR.DIRECT), ('C', 'P', RR.DIRECT)]
+    # the current structure is not affected by the views
+    assert sorted(builder.structure_graph(g, 'A').edges(data='type')) == [('A', 'P', RR.DIRECT), ('C', 'P', RR.DIRECT)]
+
+    path = str(tmpdir.join('gleif.snapshot'))
+    g.save_snapshot(path)
+    loaded = graph_cls.load_snapshot(path)
+    assert structure(loaded, date(2014, 1, 1)) == [('A', 'Q', RR.DIRECT), ('B', 'Q', RR.DIRECT)]
+
+    with pytest.raises(ValueError):
+        graph_cls.from_csv(rr_csv).history(as_of=date(2017, 1, 1))
@@ -0,0 +1,170 @@
+import re
+import unicodedata
+from itertools import chain
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+
+# longer words are split into tokens of at most this many characters
+MAX_TOKEN = 32
+
+_COMBINING = re.compile('[\u0300-\u036f]')
+_WORD = re.compile(r'\w{1,%d}' % MAX_TOKEN)
+_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+
+def tokens(text: str) -> List[str]:
+    """Normalized words of text: lower case, without accents, split at everything but letters and digits."""
+    try:
+        text.encode('ascii')
+    except UnicodeEncodeError:
+        text = _COMBINING.sub('', unicodedata.normalize('NFKD', text))
+    return _WORD.findall(text.casefold())
+
+
+def _encode(token: str) -> bytes:
+    return token.encode('utf-8')
+
+
+def _edits(token: str) -> List[str]:
+    """All strings with an edit distance of one to token (deletion, transposition, substitution, insertion)."""
+    splits = [(token[:i], token[i:]) for i in range(len(token) + 1)]
+    alphabet = set(_ALPHABET) | set(token)
+    edits = [a + b[1:] for a, b in splits if b]
+    edits += [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    edits += [a + c + b[1:] for a, b in splits if b for c in alphabet]
+    edits += [a + c + b for a, b in splits for c in alphabet]
+    return edits
+
+
+class SearchIndex:
+    """
+    Token index of legal names for prefix and fuzzy search.
+
+    The distinct normalized tokens of all names are kept sorted in a fixed-width byte
+    array, with the numbers of the names containing them (postings) in CSR layout, so the
+    tokens starting with a prefix are one contiguous range found by binary search, and
+    so are their postings. Besides the tokens and postings, only the number of words of
+    every name is stored, for ranking.
+
+    Every query word must match a token of the name: exactly, as prefix (with at least
+    `MIN_PREFIX` characters) or, if neither exists, with one typo. Names are ranked by how
+    well their words match, then by their number of words (shorter names match better).
+    """
+
+    EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+    MIN_PREFIX = 2
+    MIN_FUZZY = 4
+
+    ARRAYS = ('tokens', 'ptr', 'entries', 'lengths')
+
+    def __init__(self, tokens: np.ndarray, ptr: np.ndarray, entries: np.ndarray, lengths: np.ndarray):
+        """Initialize the index from its arrays.
+
+        Args:
+            tokens (np.ndarray): sorted, distinct tokens (fixed-width utf-8 bytes).
+            ptr (np.ndarray): start of the postings of every token, plus their end.
+            entries (np.ndarray): numbers of the names containing the tokens, ascending per token.
+            lengths (np.ndarray): number of tokens of every name (at most 255).
+        """
+        self.tokens = tokens
+        self.ptr = ptr
+        self.entries = entries
+        self.lengths = lengths
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'SearchIndex':
+        """Builds the index of names; entries are numbered in iteration order."""
+        vocabulary, token_chunks, lengths = {}, [], []
+        for name in names:
+            words = tokens(name)
+            lengths.append(len(words))
+            token_chunks.append([vocabulary.setdefault(word, len(vocabulary)) for word in words])
+        n = len(lengths)
+        lengths = np.array(lengths, dtype=np.int64)
+
+        # number the tokens in sorted order, then sort (and deduplicate) the postings by token and entry
+        vocabulary = np.array([_encode(word) for word in vocabulary], dtype='S') if vocabulary else np.empty(0, dtype='S1')
+        order = np.argsort(vocabulary, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        token_ids = np.fromiter(chain.from_iterable(token_chunks), dtype=np.int64, count=int(lengths.sum()))
+        keys = np.sort(rank[token_ids] * max(n, 1) + np.repeat(np.arange(n, dtype=np.int64), lengths))
+        keys = keys[np.append(True, keys[1:] != keys[:-1])] if len(keys) else keys
+
+        ptr = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // max(n, 1), minlength=len(order)), out=ptr[1:])
+        entries = (keys % max(n, 1)).astype(np.int32)
+        return cls(vocabulary[order], ptr, entries, np.minimum(lengths, 255).astype(np.uint8))
+
+    def arrays(self, prefix: str = 'search_') -> dict:
+        return {prefix + name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, prefix: str = 'search_') -> Union['SearchIndex', None]:
+        if any(prefix + name not in arrays for name in cls.ARRAYS):
+            return None
+        return cls(*(arrays[prefix + name] for name in cls.ARRAYS))
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def _range(self, token: bytes, prefix: bool) -> Tuple[int, int]:
+        lo = int(np.searchsorted(self.tokens, token, side='left'))
+        # a longer value would be truncated to the width of the array
+        if prefix and len(token) < self.tokens.dtype.itemsize:
+            return lo, int(np.searchsorted(self.tokens, token + b'\xff', side='left'))
+        return lo, int(np.searchsorted(self.tokens, token, side='right'))
+
+    def _postings(self, lo: int, hi: int) -> np.ndarray:
+        return self.entries[self.ptr[lo]:self.ptr[hi]]
+
+    def _fuzzy(self, word: str) -> np.ndarray:
+        """Postings of the tokens with an edit distance of one to word."""
+        width = self.tokens.dtype.itemsize
+        # longer ones would be truncated to the width of the array
+        edits = sorted({edit for edit in map(_encode, _edits(word)) if len(edit) <= width})
+        if not edits or not len(self.tokens):
+            return np.empty(0, dtype=np.int32)
+        edits = np.array(edits, dtype=self.tokens.dtype)
+        i = np.minimum(np.searchsorted(self.tokens, edits), len(self.tokens) - 1)
+        found = i[self.tokens[i] == edits].tolist()
+        return np.concatenate([self._postings(j, j + 1) for j in found]) if found else np.empty(0, dtype=np.int32)
+
+    def match(self, word: str) -> np.ndarray:
+        """How well every name matches a (normalized) query word: `EXACT`, `PREFIX`, `FUZZY` or 0."""
+        quality = np.zeros(len(self), dtype=np.float32)
+        token = _encode(word)
+        lo, hi = self._range(token, prefix=len(word) >= self.MIN_PREFIX)
+        if lo < hi:
+            quality[self._postings(lo, hi)] = self.PREFIX
+            quality[self._postings(*self._range(token, prefix=False))] = self.EXACT
+        elif len(word) >= self.MIN_FUZZY:
+            quality[self._fuzzy(word)] = self.FUZZY
+        return quality
+
+    def search(self, query: str, limit: int = 10, allowed: np.ndarray = None) -> List[Tuple[int, float]]:
+        """Returns the best matching names of query, as (entry, score) pairs, best first.
+
+        Arguments:
+            query {str} -- words, the last one possibly incomplete
+
+        Keyword Arguments:
+            limit {int} -- maximum number of results (default: {10})
+            allowed {np.ndarray} -- whether every entry may be returned (default: {None}, all)
+
+        Returns:
+            list -- entries (numbers of the names) with the sum of the match qualities of their words
+        """
+        words = list(dict.fromkeys(tokens(query)))
+        if not words or not len(self):
+            return []
+        score = np.zeros(len(self), dtype=np.float32)
+        matched = np.ones(len(self), dtype=bool) if allowed is None else np.array(allowed, dtype=bool)
+        for word in words:
+            quality = self.match(word)
+            score += quality
+            matched &= quality > 0
+        hits = np.flatnonzero(matched)
+        best = hits[np.lexsort((hits, self.lengths[hits], -score[hits]))[:limit]]
+        return list(zip(best.tolist(), score[best].tolist()))
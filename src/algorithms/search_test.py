@@ -0,0 +1,61 @@
+import pytest
+from search import SearchIndex, tokens
+
+
+@pytest.fixture
+def index():
+    return SearchIndex.from_names([
+        'Deutsche Bank AG',                         # 0
+        'Deutsche Bank Luxembourg S.A.',            # 1
+        'Société Générale',                         # 2
+        'Bank of America, N.A.',                    # 3
+        'Deutsche Börse AG',                        # 4
+        'Banco Santander, S.A.',                    # 5
+        '',                                         # 6
+    ])
+
+
+def test_tokens():
+    """Tests that names are split into lower case words without accents."""
+    assert tokens('Société Générale S.A.') == ['societe', 'generale', 's', 'a']
+    assert tokens('GmbH & Co. KG') == ['gmbh', 'co', 'kg']
+    assert tokens('ÖSTERREICHISCHE Straße') == ['osterreichische', 'strasse']
+    assert tokens('') == []
+    assert tokens('x' * 40) == ['x' * 32, 'x' * 8]
+
+
+def test_exact_and_prefix(index):
+    """Tests that exact matches rank before prefix matches, and shorter names before longer ones."""
+    assert [entry for entry, _ in index.search('deutsche bank')] == [0, 1]
+    assert [entry for entry, _ in index.search('deutsche bo')] == [4]
+    assert [entry for entry, _ in index.search('deutsche ba')] == [0, 1]
+    # single characters only match exactly
+    assert [entry for entry, _ in index.search('deutsche b')] == []
+    assert [entry for entry, _ in index.search('ban')] == [0, 5, 1, 3]
+    assert [entry for entry, _ in index.search('bank')] == [0, 1, 3]
+    assert index.search('bank', limit=1) == [(0, SearchIndex.EXACT)]
+
+
+def test_all_words_must_match(index):
+    assert index.search('deutsche santander') == []
+    assert index.search('bank zzz') == []
+    assert index.search('...') == []
+
+
+def test_fuzzy(index):
+    """Tests that words without exact or prefix match are matched with one typo."""
+    assert index.search('gnerale') == [(2, pytest.approx(SearchIndex.FUZZY))]
+    assert index.search('soceite') == [(2, pytest.approx(SearchIndex.FUZZY))]
+    assert index.search('santnader') == [(5, pytest.approx(SearchIndex.FUZZY))]
+    assert index.search('socxxte') == []
+    # too short for fuzzy matching
+    assert index.search('agg') == []
+
+
+def test_arrays(index):
+    """Tests that an index restored from its arrays gives the same results."""
+    restored = SearchIndex.from_arrays(index.arrays())
+
+    assert restored.search('deutsche b') == index.search('deutsche b')
+    assert SearchIndex.from_arrays({}) is None
+    assert SearchIndex.from_names([]).search('bank') == []
@@ -0,0 +1,166 @@
+"""
+Binary snapshot of the GLEIF data for fast server startup.
+
+A snapshot file is a versioned container of named NumPy arrays:
+
+    magic (8 bytes) | format version (uint32) | header length (uint32) | header (json) | arrays
+
+Every array starts at a 64 byte aligned offset. The json header lists dtype, shape and
+offset of the arrays, free form metadata and the crc32 checksum of the array section.
+Reading memory-maps the file, so loading takes (almost) constant time and the arrays are
+backed by the page cache instead of process memory.
+
+Build a snapshot from the golden copy csv files:
+
+    python -m algorithms.snapshot build --rr ../data/gleif_rr.csv --lei ../data/gleif_lei.csv --out ../data/gleif.snapshot
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAGIC = b'GLEIFSNP'
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+def write(path: str, arrays: Dict[str, np.ndarray], meta: dict = None) -> dict:
+    """Writes arrays and metadata to a snapshot file (atomically, via a temporary file).
+
+    Arguments:
+        path {str} -- path of the snapshot file
+        arrays {Dict[str, np.ndarray]} -- arrays to store
+
+    Keyword Arguments:
+        meta {dict} -- json serializable metadata (default: {None})
+
+    Returns:
+        dict -- header of the written file
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    table, offset, checksum = {}, 0, 0
+    for name, a in arrays.items():
+        table[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset, 'nbytes': a.nbytes}
+        checksum = zlib.crc32(a.tobytes(), checksum)
+        pad = _padding(a.nbytes)
+        checksum = zlib.crc32(bytes(pad), checksum)
+        offset += a.nbytes + pad
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'checksum': checksum,
+        'size': offset,
+        'arrays': table,
+        'meta': meta or {},
+    }
+    encoded = json.dumps(header).encode('utf-8')
+    encoded += b' ' * _padding(_PREAMBLE.size + len(encoded))
+
+    tmp = '{}.tmp{}'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        for a in arrays.values():
+            f.write(a.tobytes())
+            f.write(bytes(_padding(a.nbytes)))
+    os.replace(tmp, path)
+    return header
+
+
+def read_header(f) -> Tuple[dict, int]:
+    """Reads and validates the header; returns it with the offset of the array section."""
+    magic, version, length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+    if magic != MAGIC:
+        raise SnapshotError('Not a snapshot file')
+    if version != FORMAT_VERSION:
+        raise SnapshotError('Unsupported snapshot format version {} (expected {})'.format(version, FORMAT_VERSION))
+    header = json.loads(f.read(length).decode('utf-8'))
+    return header, _PREAMBLE.size + length
+
+
+def read(path: str, verify: bool = False) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Memory-maps a snapshot file.
+
+    Arguments:
+        path {str} -- path of the snapshot file
+
+    Keyword Arguments:
+        verify {bool} -- check the checksum; this reads the whole file (default: {False})
+
+    Returns:
+        tuple -- read-only arrays by name and the header
+    """
+    with open(path, 'rb') as f:
+        header, start = read_header(f)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) != start + header['size']:
+        raise SnapshotError('Truncated snapshot file')
+    if verify and zlib.crc32(memoryview(buffer)[start:]) != header['checksum']:
+        raise SnapshotError('Snapshot checksum mismatch')
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = spec['nbytes'] // dtype.itemsize if dtype.itemsize else 0
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + spec['offset']).reshape(spec['shape'])
+    return arrays, header
+
+
+def main(argv=None):
+    from algorithms.graph import CSRGraph
+
+    parser = argparse.ArgumentParser(prog='python -m algorithms.snapshot', description='GLEIF snapshot files')
+    commands = parser.add_subparsers(dest='command')
+
+    build = commands.add_parser('build', help='convert the golden copy csv files into a snapshot')
+    build.add_argument('--rr', required=True, help='relationship record (RR-CDF) csv file')
+    build.add_argument('--lei', required=True, help='LEI -> legal name csv file')
+    build.add_argument('--out', required=True, help='snapshot file to write')
+    build.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='processes parsing the csv files (default: number of CPUs)')
+
+    verify = commands.add_parser('verify', help='check the checksum of a snapshot')
+    verify.add_argument('snapshot')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        started = time.time()
+        graph = CSRGraph.from_csv_with_periods(args.rr, workers=args.workers)
+        graph.build_group_index()
+        CSRGraph.set_lookup_table(args.lei, workers=args.workers)
+        header = graph.save_snapshot(args.out, meta={
+            'sources': [os.path.basename(args.rr), os.path.basename(args.lei)],
+        })
+        print('wrote {} ({} nodes, {} edges, {:.1f} MB) in {:.1f}s'.format(
+            args.out, graph.number_of_nodes(), graph.number_of_edges(), header['size'] / 1e6, time.time() - started))
+    elif args.command == 'verify':
+        _, header = read(args.snapshot, verify=True)
+        print('ok: format version {}, created {}, checksum {:08x}'.format(
+            header['format_version'], header['created'], header['checksum']))
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
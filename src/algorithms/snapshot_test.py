@@ -0,0 +1,119 @@
+import pytest
+from os import path
+import graph
+from graph import RR, CSRGraph, snapshot
+
+
+@pytest.fixture
+def rr_test_csv(request):
+    return path.join(request.config.rootdir, 'src/test_data', 'rr-test.csv')
+
+
+@pytest.fixture
+def lookup_test_csv(request):
+    return path.join(request.config.rootdir, 'src/test_data', 'lei-test.csv')
+
+
+@pytest.fixture
+def snapshot_file(tmpdir, rr_test_csv, lookup_test_csv):
+    """Writes a snapshot of the test data and returns its path."""
+    g = CSRGraph.from_csv(rr_test_csv)
+    g.build_group_index()
+    CSRGraph.set_lookup_table(lookup_test_csv)
+    f = str(tmpdir.join('test.snapshot'))
+    g.save_snapshot(f, meta={'sources': ['rr-test.csv']})
+    return f
+
+
+@pytest.mark.parametrize('backend', sorted(graph.BACKENDS))
+def test_snapshot_round_trip(tmpdir, lookup_test_csv, backend):
+    """Tests that a snapshot restores nodes, edges and labels for every backend.
+
+    Args:
+        tmpdir: pytest temporary directory.
+        lookup_test_csv (str): Path to the CSV file containing lookup table data.
+        backend (str): Name of the graph backend.
+    """
+    cls = graph.BACKENDS[backend]
+    g = cls([
+        RR('LEI_1', 'LEI_2', RR.DIRECT),
+        RR('LEI_1', 'LEI_3', RR.ULTIMATE),
+        RR('LEI_1', 'LEI_2', RR.ULTIMATE),
+        RR('LEI_4', 'LEI_1', RR.BRANCH),
+    ])
+    cls.set_lookup_table(lookup_test_csv)
+    f = str(tmpdir.join('test.snapshot'))
+    header = g.save_snapshot(f)
+
+    graph.GraphBase.lookup_table = None
+    loaded = cls.load_snapshot(f, verify=True)
+
+    assert type(loaded) is cls
+    assert header['meta']['nodes'] == 4
+    assert list(loaded.nodes) == list(g.nodes)
+    assert list(loaded.edges(keys=True, data='type')) == list(g.edges(keys=True, data='type'))
+    assert loaded.to_array() == g.to_array()
+    assert loaded.get_node_label('LEI_3') == 'company3'
+    assert loaded.get_node_label('LEI_4') == 'id not found'
+
+
+def test_snapshot_is_memory_mapped(snapshot_file):
+    """Tests that loaded arrays are read-only views of the file and the graph stays usable."""
+    g = CSRGraph.load_snapshot(snapshot_file)
+
+    assert not g._src.flags.writeable
+    assert g.get_direct_parent('LEI_1') == 'DIRECT_PARENT_LEI'
+    assert g.get_ultimate_parent('LEI_1') == 'ULTIMATE_PARENT_LEI'
+    assert sorted(g.sub('LEI_1', exclude=(RR.ULTIMATE,)).nodes) == ['DIRECT_PARENT_LEI', 'LEI_1']
+    assert g.snapshot_header['meta']['sources'] == ['rr-test.csv']
+
+
+def test_snapshot_checksum(snapshot_file):
+    """Tests that a corrupted array section is detected when verifying."""
+    with open(snapshot_file, 'r+b') as f:
+        f.seek(-3, 2)
+        f.write(b'xyz')
+
+    CSRGraph.load_snapshot(snapshot_file)
+    with pytest.raises(snapshot.SnapshotError, match='checksum'):
+        CSRGraph.load_snapshot(snapshot_file, verify=True)
+
+
+def test_snapshot_rejects_other_files(lookup_test_csv):
+    with pytest.raises(snapshot.SnapshotError, match='Not a snapshot'):
+        snapshot.read(lookup_test_csv)
+
+
+def test_snapshot_cli(tmpdir, rr_test_csv, lookup_test_csv, capsys):
+    """Tests building and verifying a snapshot with the command line interface."""
+    f = str(tmpdir.join('cli.snapshot'))
+
+    assert snapshot.main(['build', '--rr', rr_test_csv, '--lei', lookup_test_csv, '--out', f]) == 0
+    assert snapshot.main(['verify', f]) == 0
+    assert 'ok: format version 2' in capsys.readouterr().out
+    assert list(CSRGraph.load_snapshot(f).nodes) == ['LEI_1', 'DIRECT_PARENT_LEI', 'ULTIMATE_PARENT_LEI']
+
+
+def test_snapshot_keeps_group_index(tmpdir, rr_test_csv):
+    """Tests that the group index is stored in the snapshot and restored without recomputing it."""
+    g = CSRGraph.from_csv(rr_test_csv)
+    g.build_group_index()
+    f = str(tmpdir.join('groups.snapshot'))
+    g.save_snapshot(f)
+
+    loaded = CSRGraph.load_snapshot(f)
+    assert loaded.groups is not None
+    assert not loaded.groups.group.flags.owndata
+    for node in list(g.nodes)[:50]:
+        assert loaded.groups.group_of(node) == g.groups.group_of(node)
+        assert loaded.groups.root_of(node) == g.groups.root_of(node)
+
+
+def test_snapshot_arrays_are_shared(snapshot_file):
+    """Tests that no array of a loaded graph is a private copy, so forked workers share the file pages."""
+    g = CSRGraph.load_snapshot(snapshot_file)
+    arrays = dict(g.index_arrays(), keys=g._keys, src=g._src, dst=g._dst, type=g._type, key=g._key)
+    arrays.update(g.groups.arrays())
+    arrays.update(g.lookup_table.arrays())
+
+    assert [name for name, a in arrays.items() if a.flags.owndata or a.flags.writeable] == []
@@ -0,0 +1,70 @@
+"""
+Golden copy files as downloaded: plain csv, zip archives and gzip files.
+
+Compressed files are decompressed while they are parsed, so the multi-gigabyte csv
+files never have to be unpacked to disk; the parser selects the columns it needs.
+"""
+import gzip
+import os
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+_ZIP = b'PK\x03\x04'
+_GZIP = b'\x1f\x8b'
+
+# tried in this order by `find`
+EXTENSIONS = ('', '.zip', '.gz')
+
+
+def compression(f: str) -> str:
+    """'zip', 'gzip' or None, from the first bytes of the file (not its name)."""
+    with open(f, 'rb') as stream:
+        magic = stream.read(4)
+    if magic.startswith(_ZIP):
+        return 'zip'
+    if magic.startswith(_GZIP):
+        return 'gzip'
+    return None
+
+
+def _member(archive: zipfile.ZipFile) -> str:
+    """The csv file of a golden copy archive (the only file, or the only one ending with .csv)."""
+    names = [info.filename for info in archive.infolist() if not info.is_dir()]
+    if len(names) == 1:
+        return names[0]
+    csvs = [name for name in names if name.lower().endswith('.csv')]
+    if len(csvs) != 1:
+        raise ValueError('expected one csv file in {}, found {}'.format(archive.filename, names))
+    return csvs[0]
+
+
+@contextmanager
+def open_csv(f: str) -> Iterator[BinaryIO]:
+    """Opens a csv file, the csv file in a zip archive or a gzip compressed csv file as binary stream.
+
+    Arguments:
+        f {str} -- path of the file
+
+    Raises:
+        ValueError: if a zip archive does not contain exactly one csv file
+    """
+    kind = compression(f)
+    if kind == 'zip':
+        with zipfile.ZipFile(f) as archive, archive.open(_member(archive)) as stream:
+            yield stream
+    elif kind == 'gzip':
+        with gzip.open(f, 'rb') as stream:
+            yield stream
+    else:
+        with open(f, 'rb') as stream:
+            yield stream
+
+
+def find(directory: str, name: str) -> str:
+    """Path of name in directory, or of its .zip or .gz version if only that exists (name if none does)."""
+    for extension in EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return path
+    return os.path.join(directory, name)
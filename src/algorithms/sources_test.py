@@ -0,0 +1,75 @@
+import gzip
+import shutil
+import zipfile
+from os import path
+
+import pytest
+from graph import CSRGraph, Graph
+from names import NameIndex
+from sources import compression, find, open_csv
+
+
+@pytest.fixture
+def test_data(request):
+    return path.join(request.config.rootdir, 'src/test_data')
+
+
+@pytest.fixture
+def archives(tmpdir, test_data):
+    """The test csv files as zip archives (with an extra file) and gzip files."""
+    files = {}
+    for name in ('rr-test.csv', 'lei-test.csv'):
+        csv = path.join(test_data, name)
+        zipped = str(tmpdir.join(name + '.zip'))
+        with zipfile.ZipFile(zipped, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write(csv, name)
+            archive.writestr('README.txt', 'not the data')
+        gzipped = str(tmpdir.join(name + '.gz'))
+        with open(csv, 'rb') as src, gzip.open(gzipped, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        files[name] = {'csv': csv, 'zip': zipped, 'gzip': gzipped}
+    return files
+
+
+def test_open_csv(archives):
+    """Tests that all versions of a file read the same bytes."""
+    files = archives['rr-test.csv']
+    with open(files['csv'], 'rb') as f:
+        content = f.read()
+
+    for kind in ('csv', 'zip', 'gzip'):
+        assert compression(files[kind]) == (None if kind == 'csv' else kind)
+        with open_csv(files[kind]) as stream:
+            assert stream.read() == content
+
+
+def test_open_csv_ambiguous_zip(tmpdir):
+    f = str(tmpdir.join('data.zip'))
+    with zipfile.ZipFile(f, 'w') as archive:
+        archive.writestr('a.csv', 'LEI\n')
+        archive.writestr('b.csv', 'LEI\n')
+
+    with pytest.raises(ValueError):
+        with open_csv(f):
+            pass
+
+
+def test_read_archives(archives):
+    """Tests that graphs and names read from archives equal the ones read from the csv files."""
+    for cls in (Graph, CSRGraph):
+        expected = cls.from_csv(archives['rr-test.csv']['csv'])
+        for kind in ('zip', 'gzip'):
+            graph = cls.from_csv(archives['rr-test.csv'][kind])
+            assert sorted(graph.edges(data='type')) == sorted(expected.edges(data='type'))
+
+    names = NameIndex.from_csv(archives['lei-test.csv']['zip'])
+    assert names.labels(['LEI_1', 'LEI_3']) == ['company1', 'company3']
+
+
+def test_find(tmpdir):
+    directory = str(tmpdir)
+    assert find(directory, 'gleif_rr.csv') == path.join(directory, 'gleif_rr.csv')
+    tmpdir.join('gleif_rr.csv.zip').write('')
+    assert find(directory, 'gleif_rr.csv') == path.join(directory, 'gleif_rr.csv.zip')
+    tmpdir.join('gleif_rr.csv').write('')
+    assert find(directory, 'gleif_rr.csv') == path.join(directory, 'gleif_rr.csv')
@@ -0,0 +1,254 @@
+"""
+Deterministic synthetic GLEIF golden copies for tests and benchmarks.
+
+Writes a relationship record (RR-CDF) csv file and a LEI csv file (legal name,
+jurisdiction, legal form and status) in the layout of the golden copy. Every LEI
+belongs to a corporate group; group sizes follow a heavy tailed (zipf) distribution
+like the real data: mostly single entities and small groups, a few hundred large ones
+and some conglomerates of several thousand entities. Within a group every entity
+except the top one has a direct parent, most also report the top entity as ultimate
+parent, and some are branches of their head office. A few groups contain a cycle of
+direct parents, some records are duplicated and some are inactive. Every relationship
+has a relationship period starting on a random day since 2000; the inactive ones have
+ended before the last update of the records. Most direct relationships report the
+percentage the parent owns, usually all of the child.
+
+The same parameters and seed always produce the same files:
+
+    python -m algorithms.synthetic --leis 2500000 --relationships 300000 --out ../data/synthetic
+"""
+import argparse
+import csv
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from algorithms.graph import RR, GraphBase
+
+RR_FILE = 'gleif_rr.csv'
+LEI_FILE = 'gleif_lei.csv'
+
+RR_COLUMNS = [
+    GraphBase.START_NODE, 'Relationship.StartNode.NodeIDType',
+    GraphBase.END_NODE, 'Relationship.EndNode.NodeIDType',
+    GraphBase.RELATIONSHIP_TYPE, GraphBase.RELATIONSHIP_STATUS,
+    'Registration.InitialRegistrationDate', 'Registration.LastUpdateDate', 'Registration.RegistrationStatus',
+    'Registration.NextRenewalDate', 'Registration.ManagingLOU', 'Registration.ValidationSources',
+    'Registration.ValidationDocuments', 'Registration.ValidationReference',
+] + [
+    'Relationship.Period.{}.{}'.format(i, field) for i in range(1, 6) for field in ('startDate', 'endDate', 'periodType')
+] + [
+    'Relationship.Qualifiers.{}.{}'.format(i, field) for i in range(1, 6) for field in ('QualifierDimension', 'QualifierCategory')
+] + [
+    'Relationship.Quantifiers.{}.{}'.format(i, field) for i in range(1, 6)
+    for field in ('MeasurementMethod', 'QuantifierAmount', 'QuantifierUnits')
+]
+LEI_COLUMNS = [GraphBase.LEI, GraphBase.LEGAL_NAME, 'Entity.LegalJurisdiction', 'Entity.LegalForm.EntityLegalFormCode',
+               'Entity.EntityStatus', 'Registration.RegistrationStatus']
+
+_LOUS = ['5493', '2138', '9845', '8156', '3912', '7245']
+_WORDS = ['Alpha', 'Nordic', 'Global', 'Capital', 'Holding', 'Industrie', 'Trading', 'Energy', 'Pacific',
+          'Société', 'Invest', 'Logistik', 'Verwaltungs', 'Services', 'Atlantic', 'Technologies']
+_FORMS = ['AG', 'GmbH', 'Ltd', 'Inc.', 'S.A.', 'B.V.', 'S.p.A.', 'LLC', 'GmbH & Co. KG', 'Limited, Inc.']
+# jurisdiction and ELF code of every legal form
+_JURISDICTIONS = ['DE', 'DE', 'GB', 'US-DE', 'FR', 'NL', 'IT', 'US-NY', 'DE', 'US-CA']
+_ELF_CODES = ['8Z6G', '2HBR', 'H0PO', 'XSNP', 'K65D', '54M6', 'P418', '4GJI', '40DB', '']
+# relationship periods are days since the first day, up to the last update of the records
+_FIRST_DAY = np.datetime64('2000-01-01')
+_LAST_UPDATE = np.datetime64('2019-06-18')
+
+
+def lei_codes(ids: np.ndarray) -> List[str]:
+    """Synthetic LEIs of entity numbers: LOU prefix, '00', 12 digits and ISO 17442 (mod 97) check digits."""
+    ids = np.asarray(ids, dtype=np.int64)
+    prefix = ids % len(_LOUS)
+    # all characters are digits, so the remainder of prefix + '00' + 12 digits + '00' is
+    # put together from the remainders of its parts
+    remainder = (np.array(_LOUS, dtype=np.int64)[prefix] * pow(10, 16, 97) + ids % 97 * 100) % 97
+    return ['{}00{:012d}{:02d}'.format(_LOUS[p], i, 98 - r)
+            for p, i, r in zip(prefix.tolist(), ids.tolist(), remainder.tolist())]
+
+
+def group_sizes(rng: np.random.RandomState, subsidiaries: int, conglomerates: int, conglomerate_size: int) -> np.ndarray:
+    """Sizes (> 1) of groups with `subsidiaries` members below the top in total, the conglomerates first.
+
+    All other groups have at most a fifth of conglomerate_size members.
+    """
+    large = rng.randint(conglomerate_size, 2 * conglomerate_size + 1, size=conglomerates)
+    large = large[np.cumsum(large - 1) <= subsidiaries]
+    sizes = [large]
+    remaining = subsidiaries - int(large.sum() - len(large))
+    while remaining > 0:
+        batch = np.minimum(rng.zipf(2.0, size=remaining), max(conglomerate_size // 5 - 1, 1))
+        batch = batch[np.cumsum(batch) <= remaining]
+        sizes.append(batch + 1)
+        remaining -= int(batch.sum())
+    return np.concatenate(sizes).astype(np.int64)
+
+
+def group_relationships(rng: np.random.RandomState, sizes: np.ndarray, ultimate: float = 0.8,
+                        branches: float = 0.05, cycles: int = 10) -> Dict[str, np.ndarray]:
+    """Relationships (by entity number) of groups of consecutive entities with the given sizes.
+
+    Returns:
+        dict -- arrays `start`, `end` and `type` (index into `RR.TYPES`)
+    """
+    first = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    position = np.arange(int(sizes.sum())) - first[group]
+    child = position > 0
+
+    # the parent is an earlier member, preferably one near the top, so large groups get
+    # wide, shallow trees with some long chains
+    parent_position = (position * rng.random_sample(len(position)) ** 2).astype(np.int64)
+    start = np.flatnonzero(child)
+    end = first[group[start]] + parent_position[start]
+    # branches are leaves, i.e. entities no one else has as parent
+    is_branch = (rng.random_sample(len(start)) < branches) & ~np.isin(start, end)
+    rel_type = np.where(is_branch, RR.TYPES.index(RR.BRANCH), RR.TYPES.index(RR.DIRECT))
+
+    reports = start[(rng.random_sample(len(start)) < ultimate) & ~is_branch]
+    start = np.concatenate([start, reports])
+    end = np.concatenate([end, first[group[reports]]])
+    rel_type = np.concatenate([rel_type, np.full(len(reports), RR.TYPES.index(RR.ULTIMATE))])
+
+    # the top entity of some small groups reports a member as its direct parent
+    candidates = np.flatnonzero((sizes >= 3) & (sizes <= 50))
+    looped = rng.choice(candidates, size=min(cycles, len(candidates)), replace=False)
+    start = np.concatenate([start, first[looped]])
+    end = np.concatenate([end, first[looped] + sizes[looped] - 1])
+    rel_type = np.concatenate([rel_type, np.full(len(looped), RR.TYPES.index(RR.DIRECT))])
+    return {'start': start, 'end': end, 'type': rel_type}
+
+
+def relationship_periods(rng: np.random.RandomState, active: np.ndarray) -> Dict[str, List[str]]:
+    """Start and end dates (as in the golden copy) of the relationship periods of records with the given status.
+
+    Returns:
+        dict -- lists `start` and `end`, the end is empty for active records
+    """
+    last = int((_LAST_UPDATE - _FIRST_DAY).astype(int))
+    start = rng.randint(0, last - 1, size=len(active))
+    # the inactive relationships lasted a few weeks to years
+    end = np.minimum(start + rng.randint(30, 3000, size=len(active)), last - 1)
+    ended = ['' if is_active else day for day, is_active in zip(_dates(end), active.tolist())]
+    return {'start': _dates(start), 'end': ended}
+
+
+def relationship_shares(rng: np.random.RandomState, rel_type: np.ndarray, reported: float = 0.8) -> List[str]:
+    """Percentages the parents own (as quantifier amounts) of records with the given types (index into `RR.TYPES`).
+
+    Only a fraction of the direct relationships reports one; the others get an empty amount.
+    """
+    percent = np.where(rng.random_sample(len(rel_type)) < 0.6, 100, rng.randint(5001, 10000, size=len(rel_type)) / 100)
+    report = (rel_type == RR.TYPES.index(RR.DIRECT)) & (rng.random_sample(len(rel_type)) < reported)
+    return ['{:.2f}'.format(p) if r else '' for p, r in zip(percent.tolist(), report.tolist())]
+
+
+def _dates(days: np.ndarray) -> List[str]:
+    days = np.datetime_as_string(_FIRST_DAY + days.astype('timedelta64[D]'))
+    return [day + 'T00:00:00.000Z' for day in days.tolist()]
+
+
+def generate(out: str, leis: int = 2500000, relationships: int = 300000, seed: int = 0, conglomerates: int = 5,
+             conglomerate_size: int = 5000, cycles: int = 10, duplicates: float = 0.005,
+             inactive: float = 0.01) -> Dict[str, str]:
+    """Writes a synthetic golden copy to the directory out.
+
+    Arguments:
+        out {str} -- directory of the csv files (created if needed)
+
+    Keyword Arguments:
+        leis {int} -- number of LEI records (default: {2500000})
+        relationships {int} -- approximate number of active relationship records (default: {300000})
+        seed {int} -- random seed (default: {0})
+        conglomerates {int} -- number of groups with conglomerate_size to twice as many members (default: {5})
+        conglomerate_size {int} -- minimum size of a conglomerate, the bound of all other groups (default: {5000})
+        cycles {int} -- number of groups with a cycle of direct parents (default: {10})
+        duplicates {float} -- fraction of relationship records written twice (default: {0.005})
+        inactive {float} -- fraction of additional inactive relationship records (default: {0.01})
+
+    Returns:
+        dict -- paths of the `rr` and `lei` files
+    """
+    rng = np.random.RandomState(seed)
+    # every member below the top has a direct or branch relationship, 80% of the direct
+    # ones also an ultimate relationship
+    sizes = group_sizes(rng, int(relationships / (1 + 0.8 * 0.95)), conglomerates, conglomerate_size)
+    if sizes.sum() > leis:
+        raise ValueError('{} LEIs are too few for {} relationships'.format(leis, relationships))
+    rels = group_relationships(rng, sizes, cycles=cycles)
+
+    # the groups are spread over all LEIs
+    entity = rng.permutation(leis)
+    start, end, rel_type = entity[rels['start']], entity[rels['end']], rels['type']
+    count = len(start)
+    active = np.ones(count, dtype=bool)
+
+    extra = rng.randint(0, count, size=int(count * duplicates))
+    dead = rng.randint(0, count, size=int(count * inactive))
+    start = np.concatenate([start, start[extra], entity[rng.randint(0, leis, size=len(dead))]])
+    end = np.concatenate([end, end[extra], end[dead]])
+    rel_type = np.concatenate([rel_type, rel_type[extra], rel_type[dead]])
+    active = np.concatenate([active, active[extra], np.zeros(len(dead), dtype=bool)])
+    # duplicates are the same record, with the same period and share
+    details = relationship_periods(rng, np.concatenate([active[:count], active[count + len(extra):]]))
+    details['share'] = relationship_shares(rng, np.concatenate([rel_type[:count], rel_type[count + len(extra):]]))
+    details = {name: values[:count] + [values[i] for i in extra.tolist()] + values[count:]
+               for name, values in details.items()}
+    order = rng.permutation(len(start))
+
+    os.makedirs(out, exist_ok=True)
+    paths = {'rr': os.path.join(out, RR_FILE), 'lei': os.path.join(out, LEI_FILE)}
+    used = np.unique(np.concatenate([start, end]))
+    codes = dict(zip(used.tolist(), lei_codes(used)))
+    registration = ['2012-11-29T16:33:00.000Z', '2019-06-18T14:32:00.000Z', 'PUBLISHED', '2020-06-14T10:17:00.000Z',
+                    '5493001KJTIIGC8Y1R12', 'FULLY_CORROBORATED', 'ACCOUNTS_FILING', '',
+                    '2018-01-01T00:00:00.000Z', '2018-12-31T00:00:00.000Z', 'ACCOUNTING_PERIOD']
+    qualifiers = [''] * 9 + ['ACCOUNTING_STANDARD', 'IFRS'] + [''] * 8
+    padding = [''] * (len(RR_COLUMNS) - 6 - len(registration) - 3 - len(qualifiers) - 3)
+    with open(paths['rr'], 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(RR_COLUMNS)
+        start, end = start.tolist(), end.tolist()
+        for i in order.tolist():
+            writer.writerow([codes[start[i]], 'LEI', codes[end[i]], 'LEI', RR.TYPES[rel_type[i]],
+                             'ACTIVE' if active[i] else 'INACTIVE'] + registration +
+                            [details['start'][i], details['end'][i], 'RELATIONSHIP_PERIOD'] + qualifiers +
+                            ['', details['share'][i], 'PERCENTAGE' if details['share'][i] else ''] + padding)
+
+    words = rng.randint(0, len(_WORDS), size=(leis, 2))
+    forms = rng.randint(0, len(_FORMS), size=leis)
+    lapsed = rng.random_sample(leis) < 0.1
+    retired = rng.random_sample(leis) < 0.03
+    with open(paths['lei'], 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(LEI_COLUMNS)
+        for i, code in enumerate(lei_codes(np.arange(leis))):
+            form = forms[i]
+            writer.writerow([code, '{} {} {} {}'.format(_WORDS[words[i, 0]], _WORDS[words[i, 1]], i, _FORMS[form]),
+                             _JURISDICTIONS[form], _ELF_CODES[form], 'INACTIVE' if retired[i] else 'ACTIVE',
+                             'LAPSED' if lapsed[i] else 'ISSUED'])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m algorithms.synthetic', description='synthetic GLEIF golden copies')
+    parser.add_argument('--out', required=True, help='directory of the csv files')
+    parser.add_argument('--leis', type=int, default=2500000, help='number of LEI records')
+    parser.add_argument('--relationships', type=int, default=300000, help='approximate number of relationship records')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--conglomerates', type=int, default=5, help='number of groups with 5000+ members')
+    parser.add_argument('--cycles', type=int, default=10, help='number of groups with a cycle')
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    paths = generate(args.out, args.leis, args.relationships, args.seed, args.conglomerates, cycles=args.cycles)
+    print('wrote {} and {} in {:.1f}s'.format(paths['rr'], paths['lei'], time.time() - started))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+import filecmp
+
+import numpy as np
+import pandas as pd
+import pytest
+from graph import RR, CSRGraph, GraphBase
+from groups import GroupIndex
+from synthetic import RR_COLUMNS, generate, group_sizes, lei_codes
+
+
+@pytest.fixture(scope='module')
+def golden_copy(tmpdir_factory):
+    return generate(str(tmpdir_factory.mktemp('synthetic')), leis=20000, relationships=3000, conglomerates=2,
+                    conglomerate_size=500, cycles=3)
+
+
+def test_lei_codes():
+    """Tests that the synthetic LEIs have 20 characters and valid ISO 17442 check digits."""
+    codes = lei_codes(np.array([0, 1, 97, 123456789, 2499999]))
+
+    assert len(set(codes)) == 5
+    for code in codes:
+        assert len(code) == 20
+        assert int(''.join(str(int(c, 36)) for c in code)) % 97 == 1
+
+
+def test_group_sizes():
+    sizes = group_sizes(np.random.RandomState(0), 10000, conglomerates=3, conglomerate_size=1000)
+
+    assert (sizes - 1).sum() == 10000
+    assert sizes.min() >= 2
+    assert (sizes >= 1000).sum() == 3
+    assert np.median(sizes) <= 3
+
+
+def test_generate(golden_copy):
+    """Tests the layout and the structure of a generated golden copy."""
+    assert list(pd.read_csv(golden_copy['rr'], nrows=0).columns) == RR_COLUMNS
+    assert list(pd.read_csv(golden_copy['lei'], nrows=0).columns)[:2] == [GraphBase.LEI, GraphBase.LEGAL_NAME]
+    records = pd.read_csv(golden_copy['rr'], usecols=[GraphBase.START_NODE, GraphBase.END_NODE,
+                                                      GraphBase.RELATIONSHIP_TYPE, GraphBase.RELATIONSHIP_STATUS])
+    assert records.duplicated().any()
+    assert (records[GraphBase.RELATIONSHIP_STATUS] == GraphBase.INACTIVE).any()
+    assert set(records[GraphBase.RELATIONSHIP_TYPE]) == set(RR.TYPES)
+    periods = pd.read_csv(golden_copy['rr'], usecols=['Relationship.Period.2.startDate',
+                                                      'Relationship.Period.2.endDate',
+                                                      'Relationship.Period.2.periodType'])
+    assert (periods['Relationship.Period.2.periodType'] == 'RELATIONSHIP_PERIOD').all()
+    assert periods['Relationship.Period.2.startDate'].nunique() > 1000
+    # only the ended relationships have an end date
+    ended = periods['Relationship.Period.2.endDate'].notna()
+    assert (ended == (records[GraphBase.RELATIONSHIP_STATUS] == GraphBase.INACTIVE)).all()
+    assert (periods['Relationship.Period.2.startDate'][ended] < periods['Relationship.Period.2.endDate'][ended]).all()
+    shares = pd.read_csv(golden_copy['rr'], usecols=['Relationship.Quantifiers.1.QuantifierAmount',
+                                                     'Relationship.Quantifiers.1.QuantifierUnits'])
+    reported = shares['Relationship.Quantifiers.1.QuantifierAmount'].notna()
+    # direct relationships only, most of them
+    assert (records[GraphBase.RELATIONSHIP_TYPE][reported] == RR.DIRECT).all()
+    assert reported.sum() > 0.5 * (records[GraphBase.RELATIONSHIP_TYPE] == RR.DIRECT).sum()
+    assert (shares['Relationship.Quantifiers.1.QuantifierUnits'][reported] == 'PERCENTAGE').all()
+    assert shares['Relationship.Quantifiers.1.QuantifierAmount'][reported].between(50, 100).all()
+
+    graph = CSRGraph.from_csv(golden_copy['rr'])
+    index = GroupIndex(graph)
+    sizes = np.diff(index.members_ptr)
+    assert 2 <= (sizes >= 500).sum()
+    # nodes on a cycle are at level 0 without being a top entity (without parent)
+    assert ((index.level == 0) & (index.parent >= 0)).sum() >= 3
+    assert len(pd.read_csv(golden_copy['lei'])) == 20000
+
+
+def test_generate_is_deterministic(tmpdir, golden_copy):
+    again = generate(str(tmpdir), leis=20000, relationships=3000, conglomerates=2, conglomerate_size=500, cycles=3)
+
+    assert filecmp.cmp(again['rr'], golden_copy['rr'], shallow=False)
+    assert filecmp.cmp(again['lei'], golden_copy['lei'], shallow=False)
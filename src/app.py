@@ -1,9 +1,25 @@
+import bisect
+import json
 import os
-from fastapi import FastAPI
+import threading
+import time
+from datetime import date
+from typing import Iterator, List, Union
+
+from fastapi import Body, FastAPI, Header, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
-from algorithms.graph import Graph
+from algorithms import delta, formats, metrics, ownership, sources
+from algorithms.attributes import AttributeStore
+from algorithms.cache import ResponseCache
+from algorithms.dataset import Dataset, DatasetHolder, NotLoaded
+from algorithms.executor import Overloaded, SingleFlightExecutor
+from algorithms.graph import BACKENDS
 from algorithms.graph_builder import DirectNodeGraphWithParentNetworkBuilder as Builder
+from algorithms.periods import RelationshipPeriods
 
 origins = ["*"]
 
@@ -14,25 +30,510 @@ api.add_middleware(
 ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
 DATA_PATH = os.path.join(ROOT_DIR, "data")
 
-relationship_data_path = os.path.join(DATA_PATH, "gleif_rr.csv")
-lei_lookup_data_path = os.path.join(DATA_PATH, "gleif_lei.csv")
+# the golden copy csv files, or their zip (or gzip) archives as downloaded
+relationship_data_path = os.environ.get("RR_PATH", sources.find(DATA_PATH, "gleif_rr.csv"))
+lei_lookup_data_path = os.environ.get("LEI_PATH", sources.find(DATA_PATH, "gleif_lei.csv"))
+# built with `python -m algorithms.snapshot build`; the csv files are only read without it
+snapshot_path = os.environ.get("SNAPSHOT_PATH", os.path.join(DATA_PATH, "gleif.snapshot"))
+
+# delta files are only read from here
+delta_path = os.environ.get("DELTA_PATH", os.path.join(DATA_PATH, "delta"))
+# required in the X-Admin-Token header of admin endpoints, which are disabled without it
+admin_token = os.environ.get("ADMIN_TOKEN")
+
+# "csr" (array backed) or "networkx"
+Graph = BACKENDS[os.environ.get("GRAPH_BACKEND", "csr")]
+
+# processes parsing the csv files when there is no snapshot; every web worker starts its own
+parse_workers = int(os.environ.get("PARSE_WORKERS", 1))
+
+# maximum number of LEIs per batch request
+batch_limit = int(os.environ.get("BATCH_LIMIT", 50000))
+
+# upper bound of the serialized responses kept in memory, 0 disables the cache
+response_cache = ResponseCache(int(os.environ.get("RESPONSE_CACHE_BYTES", 256 * 2 ** 20)))
+
+# structures are built by a bounded pool of worker threads; beyond `BUILD_QUEUE` builds
+# running or waiting, requests are rejected with 503 instead of piling up
+executor = SingleFlightExecutor(
+    max_workers=int(os.environ.get("BUILD_WORKERS", min(8, os.cpu_count() or 1))),
+    max_pending=int(os.environ.get("BUILD_QUEUE", 64)),
+)
+
+# per stage timers of building and encoding structures in /metrics; off by default
+metrics.enable_timers(os.environ.get("STAGE_TIMERS", "0") == "1")
+request_count = metrics.Counter("gleif_requests_total", "Requests by endpoint and status code.", ("endpoint", "status"))
+request_seconds = metrics.Histogram(
+    "gleif_request_seconds", "Time until the response starts, by endpoint.", metrics.LATENCY_BUCKETS, ("endpoint",)
+)
+structure_nodes = metrics.Histogram("gleif_structure_nodes", "Nodes of the built structures.", metrics.SIZE_BUCKETS)
+
+
+def load_dataset() -> Dataset:
+    return Dataset.load(
+        Graph, snapshot_path, relationship_data_path, lei_lookup_data_path, progress=datasets.report, workers=parse_workers
+    )
+
+
+# the served data; loaded in the background after startup, reloads and deltas replace
+# the dataset as a whole
+datasets = DatasetHolder()
+
+
+def preload():
+    """Loads the data before the server starts, e.g. in the gunicorn master before it forks the workers."""
+    datasets.load(load_dataset)
+
+
+@api.on_event("startup")
+async def start_loading():
+    # unless preloaded, the server accepts requests right away and data endpoints answer 503
+    # until the data are loaded
+    if datasets.current is None:
+        datasets.reload(load_dataset, on_swap=clear_cache)
+
+
+def encode(content) -> bytes:
+    # same encoding as starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def build_structure(dataset: Dataset, builder: Builder, node_id: str, format: str, key, limits: tuple,
+                    attributes: tuple = (), source=None, shares: tuple = None):
+    source = dataset.graph if source is None else source
+    if any(limit is not None for limit in limits):
+        graph, truncated = builder.neighbourhood_graph(source, node_id, *limits)
+        extra = {"truncated": truncated}
+    else:
+        graph, extra = builder.structure_graph(source, node_id), None
+    if shares is not None:
+        parent = source.get_ultimate_parent(node_id)
+        with metrics.timed("ownership"):
+            ownership.annotate(graph, parent if parent is not None and parent in graph else node_id,
+                               dataset.graph.periods, shares)
+    structure_nodes.observe(graph.number_of_nodes())
+    if format == formats.JSON:
+        return graph, extra
+    with metrics.timed("encode"):
+        columns = graph.to_columns(attributes)
+        columns.update(extra or {})
+        body = formats.encode_columns(columns, format)
+    # not if the dataset was replaced meanwhile, the structure might be outdated
+    datasets.if_current(dataset, response_cache.put, key, body)
+    return body
+
+
+def cache_chunks(chunks: Iterator[bytes], dataset: Dataset, key) -> Iterator[bytes]:
+    """Passes chunks through and caches them as one body at the end."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    datasets.if_current(dataset, response_cache.put, key, b"".join(parts))
+
+
+async def structure_body(dataset: Dataset, builder: Builder, node_id: str, format: str = formats.JSON,
+                         max_depth: int = None, max_nodes: int = None, attributes: tuple = (),
+                         history: tuple = (), with_ownership: bool = False) -> Union[bytes, Iterator[bytes]]:
+    """Returns the encoded structure of node_id: cached bytes, or json chunks of a new build.
+
+    With max_depth or max_nodes, only the nearest part of the structure is built (see
+    `Builder.neighbourhood_graph`) and the response tells whether it is `truncated`.
+    The nodes get the values of the entity attributes. With history (as of date, status and
+    registration statuses), the structure is built from the relationships matching it (see
+    `GraphBase.history`) instead of the current ones. with_ownership adds the effective
+    ownership of every node by the top of the structure (see `algorithms.ownership`), from
+    the shares of the relationships it is built from.
 
-glei_network = Graph.from_csv(f=relationship_data_path, limit=None)
-Graph.set_lookup_table(f=lei_lookup_data_path)
+    The structure is built (and encoded, unless it is json) by the executor; concurrent
+    requests for the same structure wait for the same build. json chunks are cached once
+    they have all been consumed.
+    """
+    limits = (max_depth, max_nodes)
+    source = dataset.graph.history(*history) if history else dataset.graph
+    if any(limit is not None for limit in limits):
+        structure_key = builder.neighbourhood_key(node_id, *limits)
+    else:
+        structure_key = builder.structure_key(source, node_id)
+    key = (structure_key, dataset.version)
+    if format != formats.JSON:
+        key += (format,)
+    if attributes:
+        key += (attributes,)
+    if history:
+        key += (("history",) + history,)
+    # the current structures consist of the active relationships
+    shares = (history or (None, RelationshipPeriods.ACTIVE, ())) if with_ownership else None
+    if with_ownership:
+        key += ("ownership",)
+    body = response_cache.get(key)
+    if body is not None:
+        return body
+    body = await executor.run(key, build_structure, dataset, builder, node_id, format, key, limits, attributes, source,
+                              shares)
+    if isinstance(body, bytes):
+        return body
+    graph, extra = body
+    chunks = graph.iter_json(extra=extra, attributes=attributes)
+    return cache_chunks(metrics.timed_chunks("encode", chunks), dataset, key)
+
+
+@api.middleware("http")
+async def count_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # set by the router; requests that match no route are counted together
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", "none")
+    request_seconds.observe(time.perf_counter() - started, (endpoint,))
+    request_count.inc((endpoint, response.status_code))
+    return response
+
+
+@api.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": "server busy, retry later"}, status_code=503, headers={"Retry-After": "1"})
+
+
+@api.exception_handler(NotLoaded)
+async def not_loaded_handler(request: Request, exc: NotLoaded):
+    return JSONResponse(
+        {"detail": "data not loaded: {}".format(exc), "progress": datasets.progress()},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
+
+
+@api.get("/healthz")
+def get_health():
+    """
+    Liveness: the server is running (also while the data are loading).
+    """
+    return {"status": "ok"}
+
+
+@api.get("/readyz")
+def get_readiness():
+    """
+    Readiness: 200 once the data are loaded, 503 with the loading progress before.
+    """
+    dataset = datasets.get()
+    return {"status": "ready", "dataset": dataset.info()}
+
+
+def parse_attributes(attributes: Union[str, None]) -> tuple:
+    names = tuple(dict.fromkeys(name.strip() for name in (attributes or "").split(",") if name.strip()))
+    unknown = [name for name in names if name not in AttributeStore.FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail="unknown attributes: {} (available: {})".format(", ".join(unknown), ", ".join(AttributeStore.FIELDS)),
+        )
+    return names
+
+
+def require_periods(dataset: Dataset):
+    if dataset.graph.periods is None:
+        raise HTTPException(status_code=400, detail="relationship periods are not loaded, rebuild the snapshot")
+
+
+def parse_history(dataset: Dataset, as_of: Union[date, None], status: Union[str, None],
+                  registration_status: Union[str, None]) -> tuple:
+    registration = tuple(dict.fromkeys(s.strip() for s in (registration_status or "").split(",") if s.strip()))
+    if as_of is None and status is None and not registration:
+        return ()
+    require_periods(dataset)
+    unknown = [s for s in (status,) if s is not None and s not in RelationshipPeriods.STATUSES]
+    unknown += [s for s in registration if s not in RelationshipPeriods.REGISTRATION_STATUSES]
+    if unknown:
+        raise HTTPException(status_code=400, detail="unknown status: {}".format(", ".join(unknown)))
+    return as_of, status, registration
 
 
 @api.get("/company/{node_id}/structure")
-def get_company_structure(node_id: str):
+async def get_company_structure(node_id: str, format: str = None, accept: str = Header(None),
+                                max_depth: int = Query(None, ge=0), max_nodes: int = Query(None, ge=1),
+                                attributes: str = None, as_of: date = None, status: str = None,
+                                registration_status: str = None, ownership: bool = False):
     """
     This endpoint returns the complete holding structure based on a single node id.
+
+    With `max_depth` and/or `max_nodes` only the part of the structure nearest to node id is
+    returned, with `"truncated": true` if there is more; expand it with `/company/{node_id}/children`.
+
+    The compact formats `columnar` (json) and `msgpack` are chosen with the `format` query
+    parameter or the Accept header (`application/vnd.gleif.columnar+json`, `application/msgpack`).
     :param node_id:
+    :param format: json (default), columnar or msgpack
+    :param max_depth: maximum number of relationships from node id
+    :param max_nodes: maximum number of nodes
+    :param attributes: entity attributes added to every node, comma separated, e.g. jurisdiction,status
+    :param as_of: only relationships whose relationship period includes this date (YYYY-MM-DD), also ended ones
+    :param status: only relationships with this status, ACTIVE or INACTIVE
+    :param registration_status: only relationships with these registration statuses, comma separated
+    :param ownership: add the effective ownership of every node by the top of the structure (0 to 1)
     :return:
     """
+    format = formats.negotiate(format, accept)
+    if format is None:
+        raise HTTPException(status_code=406, detail="available formats: {}".format(", ".join(formats.available())))
+
+    builder = Builder()
+    dataset = datasets.get()
+    if ownership:
+        require_periods(dataset)
+    body = await structure_body(dataset, builder, node_id, format, max_depth, max_nodes, parse_attributes(attributes),
+                                parse_history(dataset, as_of, status, registration_status), ownership)
+    media_type = formats.MEDIA_TYPES[format]
+    if isinstance(body, bytes):
+        return Response(content=body, media_type=media_type)
+    # encoded while it is sent, without building the whole document first
+    return StreamingResponse(body, media_type=media_type)
+
+
+@api.post("/companies/structure")
+async def get_companies_structure(node_ids: List[str] = Body(...)):
+    """
+    This endpoint returns the holding structures of many node ids at once.
+
+    Node ids with the same structure share it: `companies` maps every node id to the key
+    of its structure in `structures`, so each distinct structure is built and sent once.
+    :param node_ids: list of node ids
+    :return: {"companies": {node_id: key}, "structures": {key: structure}}
+    """
+    if len(node_ids) > batch_limit:
+        raise HTTPException(status_code=413, detail="at most {} node ids per request".format(batch_limit))
+
     builder = Builder()
-    parent_graph, parent_node = builder.build(glei_network, node_id)
+    dataset = datasets.get()
+    companies, structures = {}, []
+    for i, nodes in enumerate(builder.group_by_structure(dataset.graph, node_ids).values()):
+        ref = str(i)
+        companies.update((node, ref) for node in nodes)
+        # one build at a time, so a large batch does not crowd out single requests
+        body = await structure_body(dataset, builder, nodes[0])
+        if not isinstance(body, bytes):
+            body = await run_in_threadpool(b"".join, body)
+        structures.append(encode(ref) + b":" + body)
+
+    # the cached structures are inserted as they are instead of decoding and encoding them again
+    body = b'{"companies":' + encode(companies) + b',"structures":{' + b",".join(structures) + b"}}"
+    return Response(content=body, media_type="application/json")
+
+
+@api.get("/company/{node_id}/children")
+def get_company_children(node_id: str, cursor: str = None, limit: int = Query(100, ge=1, le=1000)):
+    """
+    This endpoint returns the direct children (direct subsidiaries and branches) of a node id, page by page.
+
+    Children are sorted by LEI and relationship (a child can be both a subsidiary and a branch);
+    pass `next_cursor` of a page as `cursor` to get the next one.
+    :param node_id:
+    :param cursor: LEI, or LEI and relationship separated by a comma, after which the page starts
+    :param limit: maximum number of children per page
+    :return: {"id", "label", "children": [{"id", "label", "relationship", "children"}], "next_cursor"}
+    """
+    graph = datasets.get().graph
+    children = graph.children(node_id)
+    if cursor is not None:
+        child, _, relationship = cursor.partition(",")
+        children = children[bisect.bisect_right(children, (child, relationship or "\uffff")):]
+    page = children[:limit]
+    ids = [child for child, _ in page]
+    return {
+        "id": node_id,
+        "label": graph.get_node_label(node_id),
+        "children": [
+            {"id": child, "label": label, "relationship": relationship, "children": graph.count_children(child)}
+            for (child, relationship), label in zip(page, graph.get_node_labels(ids))
+        ],
+        "next_cursor": ",".join(page[-1]) if len(children) > limit else None,
+    }
+
+
+@api.get("/company/{node_id}/ancestors")
+def get_company_ancestors(node_id: str):
+    """
+    This endpoint returns the ownership chain of a node id up to the top of its group.
+
+    The chain follows the direct parents (the head office for branches), nearest first; `cycle` is
+    true if the chain runs into a cycle (the chain then ends with the first node reached twice).
+    :param node_id:
+    :return: {"id", "label", "ancestors": [{"id", "label", "relationship"}], "ultimate_parent", "cycle"}
+    """
+    graph = datasets.get().graph
+    chain, cycle = graph.ancestors(node_id)
+    ultimate = graph.groups.ultimate_parent_of(node_id) if graph.groups is not None else graph.get_ultimate_parent(node_id)
+    ids = [ancestor for ancestor, _ in chain]
+    labels = graph.get_node_labels([node_id] + ids + ([ultimate] if ultimate is not None else []))
+    return {
+        "id": node_id,
+        "label": labels[0],
+        "ancestors": [
+            {"id": ancestor, "label": label, "relationship": relationship}
+            for (ancestor, relationship), label in zip(chain, labels[1:])
+        ],
+        "ultimate_parent": {"id": ultimate, "label": labels[-1]} if ultimate is not None else None,
+        "cycle": cycle,
+    }
+
+
+@api.get("/search")
+def search(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100), jurisdiction: str = None,
+           country: str = None, category: str = None, legal_form: str = None, status: str = None,
+           registration_status: str = None):
+    """
+    This endpoint searches the legal names by words or word prefixes, tolerating one typo per word.
+
+    All words must match; exact matches rank before prefix and fuzzy matches, shorter names before longer ones.
+    The entity attributes restrict the results to entities with these values, e.g. `jurisdiction=DE&status=ACTIVE`.
+    :param q: query, e.g. "deutsche ban"
+    :param limit: maximum number of results
+    :return: {"query", "results": [{"id", "label", "group_size"}]}
+    """
+    dataset = datasets.get()
+    filters = {
+        "jurisdiction": jurisdiction, "country": country, "category": category, "legal_form": legal_form,
+        "status": status, "registration_status": registration_status,
+    }
+    filters = {name: value for name, value in filters.items() if value is not None}
+    hits = dataset.lookup_table.search(q, limit, filters) if dataset.lookup_table is not None else []
+    return {
+        "query": q,
+        "results": [{"id": lei, "label": name, "group_size": dataset.graph.group_size(lei)} for lei, name in hits],
+    }
+
+
+@api.get("/cache")
+def get_cache_stats():
+    """
+    Size and hit/miss/eviction counters of the response cache.
+    """
+    return response_cache.stats()
+
 
-    if parent_node is None:
-        # no ultimate parent 
-        return parent_graph.set_levels(node_id).to_array()
-    else: 
-        return parent_graph.set_levels(parent_node).to_array()
+# deltas and reloads replace the dataset one at a time, so a reload cannot swap out a delta
+# applied while it was loading
+delta_lock = threading.Lock()
+
+
+def check_admin_token(token: str):
+    if admin_token is None or token != admin_token:
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+def delta_file(name: str) -> str:
+    if name != os.path.basename(name) or name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail="expected a file name in the delta directory")
+    f = os.path.join(delta_path, name)
+    if not os.path.isfile(f):
+        raise HTTPException(status_code=404, detail="delta file {} not found".format(name))
+    return f
+
+
+def apply_delta_files(rr: str, lei: str) -> dict:
+    with delta_lock:
+        dataset = datasets.get()
+        result = delta.apply(dataset.graph, rr=rr, lei=lei)
+        builder = Builder()
+        invalidated = 0
+
+        def invalidate(_: Dataset):
+            # same version: cached structures of unaffected groups stay valid
+            nonlocal invalidated
+            invalidated = response_cache.discard_if(
+                lambda key: key[1] == dataset.version and builder.structure_affected(key[0], result.nodes, result.groups)
+            )
+
+        # invalidated on the swap, so no build of the previous dataset caches its structure afterwards
+        updated = Dataset(result.graph, result.lookup_table, dataset.version, dataset.deltas + 1)
+        datasets.swap(updated, on_swap=invalidate)
+    return {
+        "added": result.added,
+        "removed": result.removed,
+        "affected_nodes": len(result.nodes),
+        "invalidated": invalidated,
+    }
+
+
+@api.post("/admin/delta")
+async def apply_delta(rr: str = Body(None), lei: str = Body(None), x_admin_token: str = Header(None)):
+    """
+    Applies GLEIF delta files (file names in the delta directory) to the live data.
+
+    Only the cached structures of the affected groups are dropped.
+    :param rr: RR-CDF delta csv file
+    :param lei: LEI delta csv file
+    :return: counts of the applied changes
+    """
+    check_admin_token(x_admin_token)
+    if datasets.reloading:
+        raise HTTPException(status_code=409, detail="reloading, apply the delta after the reload")
+    files = (delta_file(rr) if rr else None, delta_file(lei) if lei else None)
+    return await executor.run(("delta",) + files, apply_delta_files, *files)
+
+
+def clear_cache(dataset: Dataset):
+    # also if the version is the same: the previous dataset may have had deltas applied
+    response_cache.clear()
+
+
+@api.post("/admin/reload", status_code=202)
+def reload_dataset(x_admin_token: str = Header(None)):
+    """
+    Loads the snapshot (or csv files) again in the background and swaps it in when complete;
+    the current data keeps serving meanwhile.
+    :return: dataset status
+    """
+    check_admin_token(x_admin_token)
+    if not datasets.reload(load_dataset, on_swap=clear_cache, lock=delta_lock):
+        raise HTTPException(status_code=409, detail="already reloading")
+    return datasets.status()
+
+
+@api.get("/dataset")
+def get_dataset():
+    """
+    Version of the served data and reload status.
+    """
+    return datasets.status()
+
+
+@api.get("/metrics")
+def get_metrics():
+    """
+    Request counts and latencies, stage timers (with STAGE_TIMERS=1), structure and group sizes,
+    response cache and build queue statistics and process memory in the Prometheus text format.
+    """
+    dataset = datasets.current
+    cache, builds = response_cache.stats(), executor.stats()
+    families = [
+        request_count.expose(),
+        request_seconds.expose(),
+        metrics.STAGES.expose(),
+        structure_nodes.expose(),
+        metrics.gauge("gleif_cache_entries", "Responses in the cache.", cache["entries"]),
+        metrics.gauge("gleif_cache_bytes", "Size of the cached responses.", cache["bytes"]),
+        metrics.gauge("gleif_cache_max_bytes", "Capacity of the response cache.", cache["max_bytes"]),
+        metrics.gauge("gleif_cache_hits_total", "Response cache hits.", cache["hits"], "counter"),
+        metrics.gauge("gleif_cache_misses_total", "Response cache misses.", cache["misses"], "counter"),
+        metrics.gauge("gleif_cache_evictions_total", "Responses evicted from the cache.", cache["evictions"], "counter"),
+        metrics.gauge("gleif_builds_pending", "Structure builds running or waiting.", builds["pending"]),
+        metrics.gauge("gleif_builds_total", "Structure builds submitted.", builds["submitted"], "counter"),
+        metrics.gauge("gleif_builds_coalesced_total", "Requests that waited for a build of another one.",
+                      builds["coalesced"], "counter"),
+        metrics.gauge("gleif_builds_rejected_total", "Requests rejected with 503 because of the build queue.",
+                      builds["rejected"], "counter"),
+        metrics.gauge("process_resident_memory_bytes", "Resident memory size in bytes.", metrics.rss_bytes()),
+        metrics.gauge("gleif_dataset_loaded", "Whether the data are loaded.", int(dataset is not None)),
+    ]
+    if dataset is not None:
+        families += [
+            metrics.gauge("gleif_dataset_nodes", "Nodes of the current graph.", dataset.graph.number_of_nodes()),
+            metrics.gauge("gleif_dataset_edges", "Relationships of the current graph.", dataset.graph.number_of_edges()),
+            metrics.gauge("gleif_dataset_deltas", "Delta files applied to the current dataset.", dataset.deltas),
+        ]
+        if dataset.graph.groups is not None:
+            sizes = dataset.graph.groups.sizes()
+            families.append(metrics.distribution("gleif_group_size", "Members of the groups of the current graph.",
+                                                 metrics.SIZE_BUCKETS, sizes[sizes > 0]))
+    return Response(content=metrics.expose(*families), media_type=metrics.CONTENT_TYPE)
@@ -1,9 +1,321 @@
+import time
+
+import pytest
 from starlette.testclient import TestClient
-#  from app import api
 
-#  client = TestClient(api)
+import app
+from algorithms.dataset import DatasetHolder
+from algorithms.executor import SingleFlightExecutor
+from algorithms.graph import GraphBase
+
+RR_COLUMNS = ('Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+              'Relationship.RelationshipStatus,Registration.LastUpdateDate,Registration.RegistrationStatus,'
+              'Relationship.Period.1.startDate,Relationship.Period.1.endDate,Relationship.Period.1.periodType,'
+              'Relationship.Quantifiers.1.QuantifierAmount,Relationship.Quantifiers.1.QuantifierUnits')
+
+
+@pytest.fixture
+def data(tmpdir, monkeypatch):
+    """R owns A (60%, since 2019; Q did before), B and E; C is a subsidiary of A, D a branch of C. S is alone."""
+    tmpdir.join('rr.csv').write('\n'.join([
+        RR_COLUMNS,
+        'A,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,2019-01-01T00:00:00Z,,'
+        'RELATIONSHIP_PERIOD,60,PERCENTAGE',
+        'A,Q,IS_DIRECTLY_CONSOLIDATED_BY,INACTIVE,2019-01-01T00:00:00Z,PUBLISHED,2010-01-01T00:00:00Z,'
+        '2018-12-31T00:00:00Z,RELATIONSHIP_PERIOD,,',
+        'A,R,IS_ULTIMATELY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,,,,,',
+        'B,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,,,,40,PERCENTAGE',
+        'C,A,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,,,,50,PERCENTAGE',
+        'C,R,IS_ULTIMATELY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,,,,,',
+        'D,C,IS_INTERNATIONAL_BRANCH_OF,ACTIVE,2019-01-01T00:00:00Z,PUBLISHED,,,,,',
+        'E,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE,2019-01-01T00:00:00Z,LAPSED,,,,,',
+    ]) + '\n')
+    tmpdir.join('lei.csv').write_text('\n'.join([
+        'LEI,Entity.LegalName,Entity.LegalJurisdiction,Entity.EntityStatus',
+        'R,Root Holding,DE,ACTIVE',
+        'A,Alpha Bank,DE,ACTIVE',
+        'B,Alpha Insurance,FR,ACTIVE',
+        'C,Charlie Leasing,DE,ACTIVE',
+        'D,Charlie Leasing Branch,GB,ACTIVE',
+        'E,Echo Bank,DE,INACTIVE',
+        'Q,Quebec Bank,CA,ACTIVE',
+        'S,Solo Bank,DE,ACTIVE',
+    ]) + '\n', encoding='utf-8')
+    monkeypatch.setattr(app, 'relationship_data_path', str(tmpdir.join('rr.csv')))
+    monkeypatch.setattr(app, 'lei_lookup_data_path', str(tmpdir.join('lei.csv')))
+    monkeypatch.setattr(app, 'snapshot_path', str(tmpdir.join('missing.snapshot')))
+    monkeypatch.setattr(app, 'delta_path', str(tmpdir))
+    monkeypatch.setattr(app, 'admin_token', 'secret')
+    monkeypatch.setattr(app, 'datasets', DatasetHolder())
+    # loading sets the lookup table of all graphs
+    monkeypatch.setattr(GraphBase, 'lookup_table', GraphBase.lookup_table)
+    app.response_cache.clear()
+    yield tmpdir
+    app.response_cache.clear()
+
+
+@pytest.fixture
+def client(data):
+    app.preload()
+    with TestClient(app.api) as client:
+        yield client
+
+
+def nodes(structure: dict) -> list:
+    return sorted(node['id'] for node in structure['nodes'])
+
+
+def edges(structure: dict) -> list:
+    return sorted((edge['from'], edge['to'], edge['label']) for edge in structure['edges'])
+
+
+def test_batch(client):
+    response = client.post('/companies/structure', json=['C', 'A', 'S', 'C'])
+    body = response.json()
+
+    # C and A share their structure
+    assert len(body['structures']) == 2
+    assert body['companies']['C'] == body['companies']['A'] != body['companies']['S']
+    assert nodes(body['structures'][body['companies']['C']]) == ['A', 'B', 'C', 'D', 'E', 'R']
+    assert body['structures'][body['companies']['C']] == client.get('/company/A/structure').json()
+
+
+def test_batch_overloaded(client, monkeypatch):
+    monkeypatch.setattr(app, 'batch_limit', 2)
+    assert client.post('/companies/structure', json=['A', 'B', 'C']).status_code == 413
+
+    # no build can be queued
+    monkeypatch.setattr(app, 'executor', SingleFlightExecutor(max_workers=1, max_pending=0))
+    response = client.post('/companies/structure', json=['A', 'S'])
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+
+
+def test_cache(client):
+    stats = client.get('/cache').json()
+    structure = client.get('/company/C/structure').json()
+    assert client.get('/company/C/structure').json() == structure
+    # the other members of the group share the cached structure
+    assert client.get('/company/A/structure').json() == structure
+
+    after = client.get('/cache').json()
+    assert after['misses'] - stats['misses'] == 1
+    assert after['hits'] - stats['hits'] == 2
+    assert after['entries'] == 1
+
+
+def write_delta(data):
+    data.join('rr-delta.csv').write('\n'.join([
+        'Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+        'Relationship.RelationshipStatus',
+        'S,R,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE',
+    ]) + '\n')
+
+
+def test_admin_delta(client, data, monkeypatch):
+    write_delta(data)
+    headers = {'X-Admin-Token': 'secret'}
+    before = client.get('/company/C/structure').json()
+
+    response = client.post('/admin/delta', json={'rr': 'rr-delta.csv'}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['added'] == 1
+    assert nodes(client.get('/company/C/structure').json()) == sorted(nodes(before) + ['S'])
+    assert client.get('/dataset').json()['current']['deltas'] == 1
+    assert client.post('/admin/delta', json={'rr': '../rr.csv'}, headers=headers).status_code == 400
+    assert client.post('/admin/delta', json={'rr': 'missing.csv'}, headers=headers).status_code == 404
+
+    assert client.post('/admin/delta', json={}).status_code == 403
+    assert client.post('/admin/delta', json={}, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    monkeypatch.setattr(app, 'admin_token', None)
+    assert client.post('/admin/delta', json={}, headers=headers).status_code == 403
+
+
+def test_admin_reload(client, data, monkeypatch):
+    write_delta(data)
+    headers = {'X-Admin-Token': 'secret'}
+    before = client.get('/company/C/structure').json()
+    client.post('/admin/delta', json={'rr': 'rr-delta.csv'}, headers=headers)
+
+    assert client.post('/admin/reload', headers=headers).status_code == 202
+    for _ in range(100):
+        if not client.get('/dataset').json()['reloading']:
+            break
+        time.sleep(0.05)
+    assert client.get('/dataset').json()['current']['deltas'] == 0
+    assert nodes(client.get('/company/C/structure').json()) == nodes(before)
+
+    assert client.post('/admin/reload').status_code == 403
+    assert client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    monkeypatch.setattr(app, 'admin_token', None)
+    assert client.post('/admin/reload', headers=headers).status_code == 403
+
+
+def test_structure_formats(client):
+    structure = client.get('/company/C/structure').json()
+    assert nodes(structure) == ['A', 'B', 'C', 'D', 'E', 'R']
+
+    columnar = client.get('/company/C/structure', params={'format': 'columnar'})
+    assert columnar.headers['content-type'] == app.formats.MEDIA_TYPES['columnar']
+    assert sorted(columnar.json()['nodes']['id']) == nodes(structure)
+    by_accept = client.get('/company/C/structure', headers={'Accept': 'application/vnd.gleif.columnar+json'})
+    assert by_accept.json() == columnar.json()
+    # served from the cache the second time
+    assert client.get('/company/C/structure').json() == structure
+
+    assert client.get('/company/C/structure', params={'format': 'xml'}).status_code == 406
+    assert client.get('/company/C/structure', headers={'Accept': 'text/html'}).json() == structure
+
+
+def test_structure_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.get('/company/C/structure', headers={'Accept': 'application/msgpack'})
+    assert response.headers['content-type'] == app.formats.MEDIA_TYPES['msgpack']
+    assert msgpack.unpackb(response.content, raw=False) == client.get('/company/C/structure?format=columnar').json()
+
+
+def test_structure_limits(client):
+    structure = client.get('/company/C/structure', params={'max_depth': 1}).json()
+    assert structure['truncated'] is True
+    assert nodes(structure) == ['A', 'C', 'D']
+
+    structure = client.get('/company/C/structure', params={'max_nodes': 2}).json()
+    assert structure['truncated'] is True
+    assert len(structure['nodes']) == 2
+    assert client.get('/company/S/structure', params={'max_depth': 3}).json()['truncated'] is False
+
+    assert client.get('/company/C/structure', params={'max_depth': -1}).status_code == 422
+    assert client.get('/company/C/structure', params={'max_nodes': 0}).status_code == 422
+
+
+def test_children_pages(client):
+    page = client.get('/company/R/children', params={'limit': 2}).json()
+    assert page['label'] == 'Root Holding'
+    assert [(child['id'], child['relationship'], child['children']) for child in page['children']] == [
+        ('A', 'IS_DIRECTLY_CONSOLIDATED_BY', 1), ('B', 'IS_DIRECTLY_CONSOLIDATED_BY', 0),
+    ]
+    assert page['next_cursor'] == 'B,IS_DIRECTLY_CONSOLIDATED_BY'
+
+    page = client.get('/company/R/children', params={'limit': 2, 'cursor': page['next_cursor']}).json()
+    assert [child['id'] for child in page['children']] == ['E']
+    assert page['next_cursor'] is None
+    assert [child['id'] for child in client.get('/company/R/children', params={'cursor': 'A'}).json()['children']] == [
+        'B', 'E',
+    ]
+    assert client.get('/company/R/children', params={'limit': 0}).status_code == 422
+
+
+def test_children_pages_by_relationship(client, data):
+    """Tests that a page can end between the two relationships of a child that is both a subsidiary and a branch."""
+    data.join('rr-delta.csv').write('\n'.join([
+        'Relationship.StartNode.NodeID,Relationship.EndNode.NodeID,Relationship.RelationshipType,'
+        'Relationship.RelationshipStatus',
+        'D,C,IS_DIRECTLY_CONSOLIDATED_BY,ACTIVE',
+    ]) + '\n')
+    client.post('/admin/delta', json={'rr': 'rr-delta.csv'}, headers={'X-Admin-Token': 'secret'})
+
+    page = client.get('/company/C/children', params={'limit': 1}).json()
+    assert [(child['id'], child['relationship']) for child in page['children']] == [('D', 'IS_DIRECTLY_CONSOLIDATED_BY')]
+    page = client.get('/company/C/children', params={'limit': 1, 'cursor': page['next_cursor']}).json()
+    assert [(child['id'], child['relationship']) for child in page['children']] == [('D', 'IS_INTERNATIONAL_BRANCH_OF')]
+    assert page['next_cursor'] is None
+    assert client.get('/company/A/children').json()['children'][0]['children'] == 2
+
+
+def test_ancestors(client):
+    body = client.get('/company/D/ancestors').json()
+
+    assert [(ancestor['id'], ancestor['relationship']) for ancestor in body['ancestors']] == [
+        ('C', 'IS_INTERNATIONAL_BRANCH_OF'), ('A', 'IS_DIRECTLY_CONSOLIDATED_BY'), ('R', 'IS_DIRECTLY_CONSOLIDATED_BY'),
+    ]
+    assert body['cycle'] is False
+    assert client.get('/company/C/ancestors').json()['ultimate_parent'] == {'id': 'R', 'label': 'Root Holding'}
+    assert client.get('/company/S/ancestors').json()['ultimate_parent'] is None
+
+
+def requests_total(client, endpoint: str, status: int) -> float:
+    line = 'gleif_requests_total{{endpoint="{}",status="{}"}} '.format(endpoint, status)
+    values = [float(row[len(line):]) for row in client.get('/metrics').text.splitlines() if row.startswith(line)]
+    return values[0] if values else 0
+
+
+def test_metrics(client):
+    before = requests_total(client, 'get_company_structure', 200)
+    client.get('/company/C/structure')
+    client.get('/company/A/structure')
+    client.get('/company/C/structure', params={'format': 'xml'})
+
+    assert requests_total(client, 'get_company_structure', 200) == before + 2
+    assert requests_total(client, 'get_company_structure', 406) >= 1
+    text = client.get('/metrics').text
+    assert 'gleif_request_seconds_bucket{endpoint="get_company_structure",le="+Inf"}' in text
+    assert 'gleif_dataset_loaded 1' in text
+
+
+def test_health_before_load(data):
+    """Tests that the server is live but not ready (and data endpoints answer 503) until the data are loaded."""
+    client = TestClient(app.api)
+
+    assert client.get('/healthz').json() == {'status': 'ok'}
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '5'
+    assert client.get('/company/A/structure').status_code == 503
+
+    app.preload()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.json()['status'] == 'ready'
+
+
+def test_startup_loads_in_background(data):
+    with TestClient(app.api) as client:
+        for _ in range(100):
+            if client.get('/readyz').status_code == 200:
+                break
+            time.sleep(0.05)
+        assert client.get('/company/A/structure').status_code == 200
+
+
+def test_search(client):
+    results = client.get('/search', params={'q': 'bank'}).json()['results']
+    assert sorted(result['id'] for result in results) == ['A', 'E', 'Q', 'S']
+
+    results = client.get('/search', params={'q': 'bank', 'jurisdiction': 'DE', 'status': 'ACTIVE'}).json()['results']
+    assert sorted((result['id'], result['group_size']) for result in results) == [('A', 6), ('S', 1)]
+    assert client.get('/search', params={'q': ''}).status_code == 422
+
+
+def test_structure_attributes(client):
+    structure = client.get('/company/C/structure', params={'attributes': 'jurisdiction,status'}).json()
+    by_id = {node['id']: node for node in structure['nodes']}
+    assert by_id['D']['jurisdiction'] == 'GB'
+    assert by_id['E']['status'] == 'INACTIVE'
+    columnar = client.get('/company/C/structure', params={'format': 'columnar', 'attributes': 'status'}).json()
+    assert dict(zip(columnar['nodes']['id'], columnar['nodes']['status']))['E'] == 'INACTIVE'
+
+    response = client.get('/company/C/structure', params={'attributes': 'colour'})
+    assert response.status_code == 400
+
+
+def test_structure_history(client):
+    structure = client.get('/company/A/structure', params={'as_of': '2015-01-01'}).json()
+    assert ('A', 'Q', 'IS_DIRECTLY_CONSOLIDATED_BY') in edges(structure)
+    assert ('A', 'R', 'IS_DIRECTLY_CONSOLIDATED_BY') not in edges(structure)
+    assert 'Q' not in nodes(client.get('/company/A/structure').json())
+
+    active = client.get('/company/C/structure', params={'status': 'ACTIVE', 'registration_status': 'PUBLISHED'})
+    assert nodes(active.json()) == ['A', 'B', 'C', 'D', 'R']
+
+    assert client.get('/company/A/structure', params={'as_of': '2015-13-01'}).status_code == 422
+    assert client.get('/company/A/structure', params={'status': 'ENDED'}).status_code == 400
+    assert client.get('/company/A/structure', params={'registration_status': 'PUBLISHED,GONE'}).status_code == 400
+
 
-#  def test_read_main():
-#      response = client.get("/")
-#      assert response.status_code == 200
-#      assert response.json() == {"msg": "Hello World"}
+def test_structure_ownership(client):
+    structure = client.get('/company/C/structure', params={'ownership': 'true'}).json()
+    assert {node['id']: node['ownership'] for node in structure['nodes']} == {
+        'R': 1.0, 'A': 0.6, 'B': 0.4, 'C': 0.3, 'D': 0.3, 'E': None,
+    }
+    columnar = client.get('/company/C/structure', params={'format': 'columnar', 'ownership': 'true'}).json()
+    assert dict(zip(columnar['nodes']['id'], columnar['nodes']['ownership']))['C'] == 0.3
@@ -0,0 +1,47 @@
+"""
+gunicorn settings for running the api with several worker processes:
+
+    gunicorn -c gunicorn_conf.py app:api
+
+With `preload_app` (the default; `PRELOAD_APP=0` turns it off) the app and the data are
+loaded once in the master process before the workers are forked (`when_ready`), so all
+workers share the same memory and serve as soon as they are started:
+
+- loaded from a snapshot, the arrays are read-only memory maps of the file and live in
+  the page cache once, however many processes map them
+- loaded from the csv files, the arrays are inherited copy-on-write and never written
+
+The graph data are a handful of NumPy arrays rather than Python objects, so reference
+counting in the workers only touches the array headers, not the data pages. This holds
+for the `csr` backend; with `networkx` every worker slowly ends up with its own copy.
+
+Without `preload_app` every worker loads its own copy in the background when it starts
+and answers `/readyz` and the data endpoints with 503 until it is loaded. Reloads
+(`/admin/reload`) always build one copy per worker.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+# loading the csv files in a worker (without preload_app) may take a while
+timeout = int(os.environ.get("TIMEOUT", 120))
+keepalive = 5
+
+
+def when_ready(server):
+    # runs in the master after the app was imported and before any worker is forked
+    if server.cfg.preload_app:
+        import app
+
+        app.preload()
+
+
+def pre_fork(server, worker):
+    # move the loaded objects out of the garbage collector's generations, so collections in
+    # the workers do not write to (and thereby copy) the pages they live on
+    if hasattr(gc, "freeze"):
+        gc.freeze()